@@ -0,0 +1,131 @@
+import datetime
+from bisect import bisect_left, bisect_right
+import customtkinter as ctk
+import tkinter as tk
+from core.charts import lttb, scale
+import utils
+
+# Room left of the plot for amounts, and above and below it for the hover label and dates
+CHART_MARGIN = 60
+CHART_PADDING = 25
+
+class BankrollChart:
+    """Tk canvas chart of a player's cumulative profit over the completed sessions"""
+    def __init__(self, app):
+        self.app = app
+        self.store = app.store
+        self.player_ids = {}
+        # The full series, and the downsampled one drawn for the current canvas size
+        self.xs = []
+        self.ys = []
+        self.days = []
+        self.drawn = None
+    
+    def create_view(self, parent):
+        frame = ctk.CTkFrame(parent)
+        frame.grid_columnconfigure(1, weight=1)
+        frame.grid_rowconfigure(1, weight=1)
+        
+        title = ctk.CTkLabel(frame, text="Bankroll", font=ctk.CTkFont(weight="bold"))
+        title.grid(row=0, column=0, padx=20, pady=10, sticky="w")
+        
+        self.player_var = tk.StringVar()
+        self.player_menu = ctk.CTkComboBox(frame, values=[], variable=self.player_var, state="readonly",
+                                           command=lambda _: self.load_series())
+        self.player_menu.grid(row=0, column=1, padx=10, pady=10, sticky="w")
+        
+        dark = ctk.get_appearance_mode() == "Dark"
+        self.colors = {"bg": "#2b2b2b" if dark else "#f2f2f2", "axis": "#777777",
+                       "text": "#dddddd" if dark else "#222222"}
+        self.canvas = tk.Canvas(frame, height=240, bg=self.colors["bg"], highlightthickness=0)
+        self.canvas.grid(row=1, column=0, columnspan=2, padx=20, pady=(0, 20), sticky="nsew")
+        self.canvas.bind("<Configure>", lambda _: self.draw())
+        self.canvas.bind("<Motion>", self.on_hover)
+        self.canvas.bind("<Leave>", lambda _: self.canvas.delete("hover"))
+        return frame
+    
+    def refresh(self):
+        """Offer every player with completed sessions and redraw the selected one"""
+        windows = self.store.windowed_stats()
+        self.player_ids = {}
+        for player in self.store.players:
+            if player["id"] in windows.players:
+                self.player_ids[player["name"]] = player["id"]
+        names = sorted(self.player_ids)
+        self.player_menu.configure(values=names)
+        if self.player_var.get() not in self.player_ids:
+            self.player_var.set(names[0] if names else "")
+        self.load_series()
+    
+    def load_series(self):
+        player_id = self.player_ids.get(self.player_var.get())
+        self.days, self.ys = self.store.windowed_stats().bankroll(player_id)
+        self.xs = [datetime.date.fromisoformat(day).toordinal() for day in self.days]
+        self.low = min(self.ys + [0])
+        self.high = max(self.ys + [0])
+        self.drawn = None
+        self.draw()
+    
+    def plot_area(self):
+        width = max(self.canvas.winfo_width() - CHART_MARGIN - CHART_PADDING, 1)
+        height = max(self.canvas.winfo_height() - 2 * CHART_PADDING, 1)
+        return width, height
+    
+    def to_canvas(self, x, y):
+        width, height = self.plot_area()
+        return (CHART_MARGIN + scale(x, self.xs[0], self.xs[-1], width),
+                CHART_PADDING + height - scale(y, self.low, self.high, height))
+    
+    def draw(self):
+        self.canvas.delete("all")
+        if not self.xs:
+            self.canvas.create_text(self.canvas.winfo_width() / 2, self.canvas.winfo_height() / 2,
+                                    text="No completed sessions", fill=self.colors["text"])
+            return
+        
+        # Never more points than pixels across, so a redraw costs the same for any history
+        width, height = self.plot_area()
+        if self.drawn is None or self.drawn[0] != width:
+            self.drawn = (width, lttb(self.xs, self.ys, max(int(width) // 2, 3)))
+        kept = self.drawn[1]
+        
+        zero_left = self.to_canvas(self.xs[0], 0)
+        zero_right = self.to_canvas(self.xs[-1], 0)
+        self.canvas.create_line(CHART_MARGIN, zero_left[1], CHART_MARGIN + width, zero_right[1],
+                                fill=self.colors["axis"], dash=(4, 4))
+        
+        for value in (self.high, self.low):
+            self.canvas.create_text(CHART_MARGIN - 6, self.to_canvas(self.xs[0], value)[1], anchor="e",
+                                    text=utils.format_currency(value), fill=self.colors["text"])
+        bottom = CHART_PADDING + height + 4
+        self.canvas.create_text(CHART_MARGIN, bottom, anchor="nw", text=self.days[0], fill=self.colors["text"])
+        self.canvas.create_text(CHART_MARGIN + width, bottom, anchor="ne", text=self.days[-1],
+                                fill=self.colors["text"])
+        
+        if len(kept) == 1:
+            x, y = self.to_canvas(self.xs[0], self.ys[0])
+            self.canvas.create_oval(x - 3, y - 3, x + 3, y + 3, fill="green" if self.ys[0] >= 0 else "red")
+            return
+        coords = []
+        for i in kept:
+            coords.extend(self.to_canvas(self.xs[i], self.ys[i]))
+        self.canvas.create_line(*coords, fill="green" if self.ys[-1] >= 0 else "red", width=2)
+    
+    def on_hover(self, event):
+        self.canvas.delete("hover")
+        if not self.xs:
+            return
+        
+        # Find the session under the cursor in the full series, not just the points drawn
+        width, _ = self.plot_area()
+        x = self.xs[0] + (event.x - CHART_MARGIN) / width * (self.xs[-1] - self.xs[0])
+        i = bisect_left(self.xs, x)
+        if i == len(self.xs) or (i > 0 and x - self.xs[i - 1] < self.xs[i] - x):
+            i -= 1
+        # Several sessions on one day share an x, so show where the day ended
+        i = bisect_right(self.xs, self.xs[i]) - 1
+        
+        px, py = self.to_canvas(self.xs[i], self.ys[i])
+        self.canvas.create_oval(px - 4, py - 4, px + 4, py + 4, outline=self.colors["text"], tags="hover")
+        self.canvas.create_text(px, py - 10, anchor="s", tags="hover", fill=self.colors["text"],
+                                text=f"{self.days[i]}  {utils.format_currency(self.ys[i])}")
@@ -0,0 +1,78 @@
+# Benchmark the memory held by session entries as loaded dicts against compact Entry objects.
+#
+# Both models are built from the same JSON text, as loading the data file would, and
+# measured with tracemalloc. Also times a stats pass over each, since entries are read
+# far more often than they are written.
+import argparse
+import gc
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.entries import compact_session, registry
+from core.stats import calculate_all_player_stats
+
+def make_history_json(num_players, num_sessions, players_per_session, seed=0):
+    """JSON text for a synthetic history of sessions, entries only"""
+    rng = random.Random(seed)
+    player_ids = [str(uuid.UUID(int=rng.getrandbits(128))) for _ in range(num_players)]
+    sessions = []
+    for i in range(num_sessions):
+        entries = [{"id": player_id, "buyin": 1000, "rebuys": rng.choice([0, 0, 500, 1000]),
+                    "cashout": 100 * rng.randint(0, 40)}
+                   for player_id in rng.sample(player_ids, min(players_per_session, num_players))]
+        sessions.append({"id": str(uuid.UUID(int=rng.getrandbits(128))), "players": entries})
+    return json.dumps(sessions)
+
+def measure(build):
+    """Return (result, bytes still allocated by building it)"""
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, size
+
+def time_stats(sessions, repeats=5):
+    started = time.perf_counter()
+    for _ in range(repeats):
+        calculate_all_player_stats(sessions)
+    return (time.perf_counter() - started) / repeats
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare memory used by dict and compact session entries")
+    parser.add_argument("--players", type=int, default=60)
+    parser.add_argument("--sessions", type=int, default=5000)
+    parser.add_argument("--per-session", type=int, default=9)
+    args = parser.parse_args()
+
+    text = make_history_json(args.players, args.sessions, args.per_session)
+    num_entries = args.sessions * min(args.per_session, args.players)
+    print(f"{args.sessions} sessions, {num_entries} entries")
+
+    # Intern the players first, as loading the players list does, so both runs measure only entries
+    for session in json.loads(text):
+        for entry in session["players"]:
+            registry.intern(entry["id"])
+
+    dict_sessions, dict_bytes = measure(lambda: json.loads(text))
+    compact_sessions, compact_bytes = measure(lambda: [compact_session(s) for s in json.loads(text)])
+
+    for label, sessions, size in (("dict entries", dict_sessions, dict_bytes),
+                                  ("compact entries", compact_sessions, compact_bytes)):
+        print(f"{label:<18} {size / 1024 / 1024:8.2f} MiB {size / num_entries:7.0f} B/entry "
+              f"stats {time_stats(sessions) * 1000:7.1f} ms")
+    print(f"compact uses {compact_bytes / dict_bytes:.0%} of the dict model's memory")
+
+    if calculate_all_player_stats(dict_sessions) != calculate_all_player_stats(compact_sessions):
+        raise AssertionError("Stats differ between the two models")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+# Benchmark and check the Google Sheets sync against the in-process fake backend.
+#
+# Network time is simulated with a virtual clock shared by the fake service and the
+# request scheduler, so latency, quotas and backoff cost nothing in real time.
+# Reports the CPU time, the simulated wall time and the requests made per scenario.
+import argparse
+import datetime
+import os
+import random
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from google_sheets import GoogleSheetsManager, SHEET_HEADERS, iter_sheet_rows
+from sheets_scheduler import RequestScheduler
+from fake_gspread import FakeClient, FakeService
+
+class VirtualClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += max(0.0, seconds)
+
+def make_history(num_players, num_sessions, players_per_session, seed=0):
+    """Build a synthetic history of balanced sessions, amounts in pence"""
+    rng = random.Random(seed)
+    players = [{"id": str(uuid.UUID(int=rng.getrandbits(128))), "name": f"Player {i}"} for i in range(num_players)]
+    start = datetime.datetime(2020, 1, 1)
+    sessions = []
+
+    for i in range(num_sessions):
+        seated = rng.sample(players, min(players_per_session, num_players))
+        entries = []
+        for player in seated:
+            entries.append({
+                "id": player["id"],
+                "buyin": 1000,
+                "rebuys": rng.choice([0, 0, 500, 1000]),
+                "cashout": 0
+            })
+        pot = sum(e["buyin"] + e["rebuys"] for e in entries)
+        # Share the pot out in whole pounds, remainder to the last player
+        for entry in entries[:-1]:
+            entry["cashout"] = 100 * rng.randint(0, pot // 100)
+            pot -= entry["cashout"]
+        entries[-1]["cashout"] = pot
+        sessions.append({
+            "id": str(uuid.UUID(int=rng.getrandbits(128))),
+            "name": f"Session {i}",
+            "date": (start + datetime.timedelta(days=7 * i)).isoformat(),
+            "players": entries,
+            "status": "completed"
+        })
+
+    return players, sessions
+
+def check_sheets(spreadsheet, players, sessions):
+    """Compare the fake spreadsheet contents with what the data should produce"""
+    expected = {title: [list(header)] for title, header in SHEET_HEADERS.items()}
+    for title, row in iter_sheet_rows(players, sessions):
+        expected[title].append(row)
+
+    for title, rows in expected.items():
+        actual = [row[:len(SHEET_HEADERS[title])] for row in spreadsheet.sheet_by_title(title).rows]
+        if actual != rows:
+            raise AssertionError(f"{title} sheet does not match the local data")
+
+def run_scenario(label, manager, service, clock, players, sessions):
+    requests_before = service.total_requests
+    simulated_before = clock.now
+    started = time.perf_counter()
+
+    manager.update_sheets(players, sessions)
+
+    cpu = time.perf_counter() - started
+    check_sheets(manager.spreadsheet, players, sessions)
+    print(f"{label:<32} {cpu * 1000:9.1f} ms cpu {clock.now - simulated_before:9.1f} s simulated "
+          f"{service.total_requests - requests_before:5d} requests")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Google Sheets sync against a fake backend")
+    parser.add_argument("--players", type=int, default=40)
+    parser.add_argument("--sessions", type=int, default=2000)
+    parser.add_argument("--per-session", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.3, help="simulated seconds per request")
+    parser.add_argument("--write-quota", type=int, default=60, help="fake write requests per minute")
+    args = parser.parse_args()
+
+    players, sessions = make_history(args.players, args.sessions, args.per_session)
+    print(f"{len(players)} players, {len(sessions)} sessions, "
+          f"{sum(len(s['players']) for s in sessions)} session detail rows")
+
+    clock = VirtualClock()
+    service = FakeService(latency=args.latency, read_per_minute=60, write_per_minute=args.write_quota,
+                          clock=clock.time, sleep=clock.sleep)
+    scheduler = RequestScheduler(clock=clock.time, sleep=clock.sleep)
+    manager = GoogleSheetsManager(sheet_name="bench", client=FakeClient(service), scheduler=scheduler)
+
+    run_scenario("full backfill", manager, service, clock, players, sessions)
+    run_scenario("resync, nothing changed", manager, service, clock, players, sessions)
+
+    sessions.append(make_history(args.players, 1, args.per_session, seed=1)[1][0])
+    run_scenario("one new session", manager, service, clock, players, sessions)
+
+    sessions[len(sessions) // 2]["players"][0]["rebuys"] += 500
+    sessions[len(sessions) // 2]["players"][1]["rebuys"] -= 500
+    run_scenario("edit mid-history session", manager, service, clock, players, sessions)
+
+    del sessions[:10]
+    run_scenario("delete oldest sessions", manager, service, clock, players, sessions)
+
+    # Fresh backfill while the backend throws transient errors
+    service.failure_rate = 0.1
+    manager.sync_state.clear()
+    run_scenario("backfill with 10% 503s", manager, service, clock, players, sessions)
+
+if __name__ == "__main__":
+    main()
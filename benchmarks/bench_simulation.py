@@ -0,0 +1,49 @@
+# Benchmark the Monte Carlo luck simulation, reporting trials per second as the number
+# of worker processes grows, up to one per CPU.
+#
+# Results are synthetic session results in pence. Each worker count runs the same number
+# of trials, after a warm-up run so process start-up isn't counted against the first.
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.simulation import simulate
+
+def worker_counts(limit):
+    counts = []
+    workers = 1
+    while workers < limit:
+        counts.append(workers)
+        workers *= 2
+    return counts + [limit]
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure luck simulation throughput by worker count")
+    parser.add_argument("--results", type=int, default=200, help="past sessions to resample")
+    parser.add_argument("--sessions", type=int, default=100, help="sessions per trial")
+    parser.add_argument("--trials", type=int, default=200000)
+    parser.add_argument("--method", choices=["bootstrap", "normal"], default="bootstrap")
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    results = [100 * rng.randint(-30, 35) for _ in range(args.results)]
+    print(f"{args.trials} trials of {args.sessions} sessions ({args.method}), {os.cpu_count()} CPUs")
+
+    simulate(results, args.sessions, 10000, 1000, args.method, workers=1, seed=0)
+    baseline = None
+    for workers in worker_counts(args.max_workers):
+        started = time.perf_counter()
+        report = simulate(results, args.sessions, 10000, args.trials, args.method, workers=workers, seed=0)
+        elapsed = time.perf_counter() - started
+        rate = args.trials / elapsed
+        baseline = baseline or rate
+        print(f"{workers:>3} workers {elapsed:7.2f} s {rate:12.0f} trials/s  x{rate / baseline:4.1f}  "
+              f"ruin {report['risk_of_ruin']:.3f}")
+
+if __name__ == "__main__":
+    main()
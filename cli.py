@@ -0,0 +1,282 @@
+# Command line access to the tracker data for batch jobs and headless machines.
+#
+#   python cli.py stats
+#   python cli.py sessions
+#   python cli.py export --format csv --output sessions.csv
+#   python cli.py settle last --links
+#   python cli.py check --fix
+#   python cli.py simulate Dav --sessions 100 --bankroll 200
+#   python cli.py leaderboard --by rating --top 5
+#   python cli.py serve --port 8765
+import argparse
+import csv
+import json
+import os
+import sys
+import threading
+from types import SimpleNamespace
+from core import integrity, leaderboard, ledger, money, settlement, simulation
+from core.entries import json_default
+from core.storage import DataStore
+from table_server import TableServer, DEFAULT_HOST, DEFAULT_PORT
+import utils
+
+def load_config(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r') as f:
+        return json.load(f)
+
+def find_session(store, key):
+    """Look a session up by id, exact name, or 'current' (the first live table)/'last'"""
+    if key == "current":
+        return store.current_session
+    if key == "last":
+        return store.sessions[-1] if store.sessions else None
+    session = store.get_session_by_id(key)
+    if session:
+        return session
+    for session in store.get_all_sessions():
+        if session["name"] == key:
+            return session
+    return None
+
+def cmd_stats(store, config, args):
+    all_stats = store.player_stats()
+    all_metrics = store.player_metrics()
+    rows = []
+    for player in store.get_all_players():
+        stats = all_stats.get(player["id"])
+        if stats:
+            metrics = all_metrics.get(player["id"], {"std_dev": 0, "max_drawdown": 0, "longest_losing_streak": 0,
+                                                     "consistency": None})
+            rows.append(dict(stats, **metrics, name=player["name"]))
+    rows.sort(key=lambda row: row["profit"], reverse=True)
+    
+    if args.json:
+        # Pounds for scripts reading the output, like the table API
+        for row in rows:
+            for field in ("buyins", "cashouts", "profit", "avg_profit", "std_dev", "max_drawdown"):
+                row[field] = money.to_pounds(row[field])
+        json.dump(rows, sys.stdout, indent=4)
+        print()
+        return 0
+    
+    print(f"{'Player':<24} {'Sessions':>8} {'Buy-ins':>10} {'Cash-outs':>10} {'Profit':>10} {'Avg':>9} "
+          f"{'Std dev':>9} {'Drawdown':>10} {'Streak':>6} {'Consist.':>8}")
+    for row in rows:
+        consistency = "-" if row["consistency"] is None else f"{row['consistency']:.2f}"
+        print(f"{row['name']:<24} {row['sessions']:>8} {utils.format_currency(row['buyins']):>10} "
+              f"{utils.format_currency(row['cashouts']):>10} {utils.format_currency(row['profit']):>10} "
+              f"{utils.format_currency(row['avg_profit']):>9} {utils.format_currency(row['std_dev']):>9} "
+              f"{utils.format_currency(row['max_drawdown']):>10} {row['longest_losing_streak']:>6} {consistency:>8}")
+    return 0
+
+def cmd_sessions(store, config, args):
+    # Balances are checked from the entries for the whole history in one pass
+    unbalanced = {session["id"] for session, _ in ledger.unbalanced_sessions(store.get_all_sessions())}
+    for session in store.get_all_sessions():
+        if args.unbalanced and session["id"] not in unbalanced:
+            continue
+        total_buyin, total_rebuys, total_cashout = ledger.session_totals(session)
+        # Live means a table is open for it, the same as the store's live sessions
+        status = "live" if session["id"] in store.tables else session.get("status", "completed")
+        flag = "  UNBALANCED" if session["id"] in unbalanced else ""
+        print(f"{session['id']}  {session['date'].split('T')[0]}  {session['name']:<28} {status:<9} "
+              f"players {len(session['players']):>2}  in {utils.format_currency(total_buyin + total_rebuys):>10}  "
+              f"out {utils.format_currency(total_cashout):>10}{flag}")
+    return 0
+
+def cmd_export(store, config, args):
+    output = open(args.output, 'w', newline='') if args.output else sys.stdout
+    try:
+        if args.format == "json":
+            json.dump({"players": store.get_all_players(), "sessions": store.get_all_sessions(),
+                       "money": money.MONEY_FORMAT}, output, indent=4, default=json_default)
+        else:
+            # One row per player per session, like the Session Details sheet
+            writer = csv.writer(output)
+            writer.writerow(["Session ID", "Session Name", "Date", "Player ID", "Player Name",
+                             "Buy-in", "Rebuys", "Cash-out", "Profit/Loss"])
+            for session in store.get_all_sessions():
+                for entry in session["players"]:
+                    player = store.get_player_by_id(entry["id"])
+                    writer.writerow([session["id"], session["name"], session["date"], entry["id"],
+                                     player["name"] if player else "Unknown Player",
+                                     money.format_pence(entry["buyin"], symbol=""),
+                                     money.format_pence(entry.get("rebuys", 0), symbol=""),
+                                     money.format_pence(entry.get("cashout", 0), symbol=""),
+                                     money.format_pence(ledger.entry_profit(entry), symbol="")])
+    finally:
+        if args.output:
+            output.close()
+    return 0
+
+def cmd_settle(store, config, args):
+    session = find_session(store, args.session)
+    if not session:
+        print(f"Session not found: {args.session}", file=sys.stderr)
+        return 1
+    
+    if args.links:
+        # Payment links need the API credentials from config.json
+        from paypal_integration import PayPalPaymentManager
+        payment_manager = PayPalPaymentManager(
+            config.get("paypal_client_id"),
+            config.get("paypal_client_secret"),
+            config.get("paypal_mode", "sandbox"),
+            app=SimpleNamespace(config=config)
+        )
+        session["settlement"] = settlement.build_settlement(session, store.get_all_players(), payment_manager)
+        store.mark_dirty(session)
+        store.save()
+        debtors = session["settlement"]["payments"]
+        winners = session["settlement"]["distributions"]
+    else:
+        debtors, winners = settlement.calculate_transfers(session, store.get_all_players())
+    
+    print(f"{session['name']} ({session['date'].split('T')[0]})")
+    for debtor in debtors:
+        print(f"  {debtor['name']:<24} owes {utils.format_currency(debtor['amount']):>10}  {debtor.get('url') or ''}")
+    for winner in winners:
+        print(f"  {winner['name']:<24} wins {utils.format_currency(winner['amount']):>10}  {winner.get('url') or ''}")
+    if not ledger.is_balanced(session):
+        print(f"  Unbalanced by {utils.format_currency(ledger.session_balance(session))}")
+    return 0
+
+def cmd_check(store, config, args):
+    issues = store.check_integrity()
+    for found in issues:
+        print(f"{found['kind']:<11} {found['message']}")
+    if not issues:
+        print("No problems found")
+        return 0
+    
+    if args.fix is not None:
+        fixed = integrity.fix_issues(store, issues, args.fix or integrity.FIXABLE_KINDS)
+        store.save()
+        remaining = store.check_integrity()
+        print(f"Fixed {fixed} issues, {len(remaining)} remaining")
+        return 1 if remaining else 0
+    return 1
+
+def cmd_simulate(store, config, args):
+    player = store.get_player_by_id(args.player) or next(
+        (player for player in store.get_all_players() if player["name"] == args.player), None)
+    if not player:
+        print(f"Player not found: {args.player}", file=sys.stderr)
+        return 1
+    
+    results = simulation.player_results(store.sessions, player["id"])
+    try:
+        report = simulation.simulate(results, args.sessions, money.to_pence(args.bankroll), args.trials,
+                                     args.method, workers=args.workers, seed=args.seed)
+    except (ImportError, ValueError) as e:
+        print(e, file=sys.stderr)
+        return 1
+    
+    win_rate, final = report["win_rate"], report["final"]
+    ruin_low, ruin_high = report["risk_of_ruin_interval"]
+    print(f"{player['name']}: {len(results)} sessions, averaging {utils.format_currency(report['observed_win_rate'])}")
+    print(f"{report['trials']} trials of {report['sessions']} sessions ({report['method']}), 95% of runs between:")
+    print(f"  win rate      {utils.format_currency(win_rate['low'])} and {utils.format_currency(win_rate['high'])} "
+          f"per session (median {utils.format_currency(win_rate['median'])})")
+    print(f"  final result  {utils.format_currency(final['low'])} and {utils.format_currency(final['high'])} "
+          f"(median {utils.format_currency(final['median'])})")
+    print(f"  risk of ruin  {report['risk_of_ruin']:.1%} ({ruin_low:.1%} to {ruin_high:.1%}) "
+          f"from a {utils.format_currency(money.to_pence(args.bankroll))} bankroll")
+    return 0
+
+def cmd_leaderboard(store, config, args):
+    rows = store.leaderboard().top(args.by, args.top, lowest=args.bottom)
+    for rank, row in enumerate(rows, start=1):
+        value = row[args.by]
+        if value is None:
+            value = "-"
+        elif args.by in ("buyins", "cashouts", "profit", "avg_profit", "std_dev", "max_drawdown"):
+            value = utils.format_currency(value)
+        elif args.by == "consistency":
+            value = f"{value:.2f}"
+        print(f"{rank:>3}. {row['name']:<24} {value:>10}")
+    return 0
+
+def cmd_serve(store, config, args):
+    # The main thread is the single writer, saving after every change
+    try:
+        server = TableServer(store, args.host, args.port, config.get("table_server_token", ""), on_change=store.save)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 1
+    server.start()
+    print(f"Serving live tables on {server.url()}, Ctrl+C to stop")
+    stop = threading.Event()
+    try:
+        server.run_writer(stop)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+    return 0
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Poker tracker command line tools")
+    parser.add_argument("--config", default="config.json", help="config file (default: config.json)")
+    parser.add_argument("--data", help="data file (default: the config's data_file)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    
+    stats_parser = commands.add_parser("stats", help="recompute and print player stats")
+    stats_parser.add_argument("--json", action="store_true", help="print JSON instead of a table")
+    stats_parser.set_defaults(func=cmd_stats)
+    
+    sessions_parser = commands.add_parser("sessions", help="list sessions with their totals")
+    sessions_parser.add_argument("--unbalanced", action="store_true", help="only list sessions that don't balance")
+    sessions_parser.set_defaults(func=cmd_sessions)
+    
+    export_parser = commands.add_parser("export", help="export players and sessions")
+    export_parser.add_argument("--format", choices=["json", "csv"], default="json")
+    export_parser.add_argument("--output", "-o", help="output file (default: stdout)")
+    export_parser.set_defaults(func=cmd_export)
+    
+    settle_parser = commands.add_parser("settle", help="show who owes and who is owed for a session")
+    settle_parser.add_argument("session", help="session id or name, 'current' or 'last'")
+    settle_parser.add_argument("--links", action="store_true",
+                               help="create payment links and store the settlement in the data file")
+    settle_parser.set_defaults(func=cmd_settle)
+    
+    check_parser = commands.add_parser("check", help="check the history for orphaned, duplicate and unbalanced entries")
+    check_parser.add_argument("--fix", nargs="*", choices=integrity.FIXABLE_KINDS, metavar="KIND",
+                              help="repair the given kinds of issue, or every fixable kind if none are given")
+    check_parser.set_defaults(func=cmd_check)
+    
+    simulate_parser = commands.add_parser("simulate", help="simulate a player's luck from their session results")
+    simulate_parser.add_argument("player", help="player id or name")
+    simulate_parser.add_argument("--sessions", type=int, default=100, help="sessions per trial (default: 100)")
+    simulate_parser.add_argument("--trials", type=int, default=10000, help="number of trials (default: 10000)")
+    simulate_parser.add_argument("--bankroll", default="100", help="starting bankroll in pounds (default: 100)")
+    simulate_parser.add_argument("--method", choices=simulation.METHODS, default="bootstrap",
+                                 help="resample past results or draw from a fitted normal distribution")
+    simulate_parser.add_argument("--workers", type=int, help="worker processes (default: one per CPU)")
+    simulate_parser.add_argument("--seed", type=int, help="random seed, for repeatable runs")
+    simulate_parser.set_defaults(func=cmd_simulate)
+    
+    leaderboard_parser = commands.add_parser("leaderboard", help="rank players by a stat")
+    leaderboard_parser.add_argument("--by", choices=[key for key in leaderboard.RANK_KEYS if key != "name"],
+                                    default="profit")
+    leaderboard_parser.add_argument("--top", type=int, default=10, help="players to show (default: 10)")
+    leaderboard_parser.add_argument("--bottom", action="store_true", help="show the lowest instead of the highest")
+    leaderboard_parser.set_defaults(func=cmd_leaderboard)
+    
+    serve_parser = commands.add_parser("serve", help="run the table API without the GUI")
+    serve_parser.add_argument("--host", default=DEFAULT_HOST,
+                              help="address to listen on (default: this machine only; others need a token)")
+    serve_parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    serve_parser.set_defaults(func=cmd_serve)
+    
+    args = parser.parse_args(argv)
+    config = load_config(args.config)
+    store = DataStore(args.data or config.get("data_file", "poker_data.json"))
+    store.load()
+    return args.func(store, config, args)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,18 @@
+# Business logic for the tracker with no GUI dependencies.
+#
+# Players and sessions stay plain dicts, exactly as they are stored in the data file,
+# so the Tk views, the CLI and the sync code all share the same records. Session
+# entries are compact Entry objects that read and write like the same dicts.
+from core.models import new_player, new_session, new_entry
+from core.entries import Entry, PlayerRegistry
+from core.ledger import (
+    entry_total_in, entry_profit, session_totals, is_balanced,
+    add_entry, update_entry, remove_entry, complete_session, apply_entry_changes
+)
+from core.stats import calculate_player_stats, calculate_all_player_stats, RunningMetrics
+from core.windows import StatsWindows
+from core.pairs import CoOccurrence
+from core.ratings import RatingEngine
+from core.leaderboard import Leaderboard
+from core.integrity import IntegrityScanner, fix_issues
+from core.storage import DataStore
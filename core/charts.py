@@ -0,0 +1,39 @@
+# Helpers for drawing series on a canvas without a plotting library.
+
+def lttb(xs, ys, threshold):
+    """Indices of the points to keep when reducing a series to threshold points
+    
+    Largest-triangle-three-buckets: the first and last points are kept, the rest are
+    split into equal buckets and each keeps the point forming the largest triangle with
+    the point kept before it and the average of the next bucket, which keeps the peaks
+    and troughs a plain stride would drop. Runs in one pass over the series."""
+    count = len(xs)
+    if threshold >= count or threshold < 3:
+        return list(range(count))
+    
+    every = (count - 2) / (threshold - 2)
+    kept = [0]
+    previous = 0
+    for bucket in range(threshold - 2):
+        start = int(bucket * every) + 1
+        end = int((bucket + 1) * every) + 1
+        next_end = min(int((bucket + 2) * every) + 1, count)
+        avg_x = sum(xs[end:next_end]) / (next_end - end)
+        avg_y = sum(ys[end:next_end]) / (next_end - end)
+        
+        px, py = xs[previous], ys[previous]
+        best_area = -1
+        for i in range(start, end):
+            area = abs((px - avg_x) * (ys[i] - py) - (px - xs[i]) * (avg_y - py))
+            if area > best_area:
+                best_area = area
+                previous = i
+        kept.append(previous)
+    kept.append(count - 1)
+    return kept
+
+def scale(value, low, high, size):
+    """Position of value along size pixels spanning low to high"""
+    if high == low:
+        return size / 2
+    return (value - low) / (high - low) * size
@@ -0,0 +1,122 @@
+# Compact session entries. A history of a few thousand sessions holds tens of thousands
+# of entries, and as dicts each one costs a hash table plus its own copy of the player's
+# 36 character id. An Entry keeps the player as a small integer from the shared
+# PlayerRegistry and the three amounts in slots, and still reads and writes like the
+# dict it replaces (entry["id"], entry.get("rebuys", 0), entry.update(...), dict(entry)).
+# Plain dicts only come back at the JSON boundary, through json_default.
+from collections.abc import MutableMapping
+
+ENTRY_FIELDS = ("id", "buyin", "rebuys", "cashout")
+AMOUNT_FIELDS = frozenset(ENTRY_FIELDS[1:])
+
+class PlayerRegistry:
+    """Interns player ids to small integers, in the order they are first seen"""
+    def __init__(self):
+        self.ids = []
+        self.numbers = {}
+    
+    def intern(self, player_id):
+        number = self.numbers.get(player_id)
+        if number is None:
+            number = self.numbers[player_id] = len(self.ids)
+            self.ids.append(player_id)
+        return number
+    
+    def canonical(self, player_id):
+        """The registry's copy of a player id, so equal ids share one string"""
+        return self.ids[self.intern(player_id)]
+    
+    def __len__(self):
+        return len(self.ids)
+
+# One registry per process, so entries never need to know which store they belong to
+registry = PlayerRegistry()
+
+class Entry(MutableMapping):
+    """One player's buy-in, rebuys and cash-out in a session"""
+    __slots__ = ("player", "buyin", "rebuys", "cashout")
+    
+    def __init__(self, player_id, buyin, rebuys=0, cashout=0):
+        self.player = registry.intern(player_id)
+        self.buyin = buyin
+        self.rebuys = rebuys
+        self.cashout = cashout
+    
+    @classmethod
+    def from_dict(cls, values):
+        if isinstance(values, cls):
+            return values
+        unknown = set(values) - set(ENTRY_FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown session entry fields: {', '.join(sorted(unknown))}")
+        return cls(values["id"], values["buyin"], values.get("rebuys", 0), values.get("cashout", 0))
+    
+    def __getitem__(self, key):
+        if key == "id":
+            return registry.ids[self.player]
+        if key in AMOUNT_FIELDS:
+            return getattr(self, key)
+        raise KeyError(key)
+    
+    def get(self, key, default=None):
+        if key == "id":
+            return registry.ids[self.player]
+        if key in AMOUNT_FIELDS:
+            return getattr(self, key)
+        return default
+    
+    def __setitem__(self, key, value):
+        if key == "id":
+            self.player = registry.intern(value)
+        elif key in AMOUNT_FIELDS:
+            setattr(self, key, value)
+        else:
+            raise KeyError(f"Session entries have no field {key}")
+    
+    def __delitem__(self, key):
+        raise KeyError(f"Session entry fields can't be removed: {key}")
+    
+    def __iter__(self):
+        return iter(ENTRY_FIELDS)
+    
+    def __len__(self):
+        return len(ENTRY_FIELDS)
+    
+    def to_dict(self):
+        return {"id": registry.ids[self.player], "buyin": self.buyin, "rebuys": self.rebuys, "cashout": self.cashout}
+    
+    def copy(self):
+        entry = Entry.__new__(Entry)
+        entry.player = self.player
+        entry.buyin = self.buyin
+        entry.rebuys = self.rebuys
+        entry.cashout = self.cashout
+        return entry
+    
+    def __copy__(self):
+        return self.copy()
+    
+    def __deepcopy__(self, memo):
+        return self.copy()
+    
+    def __reduce__(self):
+        # Registries differ between processes, so pickle the id rather than its number
+        return Entry.from_dict, (self.to_dict(),)
+    
+    def __repr__(self):
+        return f"Entry({self.to_dict()!r})"
+
+def compact_session(session):
+    """Swap a loaded session's entry dicts for Entry objects and share its player id strings"""
+    session["players"] = [Entry.from_dict(entry) for entry in session["players"]]
+    for snapshot in session.get("snapshots", []):
+        snapshot["players"] = [Entry.from_dict(entry) for entry in snapshot["players"]]
+    for event in session.get("events", []):
+        event["player_id"] = registry.canonical(event["player_id"])
+    return session
+
+def json_default(value):
+    """json.dump default hook turning entries back into plain dicts"""
+    if isinstance(value, Entry):
+        return value.to_dict()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
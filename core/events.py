@@ -0,0 +1,191 @@
+# Sessions are recorded as an append-only list of timestamped events. The session's
+# "players" entries and "totals" are materialised views kept up to date as each event
+# is recorded, so everything that reads entries works unchanged.
+#
+#   seat     player joins with their first buy-in (amount)
+#   buyin    buy-in corrected by amount (may be negative)
+#   rebuy    rebuys changed by amount (negative to correct a mistake)
+#   cashout  cash-out set to amount, with the previous value kept for projections
+#   leave    player removed from the session, with the entry they had
+#
+# Events for a player entered more than once in legacy data carry the entry's index.
+#
+# Every SNAPSHOT_INTERVAL events a copy of the views is stored, so replaying to any
+# point only applies the events after the nearest snapshot.
+import bisect
+import copy
+import datetime
+import itertools
+from core.models import new_entry
+
+EVENT_TYPES = ("seat", "buyin", "rebuy", "cashout", "leave")
+SNAPSHOT_INTERVAL = 50
+
+# Session id -> (event list, revision). Holding on to the list means a replaced one is
+# always noticed, where comparing id()s could match a new list at a freed one's address
+revisions = {}
+revision_counter = itertools.count(1)
+
+def empty_totals():
+    return {"buyin": 0, "rebuys": 0, "cashout": 0}
+
+def apply_event(state, event):
+    """Apply one event to a {"players", "totals"} view in place"""
+    players = state["players"]
+    totals = state["totals"]
+    kind = event["type"]
+    player_id = event["player_id"]
+    amount = event.get("amount", 0)
+    
+    if kind == "seat":
+        players.append(new_entry(player_id, amount))
+        totals["buyin"] += amount
+        return
+    
+    index = entry_index(players, player_id, event.get("index"))
+    if index is None:
+        raise ValueError(f"Event {event.get('seq')} refers to a player who isn't seated")
+    entry = players[index]
+    
+    if kind == "buyin":
+        entry["buyin"] += amount
+        totals["buyin"] += amount
+    elif kind == "rebuy":
+        entry["rebuys"] = entry.get("rebuys", 0) + amount
+        totals["rebuys"] += amount
+    elif kind == "cashout":
+        totals["cashout"] += amount - entry.get("cashout", 0)
+        entry["cashout"] = amount
+    elif kind == "leave":
+        players.pop(index)
+        totals["buyin"] -= entry["buyin"]
+        totals["rebuys"] -= entry.get("rebuys", 0)
+        totals["cashout"] -= entry.get("cashout", 0)
+    else:
+        raise ValueError(f"Unknown session event type: {kind}")
+
+def entry_index(players, player_id, index=None):
+    """Position of the player's entry, the given one if it is theirs, else their first"""
+    if index is not None and index < len(players) and players[index]["id"] == player_id:
+        return index
+    for position, entry in enumerate(players):
+        if entry["id"] == player_id:
+            return position
+    return None
+
+def record_event(session, kind, player_id, amount=0, at=None, **extra):
+    """Append an event to the session and apply it to the session's views"""
+    if kind not in EVENT_TYPES:
+        raise ValueError(f"Unknown session event type: {kind}")
+    ensure_events(session)
+    
+    events = session["events"]
+    event = {
+        "seq": len(events) + 1,
+        "type": kind,
+        "player_id": player_id,
+        "amount": amount,
+        "at": at or datetime.datetime.now().isoformat()
+    }
+    event.update(extra)
+    if kind == "cashout" or kind == "leave":
+        # Keep what was replaced so projections can update without looking back
+        index = entry_index(session["players"], player_id, event.get("index"))
+        if index is not None:
+            entry = session["players"][index]
+            event["previous"] = dict(entry) if kind == "leave" else entry.get("cashout", 0)
+    
+    return append_event(session, event)
+
+def append_event(session, event):
+    """Apply an already recorded event and add it to the session's stream"""
+    apply_event(session, event)
+    session["events"].append(event)
+    
+    if event["seq"] % SNAPSHOT_INTERVAL == 0:
+        session.setdefault("snapshots", []).append(take_snapshot(session, event["seq"]))
+    bump_revision(session)
+    return event
+
+def bump_revision(session):
+    """Give the session a new revision, after its events changed or were replaced"""
+    revision = next(revision_counter)
+    revisions[session["id"]] = (session.get("events"), revision)
+    return revision
+
+def revision(session):
+    """A number that changes whenever the session's events do, for caches built from them"""
+    known = revisions.get(session["id"])
+    if known is None or known[0] is not session.get("events"):
+        return bump_revision(session)
+    return known[1]
+
+def forget_revision(session_id):
+    """Drop a removed session's revision, and the event list it holds on to"""
+    revisions.pop(session_id, None)
+
+def change_token(session):
+    """Changes whenever a session's entries or date could have, for caches built from them"""
+    # Entries only change through events, which bump the revision, as does a merge or reload
+    return revision(session), len(session["players"]), session.get("date")
+
+def take_snapshot(state, seq):
+    return {"seq": seq, "players": copy.deepcopy(state["players"]), "totals": dict(state["totals"])}
+
+def ensure_events(session):
+    """Give a session recorded before events existed an equivalent event stream"""
+    if "events" in session:
+        return False
+    
+    entries = session["players"]
+    session["players"] = []
+    session["totals"] = empty_totals()
+    session["events"] = []
+    session["snapshots"] = []
+    at = session.get("date")
+    seen = set()
+    for index, entry in enumerate(entries):
+        # A player entered twice needs the index for their later entries
+        extra = {"index": index} if entry["id"] in seen else {}
+        seen.add(entry["id"])
+        record_event(session, "seat", entry["id"], entry["buyin"], at)
+        if entry.get("rebuys"):
+            record_event(session, "rebuy", entry["id"], entry["rebuys"], at, **extra)
+        if entry.get("cashout"):
+            record_event(session, "cashout", entry["id"], entry["cashout"], at, **extra)
+    
+    # Keep the original entry dicts, and any extra fields on them
+    for entry, rebuilt in zip(entries, session["players"]):
+        entry.update(rebuilt)
+    session["players"] = entries
+    return True
+
+def replay(session, seq=None, at=None):
+    """Rebuild the session's views as they were after event seq, or at an ISO timestamp"""
+    events = session_events(session)
+    if at is not None:
+        seq = sum(1 for event in events if event["at"] <= at)
+    if seq is None:
+        seq = len(events)
+    
+    # Start from the latest snapshot at or before the target
+    snapshots = session.get("snapshots", []) if "events" in session else []
+    index = bisect.bisect_right([snapshot["seq"] for snapshot in snapshots], seq)
+    if index:
+        state = take_snapshot(snapshots[index - 1], snapshots[index - 1]["seq"])
+        start = state["seq"]
+    else:
+        state = {"players": [], "totals": empty_totals()}
+        start = 0
+    
+    for event in events[start:seq]:
+        apply_event(state, event)
+    return state
+
+def session_events(session):
+    """The session's events, synthesised without modifying it for sessions that have none"""
+    if "events" in session:
+        return session["events"]
+    legacy = {"players": copy.deepcopy(session["players"]), "date": session.get("date")}
+    ensure_events(legacy)
+    return legacy["events"]
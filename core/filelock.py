@@ -0,0 +1,57 @@
+# Advisory lock on a file next to the data file, so several copies of the app (or an
+# import script) sharing one data file take turns reading and writing it.
+import os
+import time
+try:
+    import fcntl
+except ImportError:
+    # Windows has byte-range locks instead
+    fcntl = None
+    import msvcrt
+
+LOCK_TIMEOUT_SECONDS = 10
+LOCK_RETRY_SECONDS = 0.05
+
+class DataFileLock:
+    """Exclusive lock on <path>.lock, held for the with block"""
+    def __init__(self, path, timeout=LOCK_TIMEOUT_SECONDS):
+        self.lock_path = f"{path}.lock"
+        self.timeout = timeout
+        self.fd = None
+    
+    def acquire(self):
+        fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        deadline = time.monotonic() + self.timeout
+        while True:
+            try:
+                if fcntl:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                else:
+                    msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+                break
+            except OSError:
+                if time.monotonic() >= deadline:
+                    os.close(fd)
+                    raise TimeoutError(f"Another program has held {self.lock_path} for over {self.timeout} seconds")
+                time.sleep(LOCK_RETRY_SECONDS)
+        self.fd = fd
+    
+    def release(self):
+        if self.fd is None:
+            return
+        try:
+            if fcntl:
+                fcntl.flock(self.fd, fcntl.LOCK_UN)
+            else:
+                os.lseek(self.fd, 0, os.SEEK_SET)
+                msvcrt.locking(self.fd, msvcrt.LK_UNLCK, 1)
+        finally:
+            os.close(self.fd)
+            self.fd = None
+    
+    def __enter__(self):
+        self.acquire()
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
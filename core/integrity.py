@@ -0,0 +1,144 @@
+# Checks the history for problems that creep in over time: entries pointing at deleted
+# players, a player entered twice in one session, sessions that don't balance, negative
+# amounts and dates that don't parse.
+#
+# Each session is summarised in one pass over its entries (the ids it references, its
+# duplicates, negatives and balance) and the summaries are kept between scans, so a
+# rescan only revisits sessions whose events or date changed. Orphans are found by
+# checking those id indexes against the current players, which needs no rescan.
+import datetime
+from core import events, ledger, money
+from core.models import new_player
+
+ISSUE_KINDS = ("orphan", "duplicate", "unbalanced", "negative", "bad_date")
+
+# Unbalanced sessions need someone to find the wrong amount, the rest can be repaired in bulk
+FIXABLE_KINDS = ("orphan", "duplicate", "negative", "bad_date")
+
+def scan_session(session):
+    """Summarise one session's entries for the scanner"""
+    player_ids = set()
+    duplicates = []
+    negative = []
+    balance = 0
+    
+    for entry in session["players"]:
+        player_id = entry["id"]
+        if player_id in player_ids and player_id not in duplicates:
+            duplicates.append(player_id)
+        player_ids.add(player_id)
+        if min(entry["buyin"], entry.get("rebuys", 0), entry.get("cashout", 0)) < 0 and player_id not in negative:
+            negative.append(player_id)
+        balance += ledger.entry_profit(entry)
+    
+    return {
+        "player_ids": player_ids,
+        "duplicates": duplicates,
+        "negative": negative,
+        "balance": balance,
+        "bad_date": not valid_date(session.get("date"))
+    }
+
+def valid_date(value):
+    try:
+        datetime.datetime.fromisoformat(value)
+        return True
+    except (TypeError, ValueError):
+        return False
+
+def issue(kind, session, message, player_id=None):
+    return {"kind": kind, "session_id": session["id"], "player_id": player_id, "message": message}
+
+class IntegrityScanner:
+    """Finds integrity issues, rescanning only the sessions changed since the last scan"""
+    def __init__(self):
+        self.summaries = {}
+        self.last_scanned = 0
+    
+    def scan(self, players, sessions, live_ids=()):
+        """Return every issue as a dict with kind, session_id, player_id and message
+        
+        Sessions in live_ids are still being played, so they aren't expected to balance."""
+        player_ids = {player["id"] for player in players}
+        summaries = {}
+        self.last_scanned = 0
+        for session in sessions:
+            token = events.change_token(session)
+            cached = self.summaries.get(session["id"])
+            if cached is None or cached[0] != token:
+                cached = (token, scan_session(session))
+                self.last_scanned += 1
+            summaries[session["id"]] = cached
+        self.summaries = summaries
+        
+        issues = []
+        for session in sessions:
+            summary = summaries[session["id"]][1]
+            name = session.get("name", session["id"])
+            for player_id in sorted(summary["player_ids"] - player_ids):
+                issues.append(issue("orphan", session, f"{name}: entry for deleted player {player_id}", player_id))
+            for player_id in summary["duplicates"]:
+                issues.append(issue("duplicate", session, f"{name}: player {player_id} entered more than once", player_id))
+            for player_id in summary["negative"]:
+                issues.append(issue("negative", session, f"{name}: negative amount for player {player_id}", player_id))
+            if summary["balance"] != 0 and session["id"] not in live_ids:
+                issues.append(issue("unbalanced", session, f"{name}: unbalanced by "
+                                                           f"{money.format_pence(summary['balance'])}"))
+            if summary["bad_date"]:
+                issues.append(issue("bad_date", session, f"{name}: malformed date {session.get('date')!r}"))
+        return issues
+
+def fix_issues(store, issues, kinds=FIXABLE_KINDS):
+    """Repair the issues of the given kinds, returning how many were fixed
+    
+    Orphaned entries get a placeholder player with the missing id, so the history keeps
+    its amounts. Duplicate entries are merged into one. Negative amounts are set to
+    zero. Malformed dates are taken from the session's first event where possible."""
+    fixed = 0
+    for kind in FIXABLE_KINDS:
+        if kind not in kinds:
+            continue
+        for found in issues:
+            if found["kind"] != kind:
+                continue
+            session = store.get_session_by_id(found["session_id"])
+            if session is None:
+                continue
+            if kind == "orphan":
+                if store.get_player_by_id(found["player_id"]) is None:
+                    player = new_player(f"Deleted player {found['player_id'][:8]}",
+                                        note="Recreated by the data check for old session entries")
+                    player["id"] = found["player_id"]
+                    store.players.append(player)
+                fixed += 1
+            elif kind == "duplicate":
+                merge_duplicate_entries(session, found["player_id"])
+                fixed += 1
+            elif kind == "negative":
+                for entry in [e for e in session["players"] if e["id"] == found["player_id"]]:
+                    ledger.set_entry_amounts(session, entry["id"], max(entry["buyin"], 0),
+                                             max(entry.get("rebuys", 0), 0), max(entry.get("cashout", 0), 0))
+                fixed += 1
+            elif kind == "bad_date":
+                first = next((event["at"] for event in session.get("events", []) if valid_date(event.get("at"))), None)
+                if first:
+                    session["date"] = first
+                    store.mark_dirty(session)
+                    fixed += 1
+    return fixed
+
+def merge_duplicate_entries(session, player_id):
+    """Replace a player's several entries in a session with one holding their sums"""
+    copies = [entry for entry in session["players"] if entry["id"] == player_id]
+    buyin = sum(entry["buyin"] for entry in copies)
+    rebuys = sum(entry.get("rebuys", 0) for entry in copies)
+    cashout = sum(entry.get("cashout", 0) for entry in copies)
+    
+    # A leave removes the first matching entry, so remove every copy and seat them again
+    for _ in copies:
+        events.record_event(session, "leave", player_id)
+    events.record_event(session, "seat", player_id, buyin)
+    if rebuys:
+        events.record_event(session, "rebuy", player_id, rebuys)
+    if cashout:
+        events.record_event(session, "cashout", player_id, cashout)
@@ -0,0 +1,61 @@
+# Leaderboards over the per-player stats. The rows are built once from the aggregates
+# (stats, spread and drawdown metrics, ratings); after that, ranking by any column only
+# orders precomputed values and never touches the sessions. A top or bottom k is a heap
+# query, O(n log k), and a full ordering by a column is sorted once and cached for as
+# long as the rows are, so flipping between columns costs nothing the second time.
+import heapq
+
+# Columns a leaderboard can rank by
+RANK_KEYS = ("name", "sessions", "buyins", "cashouts", "profit", "avg_profit", "std_dev", "max_drawdown",
+             "longest_losing_streak", "consistency", "rating")
+
+def build_rows(players, stats, metrics, ratings):
+    """One row per player who has played, combining their stats, metrics and rating"""
+    rows = []
+    for player in players:
+        player_stats = stats.get(player["id"])
+        if not player_stats:
+            continue
+        row = dict(player_stats, id=player["id"], name=player["name"])
+        row.update(metrics.get(player["id"], {"std_dev": None, "max_drawdown": None, "longest_losing_streak": None,
+                                              "consistency": None}))
+        row["rating"] = ratings.rating(player["id"])
+        rows.append(row)
+    return rows
+
+def rank_value(row, key, ascending=False):
+    # Rows without a value, like a rating before a player's first rated session, rank last
+    value = row.get(key)
+    if key == "name":
+        return value.lower()
+    if value is None:
+        return float("inf") if ascending else float("-inf")
+    return value
+
+class Leaderboard:
+    """Top-k queries and cached orderings over a fixed set of player rows"""
+    def __init__(self, rows):
+        self.rows = rows
+        self.orders = {}
+    
+    def check_key(self, key):
+        if key not in RANK_KEYS:
+            raise ValueError(f"Can't rank players by {key}")
+    
+    def top(self, key, count, lowest=False):
+        """The count rows with the highest values for key, or the lowest"""
+        self.check_key(key)
+        order = self.orders.get((key, not lowest))
+        if order is not None:
+            return order[:count]
+        select = heapq.nsmallest if lowest else heapq.nlargest
+        return select(count, self.rows, key=lambda row: rank_value(row, key, lowest))
+    
+    def sorted(self, key, descending=True):
+        """Every row ordered by key, cached until the rows change"""
+        self.check_key(key)
+        order = self.orders.get((key, descending))
+        if order is None:
+            order = sorted(self.rows, key=lambda row: rank_value(row, key, not descending), reverse=descending)
+            self.orders[(key, descending)] = order
+        return order
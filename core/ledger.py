@@ -0,0 +1,168 @@
+from core import events
+
+def entry_total_in(entry):
+    """Buy-in plus rebuys for one session entry"""
+    return entry["buyin"] + entry.get("rebuys", 0)
+
+def entry_profit(entry):
+    """Cash-out minus everything put in"""
+    return entry.get("cashout", 0) - entry_total_in(entry)
+
+def session_totals(session):
+    """Return (total buy-ins, total rebuys, total cash-outs) for a session, in pence"""
+    # Event-sourced sessions keep running totals, older data is summed from the entries
+    totals = session.get("totals")
+    if totals is not None:
+        return totals["buyin"], totals["rebuys"], totals["cashout"]
+    
+    total_buyin = 0
+    total_rebuys = 0
+    total_cashout = 0
+    
+    for entry in session["players"]:
+        total_buyin += entry["buyin"]
+        total_rebuys += entry.get("rebuys", 0)
+        total_cashout += entry.get("cashout", 0)
+    
+    return total_buyin, total_rebuys, total_cashout
+
+def session_balance(session):
+    """Cash-outs minus money in, zero for a balanced session"""
+    total_buyin, total_rebuys, total_cashout = session_totals(session)
+    return total_cashout - (total_buyin + total_rebuys)
+
+def is_balanced(session):
+    # Amounts are whole pence, so there is no rounding error to allow for
+    return session_balance(session) == 0
+
+def unbalanced_sessions(sessions):
+    """Return (session, balance in pence) for every session whose entries don't balance
+    
+    Balances are summed again from the entries rather than trusted from the running
+    totals, in one vectorised pass over the whole history when numpy is installed."""
+    sessions = list(sessions)
+    try:
+        import numpy as np
+    except ImportError:
+        np = None
+    
+    if np is None or not sessions:
+        balances = [sum(entry_profit(entry) for entry in session["players"]) for session in sessions]
+    else:
+        counts = np.fromiter((len(session["players"]) for session in sessions), dtype=np.int64, count=len(sessions))
+        total = int(counts.sum())
+        columns = {}
+        for field in ("buyin", "rebuys", "cashout"):
+            columns[field] = np.fromiter((entry.get(field, 0) for session in sessions for entry in session["players"]),
+                                         dtype=np.int64, count=total)
+        profits = columns["cashout"] - columns["buyin"] - columns["rebuys"]
+        # Sum each session's slice of the flat columns
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        balances = np.zeros(len(sessions), dtype=np.int64)
+        seated = counts > 0
+        if total:
+            balances[seated] = np.add.reduceat(profits, starts[seated])
+        balances = balances.tolist()
+    
+    return [(session, balance) for session, balance in zip(sessions, balances) if balance != 0]
+
+def validate_amounts(buyin, rebuys=0, cashout=0):
+    """Check amounts are whole pence, rejecting anything negative or non-numeric"""
+    amounts = buyin, rebuys, cashout
+    if any(isinstance(amount, bool) or not isinstance(amount, int) for amount in amounts):
+        raise ValueError("Amounts must be whole pence")
+    if any(amount < 0 for amount in amounts):
+        raise ValueError("Values cannot be negative")
+    return amounts
+
+def add_entry(session, player_id, buyin):
+    """Seat a player in a session with their initial buy-in"""
+    buyin = validate_amounts(buyin)[0]
+    if buyin <= 0:
+        raise ValueError("Buy-in amount must be greater than 0.")
+    if any(entry["id"] == player_id for entry in session["players"]):
+        raise ValueError("Player is already in this session")
+    
+    events.record_event(session, "seat", player_id, buyin)
+    return find_entry(session, player_id)
+
+def update_entry(session, index, buyin, rebuys, cashout):
+    """Set the amounts of the entry at the given position"""
+    entry = session["players"][index]
+    return set_entry_amounts(session, entry["id"], buyin, rebuys, cashout, index)
+
+def set_entry_amounts(session, player_id, buyin, rebuys, cashout, index=None):
+    """Record the events that bring a player's entry to the given amounts
+    
+    index picks one of a player's several entries in legacy data, by default the first."""
+    buyin, rebuys, cashout = validate_amounts(buyin, rebuys, cashout)
+    if index is None:
+        entry = find_entry(session, player_id)
+        extra = {}
+    else:
+        entry = session["players"][index]
+        extra = {"index": index}
+    
+    if buyin != entry["buyin"]:
+        events.record_event(session, "buyin", player_id, buyin - entry["buyin"], **extra)
+    if rebuys != entry.get("rebuys", 0):
+        events.record_event(session, "rebuy", player_id, rebuys - entry.get("rebuys", 0), **extra)
+    if cashout != entry.get("cashout", 0):
+        events.record_event(session, "cashout", player_id, cashout, **extra)
+    
+    return entry
+
+def find_entry(session, player_id):
+    """Return the player's entry in a session, raising if they aren't seated"""
+    for entry in session["players"]:
+        if entry["id"] == player_id:
+            return entry
+    raise ValueError("Player is not in this session")
+
+def record_rebuy(session, player_id, amount):
+    """Add a rebuy to a player's running total"""
+    amount = validate_amounts(amount)[0]
+    if amount <= 0:
+        raise ValueError("Rebuy amount must be greater than 0.")
+    find_entry(session, player_id)
+    events.record_event(session, "rebuy", player_id, amount)
+    return find_entry(session, player_id)
+
+def set_cashout(session, player_id, amount):
+    amount = validate_amounts(amount)[0]
+    find_entry(session, player_id)
+    events.record_event(session, "cashout", player_id, amount)
+    return find_entry(session, player_id)
+
+def remove_entry(session, index):
+    entry = session["players"][index]
+    events.record_event(session, "leave", entry["id"])
+    return entry
+
+def complete_session(session):
+    """Mark a session as finished"""
+    session["status"] = "completed"
+    return session
+
+def apply_entry_changes(sessions, changes):
+    """Apply buy-in/rebuys/cash-out changes, in pence, to the matching session entries"""
+    sessions_by_id = {session["id"]: session for session in sessions}
+    applied = 0
+    
+    for change in changes:
+        session = sessions_by_id.get(change["session_id"])
+        if not session:
+            continue
+        # Rows pulled from the sheet say which of a player's entries they are
+        index = change.get("entry_index")
+        players = session["players"]
+        if index is not None and (index >= len(players) or players[index]["id"] != change["player_id"]):
+            continue
+        try:
+            set_entry_amounts(session, change["player_id"], change["buyin"], change["rebuys"], change["cashout"],
+                              index)
+        except ValueError:
+            continue
+        applied += 1
+    
+    return applied
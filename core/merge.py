@@ -0,0 +1,81 @@
+# Three-way merge of players and sessions when another program saved the data file
+# after we loaded it. Each record carries a version that is bumped whenever it is saved
+# with changes, and the store remembers every record as it was last read or written
+# (the base). A record changed on one side only takes that side; a record changed on
+# both sides is merged field by field, keeping our value where both changed a field.
+import json
+from core.entries import json_default
+
+# Session fields derived from the event stream, merged as one unit so they stay consistent
+SESSION_EVENT_FIELDS = ("players", "totals", "events", "snapshots")
+
+def fingerprint(record):
+    """Canonical JSON text of a record, used to spot changes and to keep the base copy"""
+    return json.dumps(record, sort_keys=True, separators=(",", ":"), default=json_default)
+
+def merge_records(base, local, theirs, groups=()):
+    """Merge local and their records against the shared base
+    
+    base maps record id to (version, fingerprint) as last read or written. Returns the
+    merged list, local records first in their order, and the ids where both sides
+    changed the same field. Merged local records are updated in place so references to
+    them stay valid."""
+    theirs_by_id = {record["id"]: record for record in theirs}
+    merged = []
+    conflicts = []
+    
+    for record in local:
+        known = base.get(record["id"])
+        their = theirs_by_id.pop(record["id"], None)
+        local_changed = known is None or fingerprint(record) != known[1]
+        if their is None:
+            # Deleted elsewhere, unless we edited it since
+            if local_changed:
+                merged.append(record)
+            continue
+        their_changed = known is None or their.get("version", 0) != known[0] or fingerprint(their) != known[1]
+        
+        if their_changed and not local_changed:
+            replace(record, their)
+        elif their_changed:
+            result, clashed = merge_fields(json.loads(known[1]) if known else {}, record, their, groups)
+            replace(record, result)
+            if clashed:
+                conflicts.append(record["id"])
+        merged.append(record)
+    
+    for their in theirs_by_id.values():
+        known = base.get(their["id"])
+        # New elsewhere, or deleted here but edited elsewhere since
+        if known is None or their.get("version", 0) != known[0] or fingerprint(their) != known[1]:
+            merged.append(their)
+    
+    return merged, conflicts
+
+def merge_fields(base, local, theirs, groups=()):
+    """Field by field three-way merge of one record, returning (merged, clashed)"""
+    grouped = {field for group in groups for field in group}
+    units = [tuple(group) for group in groups]
+    units += [(field,) for field in sorted(set(local) | set(theirs)) if field not in grouped and field != "version"]
+    
+    merged = dict(local)
+    clashed = False
+    for unit in units:
+        base_value = [base.get(field) for field in unit]
+        local_value = [local.get(field) for field in unit]
+        their_value = [theirs.get(field) for field in unit]
+        if local_value == base_value and their_value != base_value:
+            for field in unit:
+                if field in theirs:
+                    merged[field] = theirs[field]
+                else:
+                    merged.pop(field, None)
+        elif local_value != their_value and their_value != base_value:
+            clashed = True
+    
+    merged["version"] = max(local.get("version", 0), theirs.get("version", 0))
+    return merged, clashed
+
+def replace(record, values):
+    record.clear()
+    record.update(values)
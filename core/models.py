@@ -0,0 +1,42 @@
+import datetime
+import uuid
+from core.entries import Entry
+
+def new_player(name, email="", phone="", note=""):
+    """Create a player record"""
+    name = name.strip()
+    if not name:
+        raise ValueError("Player name is required")
+    
+    return {
+        "id": str(uuid.uuid4()),
+        "name": name,
+        "email": email.strip(),
+        "phone": phone.strip(),
+        "note": note.strip(),
+        "created_at": datetime.datetime.now().isoformat()
+    }
+
+def new_session(name):
+    """Create an empty session record"""
+    name = name.strip()
+    if not name:
+        raise ValueError("Session name cannot be empty")
+    
+    return {
+        "id": str(uuid.uuid4()),
+        "name": name,
+        "date": datetime.datetime.now().isoformat(),
+        "players": []
+    }
+
+def new_entry(player_id, buyin):
+    """Create a player's entry in a session"""
+    return Entry(player_id, buyin)
+
+def find_by_id(records, record_id):
+    """Return the player or session with the given id, or None"""
+    for record in records:
+        if record["id"] == record_id:
+            return record
+    return None
@@ -0,0 +1,70 @@
+# Money is held as integer pence everywhere in the model, the data file and the sync
+# state, so sums are exact and a balanced session balances to exactly zero. Pounds only
+# appear at the edges: parsing what people type, display, the Sheets cells, the table
+# API and payment links.
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+PENCE_PER_POUND = 100
+
+# Marks a data file whose amounts are already in pence
+MONEY_FORMAT = "pence"
+
+def to_pence(pounds):
+    """Convert pounds, as a number or text like "12.50", to whole pence"""
+    if isinstance(pounds, bool):
+        raise ValueError("Amounts must be numbers")
+    if isinstance(pounds, int):
+        return pounds * PENCE_PER_POUND
+    try:
+        # Going through the shortest repr keeps 0.1 + 0.2 style floats on the penny they meant
+        value = Decimal(str(pounds).strip().lstrip("£"))
+        return int((value * PENCE_PER_POUND).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+    except (InvalidOperation, ValueError):
+        raise ValueError("Amounts must be numbers")
+
+def to_pounds(pence):
+    """Pounds as a float, for the API, the sheet and payment providers"""
+    return pence / PENCE_PER_POUND
+
+def format_pence(pence, symbol="£"):
+    """Format pence as currency without going through floats"""
+    sign = "-" if pence < 0 else ""
+    pounds, remainder = divmod(abs(pence), PENCE_PER_POUND)
+    return f"{symbol}{sign}{pounds}.{remainder:02d}"
+
+def migrate_data(data):
+    """Convert the amounts in a data file written with float pounds to pence, in place"""
+    if data.get("money") == MONEY_FORMAT:
+        return False
+    sessions = list(data.get("sessions", [])) + list(data.get("live_sessions", []))
+    if data.get("current_session"):
+        sessions.append(data["current_session"])
+    for session in sessions:
+        migrate_session(session)
+    data["money"] = MONEY_FORMAT
+    return True
+
+def migrate_session(session):
+    # Running totals carry float drift, so they are summed again from the converted entries
+    for view in [session] + session.get("snapshots", []):
+        for entry in view["players"]:
+            migrate_amounts(entry, ("buyin", "rebuys", "cashout"))
+        if "totals" in view:
+            view["totals"] = {field: sum(entry.get(field, 0) for entry in view["players"])
+                              for field in ("buyin", "rebuys", "cashout")}
+    for event in session.get("events", []):
+        migrate_amounts(event, ("amount",))
+        previous = event.get("previous")
+        if isinstance(previous, dict):
+            migrate_amounts(previous, ("buyin", "rebuys", "cashout"))
+        elif previous is not None:
+            event["previous"] = to_pence(previous)
+    settlement = session.get("settlement")
+    if settlement:
+        for transfer in settlement.get("payments", []) + settlement.get("distributions", []):
+            migrate_amounts(transfer, ("amount",))
+
+def migrate_amounts(record, fields):
+    for field in fields:
+        if field in record:
+            record[field] = to_pence(record[field])
@@ -0,0 +1,82 @@
+# How players do against each other: for every pair who have shared a table, how many
+# completed sessions they played together and each one's net result in those sessions.
+#
+# This is the players x players product of the session/player incidence matrix, kept
+# sparse as a dict of rows holding only the partners a player has actually met. Each
+# session adds its own small block (players at the table squared), so a session ending
+# costs that block and nothing else, and the rows stay small however many players the
+# history holds. Edits to older sessions rebuild the matrix.
+import heapq
+from core.events import change_token
+from core.ledger import entry_profit
+
+class CoOccurrence:
+    """Sparse counts and results of players sharing a table"""
+    def __init__(self):
+        self.reset()
+    
+    def reset(self):
+        # Player id -> partner id -> [sessions together, the player's net result in them]
+        self.rows = {}
+        # Player id -> [sessions, net result] over all their sessions, to compare against
+        self.totals = {}
+        self.tokens = []
+    
+    def update(self, sessions):
+        """Bring the matrix up to date with the completed sessions"""
+        tokens = [(session["id"], change_token(session)) for session in sessions]
+        if tokens[:len(self.tokens)] != self.tokens:
+            self.reset()
+        for session in sessions[len(self.tokens):]:
+            self.add(session)
+        self.tokens = tokens
+        return self
+    
+    def add(self, session):
+        # One column of the incidence matrix, with anyone entered twice counted once
+        results = {}
+        for entry in session["players"]:
+            results[entry["id"]] = results.get(entry["id"], 0) + entry_profit(entry)
+        
+        for player_id, profit in results.items():
+            total = self.totals.setdefault(player_id, [0, 0])
+            total[0] += 1
+            total[1] += profit
+            row = self.rows.setdefault(player_id, {})
+            for partner_id in results:
+                if partner_id != player_id:
+                    cell = row.setdefault(partner_id, [0, 0])
+                    cell[0] += 1
+                    cell[1] += profit
+    
+    def pair(self, player_id, partner_id):
+        """How the player did in sessions the partner also played, or None if they never met"""
+        cell = self.rows.get(player_id, {}).get(partner_id)
+        if cell is None:
+            return None
+        sessions, profit = cell
+        partner_profit = self.rows[partner_id][player_id][1]
+        total_sessions, total_profit = self.totals[player_id]
+        return {
+            "sessions": sessions,
+            "profit": profit,
+            "avg_profit": round(profit / sessions),
+            "partner_profit": partner_profit,
+            "overall_avg_profit": round(total_profit / total_sessions)
+        }
+    
+    def top_partners(self, player_id, count=10, key="sessions", lowest=False):
+        """The player's top partners by sessions together, or by the player's profit or average with them
+        
+        Returns (partner id, pair stats) pairs, best first, or worst first if lowest is set."""
+        row = self.rows.get(player_id, {})
+        if key == "sessions":
+            rank = lambda item: item[1][0]
+        elif key == "profit":
+            rank = lambda item: item[1][1]
+        elif key == "avg_profit":
+            rank = lambda item: item[1][1] / item[1][0]
+        else:
+            raise ValueError(f"Can't rank partners by {key}")
+        best = (heapq.nsmallest if lowest else heapq.nlargest)(count, row.items(), key=rank)
+        return [(partner_id, self.pair(player_id, partner_id)) for partner_id, _ in best]
@@ -0,0 +1,60 @@
+# Skill ratings from session results. Each completed session is treated as a ranking of
+# the players at the table by profit, and scored Elo-style as a round robin: every player
+# gains or loses against every other player there, in proportion to how surprising the
+# result was given their ratings going in, with K shared out over the opponents.
+#
+# Sessions are applied in date order through the same index as the windowed stats, so a
+# session ending applies just that session, and edits to older sessions replay the
+# history once. Each player's rating after every session is kept, for their trend.
+from core.ledger import entry_profit
+from core.windows import DateOrderedIndex
+
+INITIAL_RATING = 1500
+K_FACTOR = 32
+
+# Sessions to look back over for a player's trend
+TREND_SESSIONS = 5
+
+def expected_score(rating, opponent):
+    return 1 / (1 + 10 ** ((opponent - rating) / 400))
+
+class RatingEngine(DateOrderedIndex):
+    """Elo-style ratings over the completed sessions, with each player's history"""
+    def reset(self):
+        super().reset()
+        self.ratings = {}
+        # Player id -> [(day, rating after the session)] in date order
+        self.history = {}
+    
+    def add(self, day, session):
+        results = {}
+        for entry in session["players"]:
+            results[entry["id"]] = results.get(entry["id"], 0) + entry_profit(entry)
+        if len(results) < 2:
+            return
+        
+        # Everyone is scored against the ratings from before the session
+        before = {player_id: self.ratings.get(player_id, INITIAL_RATING) for player_id in results}
+        k = K_FACTOR / (len(results) - 1)
+        for player_id, profit in results.items():
+            change = 0.0
+            for opponent_id, opponent_profit in results.items():
+                if opponent_id != player_id:
+                    actual = 1.0 if profit > opponent_profit else 0.5 if profit == opponent_profit else 0.0
+                    change += actual - expected_score(before[player_id], before[opponent_id])
+            rating = before[player_id] + k * change
+            self.ratings[player_id] = rating
+            self.history.setdefault(player_id, []).append((day, rating))
+    
+    def rating(self, player_id):
+        """The player's current rating, rounded, or None if they haven't played a rated session"""
+        rating = self.ratings.get(player_id)
+        return round(rating) if rating is not None else None
+    
+    def trend(self, player_id, sessions=TREND_SESSIONS):
+        """How far the player's rating moved over their last few rated sessions"""
+        history = self.history.get(player_id)
+        if not history:
+            return 0
+        start = history[-sessions - 1][1] if len(history) > sessions else INITIAL_RATING
+        return round(history[-1][1] - start)
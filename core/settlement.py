@@ -0,0 +1,125 @@
+import hashlib
+import json
+import datetime
+import utils
+from core.ledger import entry_profit
+from core.money import to_pounds
+
+def session_content_hash(session):
+    """Hash the session entries a settlement depends on"""
+    # Hashed in pounds so settlements stored before amounts were in pence stay valid
+    entries = sorted(
+        (p["id"], to_pounds(p["buyin"]), to_pounds(p.get("rebuys", 0)), to_pounds(p.get("cashout", 0)))
+        for p in session["players"]
+    )
+    return hashlib.sha1(json.dumps(entries).encode()).hexdigest()
+
+def calculate_transfers(session, players):
+    """Split a session's players into debtors (owe money) and winners (are owed money), amounts in pence"""
+    players_by_id = {p["id"]: p for p in players}
+    debtors = []
+    winners = []
+
+    for player in session["players"]:
+        player_obj = players_by_id.get(player["id"])
+        if not player_obj:
+            continue
+
+        profit = entry_profit(player)
+
+        if profit < 0:  # Player owes money
+            debtors.append({
+                "id": player["id"],
+                "name": player_obj["name"],
+                "amount": abs(profit)
+            })
+        elif profit > 0:  # Player won money
+            winners.append({
+                "id": player["id"],
+                "name": player_obj["name"],
+                "amount": profit,
+                "email": player_obj.get("email", "")
+            })
+
+    return debtors, winners
+
+def build_settlement(session, players, payment_manager):
+    """Compute transfers and payment links for a session
+
+    The link URL doubles as the QR payload, so the dialogs can render the
+    stored settlement without calling the payment API again."""
+    session_settlement = new_settlement(session, players)
+    attach_links(session_settlement, create_links(session, session_settlement, payment_manager))
+    return session_settlement
+
+def new_settlement(session, players):
+    """A session's settlement with its transfers but no links yet"""
+    debtors, winners = calculate_transfers(session, players)
+    for transfer in debtors + winners:
+        transfer["url"] = None
+
+    utils.debug_log(f"Built settlement for {session.get('name', 'Poker Session')}: "
+                    f"{len(debtors)} payments, {len(winners)} distributions")
+
+    return {
+        "hash": session_content_hash(session),
+        "created_at": datetime.datetime.now().isoformat(),
+        "payments": debtors,
+        "distributions": winners
+    }
+
+def create_links(session, settlement, payment_manager):
+    """Payment and distribution link URLs for a settlement's transfers, keyed by player id
+
+    Only reads the settlement, so it can run off the UI thread while the settlement is shown."""
+    session_name = session.get("name", "Poker Session")
+    date = session.get("date", "").split("T")[0]
+
+    # Links for players who owe money, skipping any already made
+    debtors = [debtor for debtor in settlement["payments"] if not debtor.get("url")]
+    description = f"Payment for {session_name} on {date}"
+    if not debtors:
+        payments = {}
+    elif hasattr(payment_manager, "create_payment_links"):
+        payments = payment_manager.create_payment_links(session["id"], debtors, description)
+    else:
+        payments = {
+            debtor["id"]: payment_manager.create_payment_link(to_pounds(debtor["amount"]), description, debtor["name"])
+            for debtor in debtors
+        }
+
+    # Links for winners can only be made up front if we already know their email
+    distributions = {
+        winner["id"]: create_distribution_link(session, payment_manager, winner["amount"], winner["email"])
+        for winner in settlement["distributions"] if winner["email"] and not winner.get("url")
+    }
+
+    return {"payments": payments, "distributions": distributions}
+
+def attach_links(settlement, links):
+    """Store the URLs from create_links on the settlement's transfers"""
+    for kind in ("payments", "distributions"):
+        for transfer in settlement[kind]:
+            if transfer["id"] in links[kind]:
+                transfer["url"] = links[kind][transfer["id"]]
+
+def missing_links(settlement):
+    """Whether any transfer that could have a link is still without one"""
+    return (any(not debtor.get("url") for debtor in settlement["payments"]) or
+            any(winner["email"] and not winner.get("url") for winner in settlement["distributions"]))
+
+def create_distribution_link(session, payment_manager, amount, email):
+    """Create the link used to send a winner their share"""
+    session_name = session.get("name", "Poker Session")
+    date = session.get("date", "").split("T")[0]
+    description = f"Winnings from {session_name} on {date}"
+    return payment_manager.create_email_payment_link(to_pounds(amount), email, description)
+
+def get_valid_settlement(session):
+    """Return the stored settlement, or None if the entries changed since it was built"""
+    settlement = session.get("settlement")
+    if not settlement:
+        return None
+    if settlement.get("hash") != session_content_hash(session):
+        return None
+    return settlement
@@ -0,0 +1,102 @@
+# Monte Carlo answers to "am I running bad?": replay a player's own session results many
+# times over to see the spread of win rates and final results luck alone gives, and how
+# often a bankroll would run out along the way.
+#
+# Each trial draws a run of sessions, either resampled from the player's history
+# (bootstrap) or from a normal distribution fitted to it. Trials are generated a batch
+# at a time as numpy arrays, and batches are spread over a process pool, each with its
+# own independent random stream. numpy is only needed here, so it is imported lazily.
+import multiprocessing
+import os
+from statistics import NormalDist
+from concurrent.futures import ProcessPoolExecutor
+from core.ledger import entry_profit
+
+METHODS = ("bootstrap", "normal")
+
+# Trials generated at once by a worker, bounding memory to a few tens of MB per process
+BATCH_TRIALS = 20000
+
+def require_numpy():
+    try:
+        import numpy as np
+    except ImportError:
+        raise ImportError("The luck simulation needs numpy, install it with: pip install numpy")
+    return np
+
+def player_results(sessions, player_id):
+    """The player's profit in pence in each session they played"""
+    results = []
+    for session in sessions:
+        profit = None
+        for entry in session["players"]:
+            if entry["id"] == player_id:
+                profit = (profit or 0) + entry_profit(entry)
+        if profit is not None:
+            results.append(profit)
+    return results
+
+def run_trials(results, horizon, trials, bankroll, method, seed):
+    """Simulate trials runs of horizon sessions, returning each trial's final result and whether it went broke"""
+    np = require_numpy()
+    rng = np.random.default_rng(seed)
+    results = np.asarray(results, dtype=np.float64)
+    finals = np.empty(trials)
+    ruined = np.empty(trials, dtype=bool)
+    
+    for start in range(0, trials, BATCH_TRIALS):
+        count = min(BATCH_TRIALS, trials - start)
+        if method == "bootstrap":
+            draws = rng.choice(results, size=(count, horizon))
+        else:
+            draws = rng.normal(results.mean(), results.std(ddof=1) if len(results) > 1 else 0.0,
+                               size=(count, horizon))
+        paths = np.cumsum(draws, axis=1)
+        finals[start:start + count] = paths[:, -1]
+        ruined[start:start + count] = bankroll + paths.min(axis=1) <= 0
+    return finals, ruined
+
+def interval(values, np, confidence):
+    tail = (1 - confidence) / 2 * 100
+    low, median, high = np.percentile(values, [tail, 50, 100 - tail])
+    return {"low": round(float(low)), "median": round(float(median)), "high": round(float(high))}
+
+def simulate(results, horizon, bankroll, trials=10000, method="bootstrap", confidence=0.95, workers=None, seed=None):
+    """Confidence intervals for a player's win rate and final result over horizon sessions, and risk of ruin
+    
+    results are the player's past session results and bankroll what they start with, in
+    pence. Win rates are per session, and ruin means the bankroll hits zero at any point.
+    workers defaults to one process per CPU; 1 runs in this process."""
+    np = require_numpy()
+    if method not in METHODS:
+        raise ValueError(f"Unknown simulation method: {method}")
+    if len(results) < 2:
+        raise ValueError("At least two sessions are needed to simulate")
+    if horizon < 1 or trials < 1:
+        raise ValueError("Sessions and trials must be at least 1")
+    
+    workers = max(1, min(workers or os.cpu_count() or 1, trials))
+    shares = [trials // workers + (1 if i < trials % workers else 0) for i in range(workers)]
+    seeds = np.random.SeedSequence(seed).spawn(workers)
+    jobs = [(results, horizon, share, bankroll, method, child) for share, child in zip(shares, seeds)]
+    if workers == 1:
+        parts = [run_trials(*jobs[0])]
+    else:
+        # Spawn rather than fork, it runs from a worker thread of the Tk process
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            parts = list(pool.map(run_trials, *zip(*jobs)))
+    
+    finals, ruined = (np.concatenate(part) for part in zip(*parts))
+    # Normal approximation to the binomial for the ruin estimate
+    ruin = float(ruined.mean())
+    margin = NormalDist().inv_cdf((1 + confidence) / 2) * (ruin * (1 - ruin) / trials) ** 0.5
+    return {
+        "trials": trials,
+        "sessions": horizon,
+        "method": method,
+        "observed_win_rate": round(sum(results) / len(results)),
+        "win_rate": interval(finals / horizon, np, confidence),
+        "final": interval(finals, np, confidence),
+        "risk_of_ruin": ruin,
+        "risk_of_ruin_interval": (max(ruin - margin, 0.0), min(ruin + margin, 1.0))
+    }
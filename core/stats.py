@@ -0,0 +1,154 @@
+import math
+from core.ledger import entry_total_in
+from core.events import session_events
+
+def calculate_player_stats(player_id, sessions):
+    """Calculate stats for a player across all sessions"""
+    return calculate_all_player_stats(sessions).get(player_id, empty_stats())
+
+def calculate_all_player_stats(sessions):
+    """Calculate stats for every player in one pass over the sessions, keyed by player id
+    
+    Amounts are in pence, with the average rounded to the nearest penny."""
+    totals = {}
+    
+    for session in sessions:
+        for entry in session["players"]:
+            stats = totals.get(entry["id"])
+            if stats is None:
+                stats = totals[entry["id"]] = empty_stats()
+            stats["sessions"] += 1
+            stats["buyins"] += entry_total_in(entry)
+            stats["cashouts"] += entry.get("cashout", 0)
+    
+    for stats in totals.values():
+        stats["profit"] = stats["cashouts"] - stats["buyins"]
+        stats["avg_profit"] = round(stats["profit"] / stats["sessions"])
+    
+    return totals
+
+def empty_stats():
+    return {
+        "sessions": 0,
+        "buyins": 0,
+        "cashouts": 0,
+        "profit": 0,
+        "avg_profit": 0
+    }
+
+class PlayerStatsProjection:
+    """Per-player totals kept up to date from session events
+    
+    update() only applies the events recorded since its last call, so keeping the
+    stats current costs time in proportion to what changed, not to the history."""
+    def __init__(self):
+        self.reset()
+    
+    def reset(self):
+        self.totals = {}
+        self.applied = {}
+        self.seats = {}
+    
+    def update(self, sessions):
+        # Deleted or replaced sessions can't be unapplied event by event, so start over
+        current = {session["id"]: session for session in sessions}
+        for session_id, (events, _) in self.applied.items():
+            session = current.get(session_id)
+            if session is None or session_events(session) is not events:
+                self.reset()
+                break
+        
+        for session in sessions:
+            events = session_events(session)
+            start = self.applied.get(session["id"], (None, 0))[1]
+            for event in events[start:]:
+                self.apply(session["id"], event)
+            self.applied[session["id"]] = (events, len(events))
+        return self
+    
+    def apply(self, session_id, event):
+        stats = self.totals.get(event["player_id"])
+        if stats is None:
+            stats = self.totals[event["player_id"]] = empty_stats()
+        seat = (session_id, event["player_id"])
+        kind = event["type"]
+        
+        if kind == "seat":
+            self.seats[seat] = self.seats.get(seat, 0) + 1
+            if self.seats[seat] == 1:
+                stats["sessions"] += 1
+            stats["buyins"] += event["amount"]
+        elif kind in ("buyin", "rebuy"):
+            stats["buyins"] += event["amount"]
+        elif kind == "cashout":
+            stats["cashouts"] += event["amount"] - event.get("previous", 0)
+        elif kind == "leave":
+            previous = event.get("previous", {})
+            stats["buyins"] -= previous.get("buyin", 0) + previous.get("rebuys", 0)
+            stats["cashouts"] -= previous.get("cashout", 0)
+            self.seats[seat] = self.seats.get(seat, 1) - 1
+            if self.seats[seat] == 0:
+                stats["sessions"] -= 1
+    
+    def all_stats(self):
+        """Stats for every player who has played, in the shape calculate_all_player_stats returns"""
+        result = {}
+        for player_id, totals in self.totals.items():
+            if totals["sessions"] <= 0:
+                continue
+            stats = dict(totals)
+            stats["profit"] = stats["cashouts"] - stats["buyins"]
+            stats["avg_profit"] = round(stats["profit"] / stats["sessions"])
+            result[player_id] = stats
+        return result
+
+class RunningMetrics:
+    """Spread and drawdown of one player's session results, updated one session at a time
+    
+    The variance uses Welford's method and the drawdown a running peak of the cumulative
+    profit, so adding a session is O(1) and nothing is recomputed from the history."""
+    __slots__ = ("count", "mean", "m2", "cumulative", "peak", "max_drawdown", "losing_streak",
+                 "longest_losing_streak")
+    
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.cumulative = 0
+        self.peak = 0
+        self.max_drawdown = 0
+        self.losing_streak = 0
+        self.longest_losing_streak = 0
+    
+    def push(self, profit):
+        self.count += 1
+        delta = profit - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (profit - self.mean)
+        
+        self.cumulative += profit
+        self.peak = max(self.peak, self.cumulative)
+        self.max_drawdown = max(self.max_drawdown, self.peak - self.cumulative)
+        
+        self.losing_streak = self.losing_streak + 1 if profit < 0 else 0
+        self.longest_losing_streak = max(self.longest_losing_streak, self.losing_streak)
+    
+    @property
+    def std_dev(self):
+        """Sample standard deviation of the session results in pence"""
+        return math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else 0.0
+    
+    @property
+    def consistency(self):
+        """Average result over its standard deviation, like a Sharpe ratio, or None until it means something"""
+        std_dev = self.std_dev
+        return self.mean / std_dev if std_dev else None
+    
+    def as_dict(self):
+        consistency = self.consistency
+        return {
+            "std_dev": round(self.std_dev),
+            "max_drawdown": self.max_drawdown,
+            "longest_losing_streak": self.longest_losing_streak,
+            "consistency": round(consistency, 2) if consistency is not None else None
+        }
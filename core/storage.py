@@ -0,0 +1,394 @@
+import json
+import os
+import stat
+import tempfile
+from core import entries, events, ledger, merge, money
+from core.filelock import DataFileLock
+from core.models import new_player, new_session, find_by_id
+from core.stats import PlayerStatsProjection
+from core.integrity import IntegrityScanner
+from core.windows import StatsWindows
+from core.pairs import CoOccurrence
+from core.ratings import RatingEngine
+from core.leaderboard import Leaderboard, build_rows
+from core.tables import Table, read_journal_header
+import utils
+
+class DataStore:
+    """Players, sessions and sync state backed by the JSON data file"""
+    def __init__(self, data_file=None):
+        self.data_file = data_file
+        self.players = []
+        self.sessions = []
+        
+        # Live sessions keyed by session id, each with its own lock and journal
+        self.tables = {}
+        
+        # Player ids interned to the small integers session entries store
+        self.registry = entries.registry
+        
+        # Google Sheets sync watermark, shared by reference with the sheets manager
+        self.sheets_sync = {}
+        
+        self.stats_projection = PlayerStatsProjection()
+        self.stats_windows = StatsWindows()
+        self.co_occurrence = CoOccurrence()
+        self.ratings = RatingEngine()
+        self.integrity = IntegrityScanner()
+        
+        # Every record's (version, fingerprint) as last read from or written to the data
+        # file, and the file's stat then, so saves can tell if another program wrote to it
+        self.base = {}
+        self.file_stat = None
+        
+        # What changed since the base: sessions by their event revision, anything else
+        # by id, marked by whatever changed it
+        self.base_revisions = {}
+        self.dirty = set()
+    
+    def load(self, data_file=None):
+        """Load the data file, leaving the store empty if it doesn't exist yet"""
+        data_file = data_file or self.data_file
+        if not os.path.exists(data_file):
+            # A crash before the first save can still have left tables in the journals
+            return self.recover_tables() > 0
+        with DataFileLock(data_file):
+            with open(data_file, 'r') as f:
+                data = json.load(f)
+            money.migrate_data(data)
+            self.load_dict(data)
+            if data_file == self.data_file:
+                self.file_stat = stat_key(data_file)
+                self.base = {record["id"]: (record.get("version", 0), merge.fingerprint(record))
+                             for record in self.all_records()}
+                self.take_base_revisions()
+                self.recover_tables()
+        return True
+    
+    def load_dict(self, data):
+        if "players" in data:
+            self.players = data["players"]
+            for player in self.players:
+                player["id"] = self.registry.canonical(player["id"])
+        if "sessions" in data:
+            self.load_sessions(data["sessions"])
+        live = list(data.get("live_sessions", []))
+        if data.get("current_session"):
+            live.append(data["current_session"])
+        for session in live:
+            self.open_table(entries.compact_session(session))
+            events.bump_revision(session)
+        # Older files also listed the active session among the completed ones
+        self.sessions = [s for s in self.sessions if s["id"] not in self.tables]
+        if "sheets_sync" in data:
+            self.sheets_sync.clear()
+            self.sheets_sync.update(data["sheets_sync"])
+    
+    def load_sessions(self, sessions):
+        dropped = {s["id"] for s in self.sessions} - {s["id"] for s in sessions}
+        # A session still marked current is the active one, not history
+        for session in sessions:
+            entries.compact_session(session)
+        self.sessions = [s for s in sessions if s.get("status") != "current"]
+        for session in sessions:
+            if session.get("status") == "current":
+                self.open_table(session)
+        
+        # Sessions saved before events existed get an equivalent event stream
+        for session in sessions:
+            events.ensure_events(session)
+            events.bump_revision(session)
+        for session_id in dropped:
+            events.forget_revision(session_id)
+    
+    def to_dict(self):
+        return {
+            "players": self.players,
+            "sessions": self.sessions,
+            "live_sessions": self.live_sessions,
+            "sheets_sync": self.sheets_sync,
+            "money": money.MONEY_FORMAT
+        }
+    
+    def save(self, data_file=None):
+        """Write the data file atomically, merging in anything another program saved since we read it"""
+        data_file = data_file or self.data_file
+        if data_file != self.data_file:
+            # Exports and backups are plain copies
+            self.write(data_file)
+            return
+        
+        with DataFileLock(data_file):
+            # A stat is enough to see that nobody else has written since our last load or save
+            if os.path.exists(data_file) and stat_key(data_file) != self.file_stat:
+                self.merge_from_disk(data_file)
+            self.bump_versions()
+            saved = {session_id: len(table.session["events"]) for session_id, table in self.tables.items()}
+            self.write(data_file)
+            self.file_stat = stat_key(data_file)
+        
+        # Everything journaled is now in the data file, so the journals can start over
+        self.discard_journals(saved)
+    
+    def write(self, data_file):
+        directory = os.path.dirname(os.path.abspath(data_file))
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".poker_data_", suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(self.to_dict(), f, indent=4, default=entries.json_default)
+            # mkstemp makes the file private; keep the data file's permissions instead
+            os.chmod(temp_path, stat.S_IMODE(os.stat(data_file).st_mode) if os.path.exists(data_file) else 0o644)
+            os.replace(temp_path, data_file)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+    
+    def all_records(self):
+        return self.players + self.get_all_sessions()
+    
+    def mark_dirty(self, record):
+        """Note a record changed other than through session events, so the next save versions it"""
+        self.dirty.add(record["id"])
+    
+    def take_base_revisions(self):
+        self.base_revisions = {session["id"]: events.revision(session) for session in self.get_all_sessions()}
+        self.dirty = set()
+    
+    def changed_since_base(self, record):
+        if record["id"] not in self.base or record["id"] in self.dirty:
+            return True
+        return "events" in record and events.revision(record) != self.base_revisions.get(record["id"])
+    
+    def bump_versions(self):
+        """Give every record changed since the base a new version, and make it the base
+        
+        Only records that are new, marked dirty or have new events are fingerprinted."""
+        base = {}
+        for record in self.all_records():
+            known = self.base.get(record["id"])
+            if not self.changed_since_base(record):
+                base[record["id"]] = known
+                continue
+            fingerprint = merge.fingerprint(record)
+            if known is None or fingerprint != known[1]:
+                record["version"] = max(record.get("version", 0), known[0] if known else 0) + 1
+                fingerprint = merge.fingerprint(record)
+            base[record["id"]] = (record["version"] if "version" in record else 0, fingerprint)
+        self.base = base
+        self.take_base_revisions()
+    
+    def merge_from_disk(self, data_file):
+        """Three-way merge the data file another program wrote into the store"""
+        with open(data_file, 'r') as f:
+            data = json.load(f)
+        money.migrate_data(data)
+        their_live = data.get("live_sessions", []) + ([data["current_session"]] if data.get("current_session") else [])
+        their_sessions = data.get("sessions", []) + their_live
+        live_ids = set(self.tables) | {s["id"] for s in their_live}
+        live_ids |= {s["id"] for s in their_sessions if s.get("status") == "current"}
+        
+        before = {s["id"] for s in self.get_all_sessions()}
+        players, player_conflicts = merge.merge_records(self.base, self.players, data.get("players", []))
+        sessions, session_conflicts = merge.merge_records(
+            self.base, self.get_all_sessions(), their_sessions, groups=[merge.SESSION_EVENT_FIELDS])
+        for record_id in player_conflicts + session_conflicts:
+            utils.debug_log(f"Record {record_id} was changed by another program too, keeping our changes where they clash")
+        
+        self.players = players
+        for session in sessions:
+            entries.compact_session(session)
+            events.ensure_events(session)
+            events.bump_revision(session)
+        for session_id in before - {s["id"] for s in sessions}:
+            events.forget_revision(session_id)  # Deleted by the other program
+        # Live on either side and not ended on either side
+        live = [s for s in sessions if s["id"] in live_ids and s.get("status") != "completed"]
+        live_ids = {s["id"] for s in live}
+        self.sessions = [s for s in sessions if s["id"] not in live_ids]
+        for session_id in list(self.tables):
+            if session_id not in live_ids:
+                del self.tables[session_id]  # Ended by the other program
+        for session in live:
+            table = self.tables.get(session["id"])
+            if table is None or table.session is not session:
+                self.open_table(session)
+            else:
+                # The merge may have taken the other program's events for this table
+                table.journaled = min(table.journaled, len(session["events"]))
+        
+        # What is on disk now is the common ancestor for the next save, and anything of
+        # ours may differ from it
+        self.base = {record["id"]: (record.get("version", 0), merge.fingerprint(record))
+                     for record in data.get("players", []) + their_sessions}
+        self.dirty = {record["id"] for record in self.all_records()}
+    
+    def recover_tables(self):
+        """Reopen tables started since the last save, from the header their journal starts with"""
+        journal_dir = self.journal_dir
+        if not journal_dir or not os.path.isdir(journal_dir):
+            return 0
+        known = {session["id"] for session in self.get_all_sessions()}
+        recovered = 0
+        for name in sorted(os.listdir(journal_dir)):
+            session = read_journal_header(os.path.join(journal_dir, name))
+            if session and session["id"] not in known:
+                utils.debug_log(f"Recovering table {session.get('name', session['id'])} from its journal")
+                self.open_table(session)
+                events.bump_revision(session)
+                recovered += 1
+        return recovered
+    
+    def discard_journals(self, saved):
+        journal_dir = self.journal_dir
+        if journal_dir and os.path.isdir(journal_dir):
+            known = {session["id"] for session in self.sessions}
+            for name in os.listdir(journal_dir):
+                session_id = name[:-len(".jsonl")]
+                # Only a table that has since ended; a journal for a session the data file
+                # doesn't hold is all that is left of it
+                if session_id not in self.tables and session_id in known:
+                    os.remove(os.path.join(journal_dir, name))
+        for session_id, count in saved.items():
+            table = self.tables.get(session_id)
+            if table:
+                table.truncate_journal(count)
+    
+    @property
+    def journal_dir(self):
+        return f"{self.data_file}.journal" if self.data_file else None
+    
+    def open_table(self, session):
+        """Track a live session as a table, replaying any journal left by a crash"""
+        table = Table(session, self.journal_dir)
+        table.recover()
+        self.tables[session["id"]] = table
+        return table
+    
+    def flush_journals(self):
+        """Append each table's new events to its journal, returning how many were written"""
+        # A busy table only holds its own lock, the others flush without waiting on it
+        return sum(table.flush() for table in list(self.tables.values()))
+    
+    @property
+    def live_sessions(self):
+        return [table.session for table in self.tables.values()]
+    
+    @property
+    def current_session(self):
+        """The first live session, for code that only deals with one table"""
+        for table in self.tables.values():
+            return table.session
+        return None
+    
+    def get_table(self, session_id):
+        return self.tables.get(session_id)
+    
+    def get_all_players(self):
+        return self.players
+    
+    def get_player_by_id(self, player_id):
+        return find_by_id(self.players, player_id)
+    
+    def add_player(self, name, email="", phone="", note=""):
+        player = new_player(name, email, phone, note)
+        self.players.append(player)
+        return player
+    
+    def rename_player(self, player_id, name):
+        name = name.strip()
+        if not name:
+            raise ValueError("Player name cannot be empty")
+        player = self.get_player_by_id(player_id)
+        if player:
+            player["name"] = name
+            self.mark_dirty(player)
+        return player
+    
+    def delete_player(self, player_id):
+        """Remove a player, leaving their past session entries in place"""
+        self.players = [p for p in self.players if p["id"] != player_id]
+    
+    def get_all_sessions(self):
+        """Completed sessions followed by the live ones"""
+        return self.sessions + self.live_sessions
+    
+    def get_session_by_id(self, session_id):
+        return find_by_id(self.get_all_sessions(), session_id)
+    
+    def start_session(self, name):
+        """Open a new live table alongside any already running"""
+        table = self.open_table(new_session(name))
+        # Until the next save the journal is the only record of the table
+        table.start_journal()
+        return table.session
+    
+    def end_session(self, session_id):
+        """Move a live session into the history and return it"""
+        table = self.tables.get(session_id)
+        if not table:
+            raise ValueError("There is no active session to end.")
+        with table.lock:
+            session = ledger.complete_session(table.session)
+            self.sessions.append(session)
+            del self.tables[session_id]
+        self.mark_dirty(session)
+        
+        # Rate the session now, so the ratings are current as soon as it ends
+        self.ratings.update(self.sessions)
+        return session
+    
+    def end_current_session(self):
+        session = self.current_session
+        if not session:
+            raise ValueError("There is no active session to end.")
+        return self.end_session(session["id"])
+    
+    def delete_session(self, index):
+        session = self.sessions.pop(index)
+        events.forget_revision(session["id"])
+        # An unsaved ended table's journal would otherwise bring it back on the next load
+        journal_path = os.path.join(self.journal_dir, f"{session['id']}.jsonl") if self.journal_dir else None
+        if journal_path and os.path.exists(journal_path):
+            os.remove(journal_path)
+        return session
+    
+    def player_stats(self):
+        """Stats for every player, keyed by player id, updated from the events since the last call"""
+        return self.stats_projection.update(self.get_all_sessions()).all_stats()
+    
+    def windowed_stats(self):
+        """Index over the completed sessions for stats by month, season or recent sessions"""
+        return self.stats_windows.update(self.sessions)
+    
+    def player_metrics(self):
+        """Spread and drawdown of every player's completed session results, keyed by player id"""
+        return self.windowed_stats().player_metrics()
+    
+    def head_to_head(self):
+        """Sessions together and results for every pair of players, over the completed sessions"""
+        return self.co_occurrence.update(self.sessions)
+    
+    def player_ratings(self):
+        """Ratings over the completed sessions, applying only the sessions ended since the last call"""
+        return self.ratings.update(self.sessions)
+    
+    def recompute_ratings(self):
+        """Rebuild the ratings from scratch, replaying every completed session in date order"""
+        self.ratings.reset()
+        return self.ratings.update(self.sessions)
+    
+    def leaderboard(self, stats=None):
+        """Rank players by their stats, all time unless given the stats for a window"""
+        stats = self.player_stats() if stats is None else stats
+        return Leaderboard(build_rows(self.players, stats, self.player_metrics(), self.player_ratings()))
+    
+    def check_integrity(self):
+        """Integrity issues across the history, rescanning only sessions changed since the last check"""
+        return self.integrity.scan(self.players, self.get_all_sessions(), live_ids=self.tables)
+
+
+def stat_key(path):
+    """What changes whenever a file is rewritten, cheap to compare on every save"""
+    info = os.stat(path)
+    return info.st_mtime_ns, info.st_size, info.st_ino
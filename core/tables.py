@@ -0,0 +1,119 @@
+# Live tables: each running session gets its own lock and an append-only journal of
+# its events, so tables can be played, saved and recovered independently. A journal
+# starts with the session's own fields, so a table started since the last save can be
+# rebuilt from the journal alone.
+import json
+import os
+import threading
+import uuid
+from core import events, ledger
+from core.merge import SESSION_EVENT_FIELDS
+
+def journal_header(session):
+    return {"session": {key: value for key, value in session.items() if key not in SESSION_EVENT_FIELDS}}
+
+def read_journal_header(path):
+    """The session a journal was started for, with no entries yet, or None if it has no header"""
+    with open(path, 'r') as f:
+        try:
+            header = json.loads(f.readline())
+        except ValueError:
+            return None
+    if "session" not in header:
+        return None
+    return dict(header["session"], players=[])
+
+class Table:
+    """A live session with its own lock and on-disk event journal"""
+    def __init__(self, session, journal_dir=None):
+        self.session = session
+        self.lock = threading.RLock()
+        self.journal_path = os.path.join(journal_dir, f"{session['id']}.jsonl") if journal_dir else None
+        
+        events.ensure_events(session)
+        self.journaled = len(session["events"])
+        self.header_written = bool(self.journal_path) and os.path.exists(self.journal_path)
+    
+    @property
+    def id(self):
+        return self.session["id"]
+    
+    def start_journal(self):
+        """Write the journal header now, for a table the data file doesn't know about yet"""
+        self.flush(force=True)
+    
+    def flush(self, force=False):
+        """Append events recorded since the last flush to the journal, returning how many"""
+        if not self.journal_path:
+            return 0
+        with self.lock:
+            pending = self.session["events"][self.journaled:]
+            if not pending and (self.header_written or not force):
+                return 0
+            os.makedirs(os.path.dirname(self.journal_path), exist_ok=True)
+            with open(self.journal_path, 'a') as f:
+                if not self.header_written:
+                    f.write(json.dumps(journal_header(self.session)) + "\n")
+                for event in pending:
+                    f.write(json.dumps(event) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self.header_written = True
+            self.journaled += len(pending)
+            return len(pending)
+    
+    def recover(self):
+        """Replay journaled events the data file doesn't have yet, after a crash"""
+        if not self.journal_path or not os.path.exists(self.journal_path):
+            return 0
+        recovered = 0
+        with self.lock, open(self.journal_path, 'r') as f:
+            for line in f:
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    break  # Torn final line from a crash mid-write
+                if "session" in event:
+                    continue
+                if event["seq"] == len(self.session["events"]) + 1:
+                    events.append_event(self.session, event)
+                    recovered += 1
+            self.journaled = len(self.session["events"])
+        return recovered
+    
+    def truncate_journal(self, saved):
+        """Drop the journal once the data file holds the first saved events"""
+        with self.lock:
+            if self.journal_path and os.path.exists(self.journal_path):
+                os.remove(self.journal_path)
+            self.header_written = False
+            # Events recorded while the data file was being written are journaled next flush
+            self.journaled = saved
+
+def move_player(source, target, player_id, amount):
+    """Move a player and their chips from one table to another atomically
+    
+    The player cashes out of the source table for the chip amount and buys in for the
+    same amount at the target, so both tables stay balanced. The two events share a
+    transfer id. Both tables are locked in id order so concurrent moves can't deadlock."""
+    if source is target:
+        raise ValueError("Player is already at that table")
+    amount = ledger.validate_amounts(amount)[0]
+    
+    first, second = sorted((source, target), key=lambda table: table.id)
+    with first.lock, second.lock:
+        # Check everything before recording anything so a failed move changes nothing
+        entry = ledger.find_entry(source.session, player_id)
+        if entry.get("cashout", 0):
+            raise ValueError("Player has already cashed out of this table")
+        if amount <= 0:
+            raise ValueError("Chip amount must be greater than 0.")
+        seated = any(e["id"] == player_id for e in target.session["players"])
+        
+        transfer = str(uuid.uuid4())
+        events.record_event(source.session, "cashout", player_id, amount, transfer=transfer, to=target.id)
+        if seated:
+            events.record_event(target.session, "buyin", player_id, amount, transfer=transfer, source=source.id)
+        else:
+            events.record_event(target.session, "seat", player_id, amount, transfer=transfer, source=source.id)
+    return transfer
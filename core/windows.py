@@ -0,0 +1,165 @@
+# Player stats over a window of the history: each player's last N sessions, the last
+# 30/90/365 days, a calendar month or a season.
+#
+# Completed sessions are indexed in date order. Each player keeps the positions of the
+# sessions they played in that order, with prefix sums of their buy-ins and cash-outs,
+# so any window is a range of positions and a player's totals over it are two bisects
+# and two subtractions. Sessions that end after the last indexed one are appended; only
+# edits to older sessions rebuild the index. The same pass keeps each player's running
+# spread and drawdown metrics, in date order.
+import abc
+import datetime
+from bisect import bisect_left
+from core.events import change_token
+from core.ledger import entry_total_in, entry_profit
+from core.stats import RunningMetrics
+
+# Meteorological seasons by the month they start in, winter running into the next year
+SEASONS = (("Spring", 3), ("Summer", 6), ("Autumn", 9), ("Winter", 12))
+
+def session_day(session):
+    """The session's date as YYYY-MM-DD, or None if it doesn't parse"""
+    try:
+        return datetime.datetime.fromisoformat(session["date"]).date().isoformat()
+    except (TypeError, ValueError):
+        return None
+
+def window_stats(sessions, buyins, cashouts):
+    return {
+        "sessions": sessions,
+        "buyins": buyins,
+        "cashouts": cashouts,
+        "profit": cashouts - buyins,
+        "avg_profit": round((cashouts - buyins) / sessions)
+    }
+
+def season_of(day):
+    """(year, name) of the season a date falls in"""
+    if day.month < SEASONS[0][1]:
+        return day.year - 1, "Winter"
+    return day.year, [name for name, start in SEASONS if day.month >= start][-1]
+
+def season_range(year, name):
+    start_month = dict(SEASONS)[name]
+    start = datetime.date(year, start_month, 1)
+    end_year, end_month = (year + 1, start_month + 3 - 12) if start_month + 3 > 12 else (year, start_month + 3)
+    return start, datetime.date(end_year, end_month, 1)
+
+def month_range(year, month):
+    end = datetime.date(year + 1, 1, 1) if month == 12 else datetime.date(year, month + 1, 1)
+    return datetime.date(year, month, 1), end
+
+class DateOrderedIndex(abc.ABC):
+    """Something built from the completed sessions in date order, kept up to date by appending
+    
+    Subclasses hold their state in reset() and take one session at a time in add()."""
+    def __init__(self):
+        self.reset()
+    
+    def reset(self):
+        # Date of every indexed session, in position order
+        self.days = []
+        # (session id, change token) for every session seen, in the order given to update()
+        self.tokens = []
+    
+    def update(self, sessions):
+        """Bring the index up to date with the completed sessions"""
+        tokens = [(session["id"], change_token(session)) for session in sessions]
+        if tokens[:len(self.tokens)] != self.tokens:
+            self.reset()
+        
+        added = [(day, session) for day, session in
+                 ((session_day(session), session) for session in sessions[len(self.tokens):]) if day]
+        added.sort(key=lambda pair: pair[0])
+        if added and self.days and added[0][0] < self.days[-1]:
+            # An older session turned up, so positions after it would all shift
+            self.reset()
+            return self.update(sessions)
+        
+        for day, session in added:
+            self.days.append(day)
+            self.add(day, session)
+        self.tokens = tokens
+        return self
+    
+    @abc.abstractmethod
+    def add(self, day, session):
+        """Take the next session in date order, already appended to days"""
+
+class StatsWindows(DateOrderedIndex):
+    """Per-player prefix sums over the date-sorted history for windowed stats"""
+    def reset(self):
+        super().reset()
+        # Player id -> (positions played, buy-in prefix sums, cash-out prefix sums)
+        self.players = {}
+        # Player id -> RunningMetrics over their results in date order
+        self.metrics = {}
+    
+    def add(self, day, session):
+        position = len(self.days) - 1
+        for entry in session["players"]:
+            positions, buyins, cashouts = self.players.setdefault(entry["id"], ([], [0], [0]))
+            positions.append(position)
+            buyins.append(buyins[-1] + entry_total_in(entry))
+            cashouts.append(cashouts[-1] + entry.get("cashout", 0))
+            metrics = self.metrics.get(entry["id"])
+            if metrics is None:
+                metrics = self.metrics[entry["id"]] = RunningMetrics()
+            metrics.push(entry_profit(entry))
+    
+    def range_stats(self, lo, hi):
+        """Stats for every player over the sessions at positions lo to hi, keyed by player id"""
+        result = {}
+        for player_id, (positions, buyins, cashouts) in self.players.items():
+            start = bisect_left(positions, lo)
+            end = bisect_left(positions, hi)
+            if end > start:
+                result[player_id] = window_stats(end - start, buyins[end] - buyins[start],
+                                                 cashouts[end] - cashouts[start])
+        return result
+    
+    def all_time(self):
+        return self.range_stats(0, len(self.days))
+    
+    def last_sessions(self, count):
+        """Stats over each player's own last count sessions, however long ago they were"""
+        result = {}
+        for player_id, (positions, buyins, cashouts) in self.players.items():
+            start = max(len(positions) - count, 0)
+            result[player_id] = window_stats(len(positions) - start, buyins[-1] - buyins[start],
+                                             cashouts[-1] - cashouts[start])
+        return result
+    
+    def between(self, start, end):
+        """Stats over sessions on or after the start date and before the end date"""
+        return self.range_stats(bisect_left(self.days, start.isoformat()), bisect_left(self.days, end.isoformat()))
+    
+    def last_days(self, days, today=None):
+        today = today or datetime.date.today()
+        return self.between(today - datetime.timedelta(days=days - 1), today + datetime.timedelta(days=1))
+    
+    def month(self, year, month):
+        return self.between(*month_range(year, month))
+    
+    def season(self, year, name):
+        return self.between(*season_range(year, name))
+    
+    def player_metrics(self):
+        """Standard deviation, max drawdown, longest losing streak and consistency, keyed by player id"""
+        return {player_id: metrics.as_dict() for player_id, metrics in self.metrics.items()}
+    
+    def bankroll(self, player_id):
+        """A player's cumulative profit after each session they played, as (days, profits)"""
+        positions, buyins, cashouts = self.players.get(player_id, ([], [0], [0]))
+        days = [self.days[position] for position in positions]
+        return days, [cashout - buyin for buyin, cashout in zip(buyins[1:], cashouts[1:])]
+    
+    def months(self):
+        """(year, month) of every month with a session, newest first"""
+        return sorted({(int(day[:4]), int(day[5:7])) for day in self.days}, reverse=True)
+    
+    def seasons(self):
+        """(year, name) of every season with a session, newest first"""
+        found = {season_of(datetime.date.fromisoformat(day)) for day in self.days}
+        order = [name for name, _ in SEASONS]
+        return sorted(found, key=lambda season: (season[0], order.index(season[1])), reverse=True)
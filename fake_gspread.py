@@ -0,0 +1,268 @@
+# In-process stand-in for the parts of gspread that GoogleSheetsManager uses, so
+# the Sheets sync can be run and benchmarked without credentials or network.
+# Requests can be slowed down, throttled by a per-minute quota and made to fail.
+import random
+import re
+import threading
+import time
+from types import SimpleNamespace
+from sheets_scheduler import TokenBucket
+
+try:
+    from gspread.exceptions import SpreadsheetNotFound, WorksheetNotFound
+except ImportError:
+    class SpreadsheetNotFound(Exception):
+        pass
+    
+    class WorksheetNotFound(Exception):
+        pass
+
+class FakeAPIError(Exception):
+    """API error carrying an HTTP status like gspread's APIError"""
+    def __init__(self, status_code, message):
+        super().__init__(f"{status_code}: {message}")
+        self.code = status_code
+        self.response = SimpleNamespace(status_code=status_code)
+
+def column_index(letters):
+    """Convert a column name like 'A' or 'AB' to a zero-based index"""
+    index = 0
+    for letter in letters.upper():
+        index = index * 26 + ord(letter) - ord("A") + 1
+    return index - 1
+
+def parse_range(range_name):
+    """Split "'Title'!A2:H" into (title or None, start row, start column)"""
+    title = None
+    if "!" in range_name:
+        title, range_name = range_name.rsplit("!", 1)
+        title = title.strip("'")
+    match = re.match(r"([A-Za-z]+)(\d*)", range_name)
+    if not match:
+        raise FakeAPIError(400, f"Unable to parse range: {range_name}")
+    row = int(match.group(2)) if match.group(2) else 1
+    return title, row, column_index(match.group(1))
+
+class FakeService:
+    """Shared backend holding every spreadsheet plus latency, quota and failure settings"""
+    def __init__(self, latency=0.0, read_per_minute=None, write_per_minute=None,
+                 failure_rate=0.0, seed=None, clock=time.monotonic, sleep=time.sleep):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.random = random.Random(seed)
+        self.sleep = sleep
+        self.buckets = {}
+        if read_per_minute:
+            self.buckets["read"] = TokenBucket(read_per_minute, clock=clock)
+        if write_per_minute:
+            self.buckets["write"] = TokenBucket(write_per_minute, clock=clock)
+        
+        self.spreadsheets = {}
+        self.queued_failures = []
+        self.request_counts = {}
+        self.lock = threading.Lock()
+    
+    def fail_next(self, status_code=429, count=1):
+        """Make the next requests fail with the given status"""
+        with self.lock:
+            self.queued_failures.extend([status_code] * count)
+    
+    @property
+    def total_requests(self):
+        return sum(self.request_counts.values())
+    
+    def handle(self, name, kind):
+        """Account for one API request, applying latency, failures and quotas"""
+        if self.latency:
+            self.sleep(self.latency)
+        
+        with self.lock:
+            self.request_counts[name] = self.request_counts.get(name, 0) + 1
+            
+            if self.queued_failures:
+                raise FakeAPIError(self.queued_failures.pop(0), f"Injected failure in {name}")
+            if self.failure_rate and self.random.random() < self.failure_rate:
+                raise FakeAPIError(503, f"Injected random failure in {name}")
+            
+            bucket = self.buckets.get(kind)
+            if bucket and bucket.try_acquire() > 0:
+                raise FakeAPIError(429, f"Quota exceeded for {kind} requests")
+
+class FakeClient:
+    def __init__(self, service=None):
+        self.service = service or FakeService()
+    
+    def open(self, title):
+        self.service.handle("open", "read")
+        if title not in self.service.spreadsheets:
+            raise SpreadsheetNotFound(title)
+        return self.service.spreadsheets[title]
+    
+    def create(self, title):
+        self.service.handle("create", "write")
+        spreadsheet = FakeSpreadsheet(self.service, title)
+        spreadsheet.add_sheet("Sheet1", 1000, 26)
+        self.service.spreadsheets[title] = spreadsheet
+        return spreadsheet
+
+class FakeSpreadsheet:
+    def __init__(self, service, title):
+        self.service = service
+        self.title = title
+        self.sheets = []
+        self.next_sheet_id = 0
+    
+    def add_sheet(self, title, rows, cols):
+        if any(sheet.title == title for sheet in self.sheets):
+            raise FakeAPIError(400, f"A sheet with the name \"{title}\" already exists")
+        sheet = FakeWorksheet(self, self.next_sheet_id, title, rows, cols)
+        self.next_sheet_id += 1
+        self.sheets.append(sheet)
+        return sheet
+    
+    def sheet_by_title(self, title):
+        for sheet in self.sheets:
+            if sheet.title == title:
+                return sheet
+        raise FakeAPIError(400, f"Unable to parse range: {title}")
+    
+    def sheet_by_id(self, sheet_id):
+        for sheet in self.sheets:
+            if sheet.id == sheet_id:
+                return sheet
+        raise FakeAPIError(400, f"No grid with id: {sheet_id}")
+    
+    @property
+    def sheet1(self):
+        self.service.handle("fetch_sheet_metadata", "read")
+        return self.sheets[0]
+    
+    def worksheets(self):
+        self.service.handle("fetch_sheet_metadata", "read")
+        return list(self.sheets)
+    
+    def worksheet(self, title):
+        self.service.handle("fetch_sheet_metadata", "read")
+        for sheet in self.sheets:
+            if sheet.title == title:
+                return sheet
+        raise WorksheetNotFound(title)
+    
+    def add_worksheet(self, title, rows, cols):
+        self.service.handle("batch_update", "write")
+        return self.add_sheet(title, rows, cols)
+    
+    def del_worksheet(self, worksheet):
+        self.service.handle("batch_update", "write")
+        self.delete_sheet(worksheet.id)
+    
+    def delete_sheet(self, sheet_id):
+        if len(self.sheets) == 1:
+            raise FakeAPIError(400, "You can't remove all the sheets in a document")
+        self.sheets.remove(self.sheet_by_id(sheet_id))
+    
+    def batch_update(self, body):
+        self.service.handle("batch_update", "write")
+        replies = []
+        for request in body["requests"]:
+            if "addSheet" in request:
+                properties = request["addSheet"]["properties"]
+                grid = properties.get("gridProperties", {})
+                sheet = self.add_sheet(properties["title"], grid.get("rowCount", 1000), grid.get("columnCount", 26))
+                replies.append({"addSheet": {"properties": {"sheetId": sheet.id, "title": sheet.title}}})
+            elif "deleteSheet" in request:
+                self.delete_sheet(request["deleteSheet"]["sheetId"])
+                replies.append({})
+            elif "updateSheetProperties" in request:
+                properties = request["updateSheetProperties"]["properties"]
+                sheet = self.sheet_by_id(properties["sheetId"])
+                row_count = properties.get("gridProperties", {}).get("rowCount")
+                if row_count is not None:
+                    sheet.resize_rows(row_count)
+                replies.append({})
+            else:
+                raise FakeAPIError(400, f"Unsupported request: {list(request)}")
+        return {"spreadsheetId": self.title, "replies": replies}
+    
+    def values_batch_update(self, body):
+        self.service.handle("values_batch_update", "write")
+        for value_range in body["data"]:
+            title, row, col = parse_range(value_range["range"])
+            self.sheet_by_title(title).write(row, col, value_range["values"])
+        return {"spreadsheetId": self.title, "totalUpdatedRows": sum(len(r["values"]) for r in body["data"])}
+    
+    def values_batch_get(self, ranges, params=None):
+        self.service.handle("values_batch_get", "read")
+        value_ranges = []
+        for range_name in ranges:
+            title, row, col = parse_range(range_name)
+            sheet = self.sheet_by_title(title)
+            values = [r[col:] for r in sheet.rows[row - 1:]]
+            # Like the real API, trailing empty rows are not returned
+            while values and not any(cell not in ("", None) for cell in values[-1]):
+                values.pop()
+            value_ranges.append({"range": range_name, "values": values})
+        return {"spreadsheetId": self.title, "valueRanges": value_ranges}
+
+class FakeWorksheet:
+    def __init__(self, spreadsheet, sheet_id, title, rows, cols):
+        self.spreadsheet = spreadsheet
+        self.id = sheet_id
+        self.title = title
+        self.col_count = cols
+        self.rows = [[] for _ in range(rows)]
+    
+    @property
+    def row_count(self):
+        return len(self.rows)
+    
+    def resize_rows(self, row_count):
+        if row_count < 1:
+            raise FakeAPIError(400, "Sheets must have at least one row")
+        if row_count < len(self.rows):
+            del self.rows[row_count:]
+        else:
+            self.rows.extend([] for _ in range(row_count - len(self.rows)))
+    
+    def write(self, row, col, values):
+        """Write a block of values with its top-left cell at (row, col), one-based row"""
+        if row - 1 + len(values) > len(self.rows):
+            raise FakeAPIError(400, f"Range ('{self.title}'!row {row + len(values) - 1}) exceeds grid limits. "
+                                    f"Max rows: {len(self.rows)}")
+        for offset, values_row in enumerate(values):
+            target = self.rows[row - 1 + offset]
+            if len(target) < col + len(values_row):
+                target.extend([""] * (col + len(values_row) - len(target)))
+            target[col:col + len(values_row)] = list(values_row)
+    
+    def update(self, range_name, values=None):
+        # gspread 6 takes (values, range_name), older versions (range_name, values)
+        if isinstance(range_name, list):
+            range_name, values = values, range_name
+        self.spreadsheet.service.handle("values_update", "write")
+        _, row, col = parse_range(range_name)
+        self.write(row, col, values)
+    
+    def append_rows(self, values):
+        self.spreadsheet.service.handle("values_append", "write")
+        last = len(self.rows)
+        while last > 0 and not self.rows[last - 1]:
+            last -= 1
+        needed = last + len(values)
+        if needed > len(self.rows):
+            self.resize_rows(needed)
+        self.write(last + 1, 0, values)
+    
+    def delete_rows(self, start_index, end_index=None):
+        self.spreadsheet.service.handle("batch_update", "write")
+        end_index = end_index or start_index
+        if start_index == 1 and end_index >= len(self.rows):
+            raise FakeAPIError(400, "You can't delete all the rows on the sheet")
+        del self.rows[start_index - 1:end_index]
+    
+    def get_all_values(self):
+        self.spreadsheet.service.handle("values_get", "read")
+        values = [list(r) for r in self.rows]
+        while values and not values[-1]:
+            values.pop()
+        return values
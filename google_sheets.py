@@ -4,9 +4,23 @@ import datetime
 import utils
 import os
 import json
+import hashlib
+import zlib
+from sheets_scheduler import RequestScheduler, SheetsRateLimitError, PRIORITY_INTERACTIVE
+from core.money import to_pence, to_pounds, format_pence
+
+# Header row for each worksheet the tracker maintains
+SHEET_HEADERS = {
+    "Players": ['Player ID', 'Name', 'Total Sessions', 'Total Buy-ins', 'Total Profit'],
+    "Sessions": ['Session ID', 'Name', 'Date', 'Players', 'Total Buy-ins', 'Total Cash-outs'],
+    "Session Details": ['Session ID', 'Player ID', 'Player Name', 'Buy-in', 'Rebuys', 'Total In', 'Cash-out', 'Profit/Loss'],
+}
+
+# Rows written per request when backfilling sessions
+SYNC_CHUNK_ROWS = 500
 
 class GoogleSheetsManager:
-    def __init__(self, credentials_file=None, sheet_name=None):
+    def __init__(self, credentials_file=None, sheet_name=None, scheduler=None, client=None):
         # Try to get from environment variable if not provided
         self.sheet_name = sheet_name or os.environ.get("GOOGLE_SHEET_NAME")
         
@@ -25,6 +39,24 @@ class GoogleSheetsManager:
             except Exception as e:
                 utils.debug_log(f"Failed to create credentials from environment: {str(e)}")
         
+        # An already authorized client (e.g. fake_gspread.FakeClient) skips the OAuth step
+        self.client = client
+        
+        # Every API call goes through the scheduler to stay within the Sheets quotas
+        self.scheduler = scheduler or RequestScheduler()
+        
+        # Worksheet handles and header state, cached after connecting
+        self.worksheets = {}
+        self.row_counts = {}
+        self.headers_written = set()
+        
+        # Watermark of what has been written, persisted with the local data
+        self.sync_state = {}
+        
+        # Set when worksheets had to be created, so the watermark can't be trusted to
+        # describe what's in the sheet any more
+        self.watermark_stale = False
+        
         # Set up the scope
         self.scope = [
             'https://spreadsheets.google.com/feeds',
@@ -37,22 +69,23 @@ class GoogleSheetsManager:
     def connect(self):
         """Connect to Google Sheets API"""
         try:
-            utils.debug_log(f"Connecting to Google Sheets using credentials from {self.credentials_file}")
-            credentials = ServiceAccountCredentials.from_json_keyfile_name(
-                self.credentials_file, self.scope)
-            self.client = gspread.authorize(credentials)
+            if self.client is None:
+                utils.debug_log(f"Connecting to Google Sheets using credentials from {self.credentials_file}")
+                credentials = ServiceAccountCredentials.from_json_keyfile_name(
+                    self.credentials_file, self.scope)
+                self.client = gspread.authorize(credentials)
             
             # Try to open the spreadsheet, create it if it doesn't exist
             try:
                 utils.debug_log(f"Attempting to open spreadsheet: {self.sheet_name}")
-                self.spreadsheet = self.client.open(self.sheet_name)
+                self.spreadsheet = self.request(self.client.open, self.sheet_name, kind="read")
                 utils.debug_log(f"Successfully opened spreadsheet")
                 
                 # Verify required worksheets exist
                 self.verify_worksheets()
             except gspread.SpreadsheetNotFound:
                 utils.debug_log(f"Spreadsheet not found. Creating new one: {self.sheet_name}")
-                self.spreadsheet = self.client.create(self.sheet_name)
+                self.spreadsheet = self.request(self.client.create, self.sheet_name)
                 utils.debug_log(f"New spreadsheet created successfully")
                 
                 # Initialize the sheets
@@ -62,266 +95,407 @@ class GoogleSheetsManager:
             utils.debug_log(error_msg)
             raise Exception(error_msg)
     
-    def verify_worksheets(self):
-        """Verify all required worksheets exist, create them if not"""
+    def request(self, func, *args, kind="write", priority=PRIORITY_INTERACTIVE, **kwargs):
+        """Run a gspread call through the quota scheduler"""
+        return self.scheduler.call(func, *args, kind=kind, priority=priority, **kwargs)
+    
+    def verify_worksheets(self, remove_default=False, priority=PRIORITY_INTERACTIVE):
+        """Verify all required worksheets exist, create them if not, and cache their handles"""
         utils.debug_log("Verifying required worksheets exist")
         
-        required_sheets = ["Players", "Sessions", "Session Details"]
-        existing_sheets = [ws.title for ws in self.spreadsheet.worksheets()]
+        existing_sheets = {ws.title: ws for ws in self.request(self.spreadsheet.worksheets, kind="read", priority=priority)}
+        missing_sheets = [title for title in SHEET_HEADERS if title not in existing_sheets]
         
-        for sheet_name in required_sheets:
-            if sheet_name not in existing_sheets:
-                utils.debug_log(f"Creating missing worksheet: {sheet_name}")
-                self.spreadsheet.add_worksheet(title=sheet_name, rows=1000, cols=10)
-                
-                # Initialize headers
-                if sheet_name == "Players":
-                    sheet = self.spreadsheet.worksheet(sheet_name)
-                    sheet.update('A1:E1', [['Player ID', 'Name', 'Total Sessions', 'Total Buy-ins', 'Total Profit']])
-                elif sheet_name == "Sessions":
-                    sheet = self.spreadsheet.worksheet(sheet_name)
-                    sheet.update('A1:F1', [['Session ID', 'Name', 'Date', 'Players', 'Total Buy-ins', 'Total Cash-outs']])
-                elif sheet_name == "Session Details":
-                    sheet = self.spreadsheet.worksheet(sheet_name)
-                    sheet.update('A1:H1', [['Session ID', 'Player ID', 'Player Name', 'Buy-in', 'Rebuys', 'Total In', 'Cash-out', 'Profit/Loss']])
+        if missing_sheets:
+            utils.debug_log(f"Creating missing worksheets: {', '.join(missing_sheets)}")
+            self.watermark_stale = True
+            requests = [{
+                "addSheet": {
+                    "properties": {
+                        "title": title,
+                        "gridProperties": {"rowCount": 1000, "columnCount": 10}
+                    }
+                }
+            } for title in missing_sheets]
+            
+            # A brand new spreadsheet comes with a default Sheet1 we don't need
+            if remove_default and "Sheet1" in existing_sheets:
+                requests.append({"deleteSheet": {"sheetId": existing_sheets["Sheet1"].id}})
+            
+            self.request(self.spreadsheet.batch_update, {"requests": requests}, priority=priority)
+            existing_sheets = {ws.title: ws for ws in self.request(self.spreadsheet.worksheets, kind="read", priority=priority)}
+        
+        self.worksheets = {title: existing_sheets[title] for title in SHEET_HEADERS}
+        self.row_counts = {title: existing_sheets[title].row_count for title in SHEET_HEADERS}
+        
+        # Existing worksheets already have their headers, new ones get them in one request
+        self.headers_written = set(SHEET_HEADERS) - set(missing_sheets)
+        if missing_sheets:
+            self.request(self.spreadsheet.values_batch_update, {
+                "valueInputOption": "RAW",
+                "data": [self.header_range(title) for title in missing_sheets]
+            }, priority=priority)
+            self.headers_written.update(missing_sheets)
         
         utils.debug_log("Worksheet verification complete")
     
     def initialize_sheets(self):
         """Initialize the worksheets needed for the poker tracker"""
         utils.debug_log("Initializing worksheets")
+        self.verify_worksheets(remove_default=True)
+        utils.debug_log("Worksheets initialized successfully")
+    
+    def header_range(self, title):
+        """Build the value range that writes a worksheet's header row"""
+        return {"range": f"'{title}'!A1", "values": [SHEET_HEADERS[title]]}
+    
+    def invalidate_cache(self):
+        """Forget cached worksheet handles and header state after an error"""
+        self.worksheets = {}
+        self.row_counts = {}
+        self.headers_written = set()
+    
+    def check_watermark(self):
+        """Drop the synced sessions and row mirror if the sheet may no longer match them
         
-        # Delete the default Sheet1 if it exists
-        try:
-            default_sheet = self.spreadsheet.worksheet("Sheet1")
-            self.spreadsheet.del_worksheet(default_sheet)
-            utils.debug_log("Deleted default Sheet1")
-        except:
-            utils.debug_log("Default Sheet1 not found or couldn't be deleted")
+        Transient API errors leave the watermark alone so a failed backfill resumes. It
+        is only reset when worksheets were recreated or are too short to hold the rows
+        it says were written."""
+        synced = self.sync_state.get("sessions", [])
+        if self.row_counts and synced and (
+                self.row_counts["Sessions"] < len(synced) + 1 or
+                self.row_counts["Session Details"] < sum(marker[2] for marker in synced) + 1):
+            self.watermark_stale = True
+        if self.watermark_stale:
+            utils.debug_log("Sheet state unknown, resetting the sync watermark")
+            self.sync_state.pop("sessions", None)
+            self.sync_state.pop("rows", None)
+            self.watermark_stale = False
+    
+    def resize_request(self, title, row_count):
+        """Build the request that sets a worksheet's row count"""
+        return {
+            "updateSheetProperties": {
+                "properties": {
+                    "sheetId": self.worksheets[title].id,
+                    "gridProperties": {"rowCount": row_count}
+                },
+                "fields": "gridProperties.rowCount"
+            }
+        }
+    
+    def grow_sheets(self, needed_counts, priority=PRIORITY_INTERACTIVE):
+        """Make sure worksheets have at least the given number of rows
         
-        # Create players sheet
-        try:
-            utils.debug_log("Creating Players worksheet")
-            players_sheet = self.spreadsheet.add_worksheet(title="Players", rows=1000, cols=10)
-            players_sheet.update('A1:E1', [['Player ID', 'Name', 'Total Sessions', 'Total Buy-ins', 'Total Profit']])
-            utils.debug_log("Players worksheet created successfully")
-        except Exception as e:
-            utils.debug_log(f"Error creating Players sheet: {e}")
+        Sheets at least double when they grow so a long backfill only needs a
+        few resizes; the spare rows are trimmed at the end of the sync."""
+        grown = {title: max(count, self.row_counts[title] * 2)
+                 for title, count in needed_counts.items() if count > self.row_counts[title]}
+        if grown:
+            requests = [self.resize_request(title, count) for title, count in grown.items()]
+            self.request(self.spreadsheet.batch_update, {"requests": requests}, priority=priority)
+            self.row_counts.update(grown)
+    
+    def shrink_sheets(self, final_counts, priority=PRIORITY_INTERACTIVE):
+        """Trim rows left over from a longer previous sync"""
+        shrink = [self.resize_request(title, count)
+                  for title, count in final_counts.items() if count < self.row_counts[title]]
+        if shrink:
+            self.request(self.spreadsheet.batch_update, {"requests": shrink}, priority=priority)
+            self.row_counts.update(final_counts)
+    
+    def write_ranges(self, ranges, priority=PRIORITY_INTERACTIVE):
+        """Write value ranges in one request, adding any headers still missing"""
+        data = [self.header_range(title) for title in SHEET_HEADERS if title not in self.headers_written]
+        data += ranges
+        self.request(self.spreadsheet.values_batch_update,
+                     {"valueInputOption": "RAW", "data": data}, priority=priority)
+        self.headers_written.update(SHEET_HEADERS)
+    
+    def write_session_chunk(self, chunk, first_session, first_detail, priority=PRIORITY_INTERACTIVE):
+        """Write a chunk of sessions and their detail rows starting at the given row offsets"""
+        session_rows = [session_row for _, session_row, _ in chunk]
+        detail_rows = [row for _, _, rows in chunk for row in rows]
+        utils.debug_log(f"Writing {len(session_rows)} sessions and {len(detail_rows)} detail rows")
         
-        # Create sessions sheet
-        try:
-            utils.debug_log("Creating Sessions worksheet")
-            sessions_sheet = self.spreadsheet.add_worksheet(title="Sessions", rows=1000, cols=10)
-            sessions_sheet.update('A1:F1', [['Session ID', 'Name', 'Date', 'Players', 'Total Buy-ins', 'Total Cash-outs']])
-            utils.debug_log("Sessions worksheet created successfully")
-        except Exception as e:
-            utils.debug_log(f"Error creating Sessions sheet: {e}")
+        self.grow_sheets({
+            "Sessions": first_session + len(session_rows) + 1,
+            "Session Details": first_detail + len(detail_rows) + 1
+        }, priority)
         
-        # Create session details sheet
-        try:
-            utils.debug_log("Creating Session Details worksheet")
-            details_sheet = self.spreadsheet.add_worksheet(title="Session Details", rows=1000, cols=10)
-            details_sheet.update('A1:H1', [['Session ID', 'Player ID', 'Player Name', 'Buy-in', 'Rebuys', 'Total In', 'Cash-out', 'Profit/Loss']])
-            utils.debug_log("Session Details worksheet created successfully")
-        except Exception as e:
-            utils.debug_log(f"Error creating Session Details sheet: {e}")
+        ranges = [{"range": f"'Sessions'!A{first_session + 2}", "values": session_rows}]
+        if detail_rows:
+            ranges.append({"range": f"'Session Details'!A{first_detail + 2}", "values": detail_rows})
+        self.write_ranges(ranges, priority)
+        
+        # Remember what each detail row looked like so edits made in the sheet can be spotted,
+        # keyed by row so a player entered twice in a session gets two checksums
+        mirror = self.sync_state.setdefault("rows", {})
+        for index, row in enumerate(detail_rows, first_detail):
+            mirror[str(index)] = entry_checksum(to_pence(row[3]), to_pence(row[4]), to_pence(row[6]))
     
-    def update_sheets(self, players, sessions):
-        """Update all sheets with the current data"""
-        utils.debug_log("Starting update of all sheets")
+    def write_player_chunk(self, rows, first_player, priority=PRIORITY_INTERACTIVE):
+        """Write a chunk of Players rows starting at the given row offset"""
+        self.grow_sheets({"Players": first_player + len(rows) + 1}, priority)
+        self.write_ranges([{"range": f"'Players'!A{first_player + 2}", "values": rows}], priority)
+    
+    def update_sheets(self, players, sessions, priority=PRIORITY_INTERACTIVE, save_state=None):
+        """Update all sheets with the current data
         
-        # Verify sheets exist before updating
-        self.verify_worksheets()
+        Sessions already in the sheet according to the sync watermark are skipped.
+        The rest are written in fixed-size chunks and the watermark is advanced and
+        saved after each one, so an interrupted backfill resumes where it stopped.
+        Players rows are flushed in chunks of the same size as they are produced,
+        so memory stays bounded however many rows there are. Rows are overwritten in place and stale rows only trimmed at the end, so a
+        failed sync never leaves a sheet emptied."""
+        utils.debug_log("Starting update of all sheets")
         
         try:
-            utils.debug_log(f"Updating Players sheet with {len(players)} players")
-            self.update_players_sheet(players, sessions)
-            utils.debug_log("Players sheet updated successfully")
+            # Worksheet handles are cached after connecting, only refetch after an error
+            if not self.worksheets:
+                self.verify_worksheets(priority=priority)
+            
+            # A watermark for a different spreadsheet means starting from scratch
+            if self.sync_state.get("sheet_name") != self.sheet_name:
+                self.sync_state.clear()
+                self.sync_state["sheet_name"] = self.sheet_name
+            self.check_watermark()
+            synced = self.sync_state.setdefault("sessions", [])
             
-            utils.debug_log(f"Updating Sessions sheet with {len(sessions)} sessions")
-            self.update_sessions_sheet(sessions)
-            utils.debug_log("Sessions sheet updated successfully")
+            utils.debug_log(f"Updating sheets with {len(players)} players and {len(sessions)} sessions "
+                            f"({len(synced)} sessions already synced)")
             
-            utils.debug_log("Updating Session Details sheet")
-            self.update_session_details_sheet(players, sessions)
-            utils.debug_log("Session Details sheet updated successfully")
+            session_count = 0
+            detail_count = 0
+            chunk = []
+            chunk_start = (0, 0)
+            chunk_rows = 0
+            detail_rows = []
+            player_count = 0
+            player_rows = []
+            
+            for title, row in iter_sheet_rows(players, sessions):
+                if title == "Session Details":
+                    detail_rows.append(row)
+                    continue
+                if title == "Players":
+                    # Players rows depend on every session, so they are always rewritten
+                    player_rows.append(row)
+                    if len(player_rows) >= SYNC_CHUNK_ROWS:
+                        self.write_player_chunk(player_rows, player_count, priority)
+                        player_count += len(player_rows)
+                        player_rows = []
+                    continue
+                
+                # A Sessions row closes the group of detail rows produced before it
+                marker = [row[0], rows_checksum([row] + detail_rows), len(detail_rows)]
+                if session_count < len(synced) and synced[session_count] == marker:
+                    pass  # Already in the sheet at this position
+                else:
+                    # Everything from the first difference onwards gets rewritten
+                    del synced[session_count:]
+                    if not chunk:
+                        chunk_start = (session_count, detail_count)
+                    chunk.append((marker, row, detail_rows))
+                    chunk_rows += len(detail_rows) + 1
+                    
+                    if chunk_rows >= SYNC_CHUNK_ROWS:
+                        self.write_session_chunk(chunk, *chunk_start, priority=priority)
+                        synced.extend(marker for marker, _, _ in chunk)
+                        if save_state:
+                            save_state()
+                        chunk = []
+                        chunk_rows = 0
+                
+                session_count += 1
+                detail_count += len(detail_rows)
+                detail_rows = []
+            
+            if chunk:
+                self.write_session_chunk(chunk, *chunk_start, priority=priority)
+                synced.extend(marker for marker, _, _ in chunk)
+                if save_state:
+                    save_state()
+            
+            if player_rows:
+                self.write_player_chunk(player_rows, player_count, priority)
+                player_count += len(player_rows)
+            
+            self.shrink_sheets({
+                "Players": player_count + 1,
+                "Sessions": session_count + 1,
+                "Session Details": detail_count + 1
+            }, priority)
             
             utils.debug_log("All sheets updated successfully")
+        except SheetsRateLimitError as e:
+            # Keep the type so callers can tell throttling apart and try again later
+            self.invalidate_cache()
+            utils.debug_log(f"Sheets sync throttled: {str(e)}")
+            raise
         except Exception as e:
+            self.invalidate_cache()
             error_msg = f"Error updating sheets: {str(e)}"
             utils.debug_log(error_msg)
             raise Exception(error_msg)
     
-    def update_players_sheet(self, players, sessions):
-        """Update the Players sheet with current player data"""
-        utils.debug_log(f"Getting Players worksheet")
-        try:
-            players_sheet = self.spreadsheet.worksheet("Players")
-        except Exception as e:
-            error_msg = f"Failed to get Players worksheet: {str(e)}"
-            utils.debug_log(error_msg)
-            raise Exception(error_msg)
+    def pull_session_details(self, sessions, conflict_policy="local", priority=PRIORITY_INTERACTIVE):
+        """Find Session Details rows that were edited in the sheet since the last sync
+        
+        The whole range is read in one request and each row's checksum compared
+        with the one recorded when it was written. Only rows whose amounts changed
+        are returned, as dicts with session_id, player_id, entry_index, buyin, rebuys,
+        cashout (in pence) and conflict. A row changed both in the sheet and locally is a conflict:
+        with the "sheet" policy the sheet values win, with "local" it is left out
+        and the next push overwrites the sheet."""
+        utils.debug_log("Pulling Session Details from Google Sheets")
         
-        # Clear existing data (except header)
         try:
-            utils.debug_log(f"Clearing existing data from Players sheet")
-            rows = players_sheet.row_count
-            if rows > 1:
-                players_sheet.delete_rows(2, rows)
-            utils.debug_log(f"Cleared {rows-1} rows from Players sheet")
+            response = self.request(
+                self.spreadsheet.values_batch_get,
+                ["'Session Details'!A2:H"],
+                params={"valueRenderOption": "UNFORMATTED_VALUE"},
+                kind="read",
+                priority=priority
+            )
+        except SheetsRateLimitError:
+            self.invalidate_cache()
+            raise
         except Exception as e:
-            error_msg = f"Error clearing Players sheet: {str(e)}"
+            self.invalidate_cache()
+            error_msg = f"Error reading Session Details sheet: {str(e)}"
             utils.debug_log(error_msg)
             raise Exception(error_msg)
         
-        # Calculate player stats
-        utils.debug_log(f"Calculating player stats")
-        player_stats = []
-        for player in players:
-            total_sessions = 0
-            total_buyins = 0
-            total_cashouts = 0
+        sheet_rows = response["valueRanges"][0].get("values", [])
+        self.check_watermark()
+        mirror = self.sync_state.setdefault("rows", {})
+        sessions_by_id = {session["id"]: session for session in sessions}
+        positions = {}
+        live_keys = set()
+        changes = []
+        
+        for index, row in enumerate(sheet_rows):
+            if len(row) < 7:
+                continue
+            key = str(index)
+            label = f"{row[0]}:{row[1]}"
             
-            for session in sessions:
-                for p in session["players"]:
-                    if p["id"] == player["id"]:
-                        total_sessions += 1
-                        total_buyins += p["buyin"] + p.get("rebuys", 0)
-                        total_cashouts += p.get("cashout", 0)
+            # Entries are written in order, so a row's position within its session finds its entry
+            position = positions.get(row[0], 0)
+            positions[row[0]] = position + 1
+            session = sessions_by_id.get(row[0])
+            if not session or position >= len(session["players"]) or session["players"][position]["id"] != row[1]:
+                utils.debug_log(f"Ignoring sheet row with no local entry: {label}")
+                continue
+            entry = session["players"][position]
+            live_keys.add(key)
             
-            profit = total_cashouts - total_buyins
+            try:
+                buyin, rebuys, cashout = to_pence(row[3]), to_pence(row[4] or 0), to_pence(row[6] or 0)
+            except (TypeError, ValueError):
+                utils.debug_log(f"Skipping Session Details row with invalid amounts: {label}")
+                continue
             
-            player_stats.append([
-                player["id"], 
-                player["name"], 
-                total_sessions, 
-                total_buyins, 
-                profit
-            ])
+            sheet_checksum = entry_checksum(buyin, rebuys, cashout)
+            if mirror.get(key) == sheet_checksum:
+                continue  # Unchanged since we wrote it
+            
+            local_checksum = entry_checksum(entry["buyin"], entry.get("rebuys", 0), entry.get("cashout", 0))
+            if local_checksum == sheet_checksum:
+                mirror[key] = sheet_checksum
+                continue
+            
+            # Without a recorded checksum we can't tell which side changed
+            conflict = key not in mirror or local_checksum != mirror[key]
+            if conflict and conflict_policy != "sheet":
+                utils.debug_log(f"Keeping local values for conflicting row {label}")
+                continue
+            
+            changes.append({
+                "session_id": row[0],
+                "player_id": row[1],
+                "entry_index": position,
+                "buyin": buyin,
+                "rebuys": rebuys,
+                "cashout": cashout,
+                "conflict": conflict
+            })
+            mirror[key] = sheet_checksum
         
-        # Update the sheet
-        utils.debug_log(f"Appending {len(player_stats)} rows of player data")
-        if player_stats:
-            try:
-                players_sheet.append_rows(player_stats)
-                utils.debug_log(f"Successfully appended player data")
-            except Exception as e:
-                error_msg = f"Error appending player data: {str(e)}"
-                utils.debug_log(error_msg)
-                raise Exception(error_msg)
-        else:
-            utils.debug_log("No player data to append")
-    
-    def update_sessions_sheet(self, sessions):
-        """Update the Sessions sheet with current session data"""
-        utils.debug_log(f"Getting Sessions worksheet")
-        try:
-            sessions_sheet = self.spreadsheet.worksheet("Sessions")
-        except Exception as e:
-            error_msg = f"Failed to get Sessions worksheet: {str(e)}"
-            utils.debug_log(error_msg)
-            raise Exception(error_msg)
+        # Forget rows that are gone from the sheet or no longer match a local entry
+        for key in [key for key in mirror if key not in live_keys]:
+            del mirror[key]
         
-        # Clear existing data (except header)
-        try:
-            utils.debug_log(f"Clearing existing data from Sessions sheet")
-            rows = sessions_sheet.row_count
-            if rows > 1:
-                sessions_sheet.delete_rows(2, rows)
-            utils.debug_log(f"Cleared {rows-1} rows from Sessions sheet")
-        except Exception as e:
-            error_msg = f"Error clearing Sessions sheet: {str(e)}"
-            utils.debug_log(error_msg)
-            raise Exception(error_msg)
+        utils.debug_log(f"Found {len(changes)} changed rows in Session Details")
+        return changes
+
+def entry_checksum(buyin, rebuys, cashout):
+    """Checksum the editable amounts of a session entry, given in pence"""
+    # Formatted as pounds so checksums recorded before amounts were in pence still match
+    return zlib.crc32(f"{format_pence(buyin, '')}|{format_pence(rebuys, '')}|{format_pence(cashout, '')}".encode())
+
+def rows_checksum(rows):
+    """Checksum a group of sheet rows, used to tell whether they changed since the last sync"""
+    return hashlib.sha1(json.dumps(rows, default=str).encode()).hexdigest()[:16]
+
+def iter_sheet_rows(players, sessions):
+    """Yield (worksheet title, row) for every worksheet from one pass over the sessions
+    
+    Sessions and Session Details rows are produced while each session is visited.
+    Players rows need the totals, so they follow once every session has been seen.
+    Totals are summed in pence and only the cells are in pounds."""
+    player_names = {player["id"]: player["name"] for player in players}
+    
+    # Running totals per player: sessions, buy-ins, cash-outs
+    player_totals = {player["id"]: [0, 0, 0] for player in players}
+    
+    for session in sessions:
+        total_buyin = 0
+        total_cashout = 0
         
-        # Format session data
-        utils.debug_log(f"Formatting session data")
-        session_data = []
-        for session in sessions:
-            date = datetime.datetime.fromisoformat(session["date"]).strftime("%Y-%m-%d")
-            players_count = len(session["players"])
-            total_buyin = sum(p["buyin"] + p.get("rebuys", 0) for p in session["players"])
-            total_cashout = sum(p.get("cashout", 0) for p in session["players"])
+        for player in session["players"]:
+            rebuys = player.get("rebuys", 0)
+            cashout = player.get("cashout", 0)
+            total_in = player["buyin"] + rebuys
+            profit = cashout - total_in
             
-            session_data.append([
+            yield "Session Details", [
                 session["id"],
-                session["name"],
-                date,
-                players_count,
-                total_buyin,
-                total_cashout
-            ])
+                player["id"], 
+                player_names.get(player["id"], "Unknown Player"),
+                to_pounds(player["buyin"]),
+                to_pounds(rebuys),
+                to_pounds(total_in),
+                to_pounds(cashout),
+                to_pounds(profit)
+            ]
+            
+            totals = player_totals.get(player["id"])
+            if totals is not None:
+                totals[0] += 1
+                totals[1] += total_in
+                totals[2] += cashout
+            
+            total_buyin += total_in
+            total_cashout += cashout
         
-        # Update the sheet
-        utils.debug_log(f"Appending {len(session_data)} rows of session data")
-        if session_data:
-            try:
-                sessions_sheet.append_rows(session_data)
-                utils.debug_log(f"Successfully appended session data")
-            except Exception as e:
-                error_msg = f"Error appending session data: {str(e)}"
-                utils.debug_log(error_msg)
-                raise Exception(error_msg)
-        else:
-            utils.debug_log("No session data to append")
+        date = datetime.datetime.fromisoformat(session["date"]).strftime("%Y-%m-%d")
+        yield "Sessions", [
+            session["id"],
+            session["name"],
+            date,
+            len(session["players"]),
+            to_pounds(total_buyin),
+            to_pounds(total_cashout)
+        ]
     
-    def update_session_details_sheet(self, players, sessions):
-        """Update the Session Details sheet with detailed session data"""
-        utils.debug_log(f"Getting Session Details worksheet")
-        try:
-            details_sheet = self.spreadsheet.worksheet("Session Details")
-        except Exception as e:
-            error_msg = f"Failed to get Session Details worksheet: {str(e)}"
-            utils.debug_log(error_msg)
-            raise Exception(error_msg)
-        
-        # Clear existing data (except header)
-        try:
-            utils.debug_log(f"Clearing existing data from Session Details sheet")
-            rows = details_sheet.row_count
-            if rows > 1:
-                details_sheet.delete_rows(2, rows)
-            utils.debug_log(f"Cleared {rows-1} rows from Session Details sheet")
-        except Exception as e:
-            error_msg = f"Error clearing Session Details sheet: {str(e)}"
-            utils.debug_log(error_msg)
-            raise Exception(error_msg)
-        
-        # Create a mapping of player IDs to names
-        utils.debug_log(f"Creating player ID to name mapping")
-        player_names = {player["id"]: player["name"] for player in players}
-        
-        # Format session details data
-        utils.debug_log(f"Formatting session details data")
-        details_data = []
-        for session in sessions:
-            for player in session["players"]:
-                player_name = player_names.get(player["id"], "Unknown Player")
-                rebuys = player.get("rebuys", 0)
-                cashout = player.get("cashout", 0)
-                total_in = player["buyin"] + rebuys
-                profit = cashout - total_in
-                
-                details_data.append([
-                    session["id"],
-                    player["id"],
-                    player_name,
-                    player["buyin"],
-                    rebuys,
-                    total_in,
-                    cashout,
-                    profit
-                ])
-        
-        # Update the sheet
-        utils.debug_log(f"Appending {len(details_data)} rows of session details data")
-        if details_data:
-            try:
-                details_sheet.append_rows(details_data)
-                utils.debug_log(f"Successfully appended session details data")
-            except Exception as e:
-                error_msg = f"Error appending session details data: {str(e)}"
-                utils.debug_log(error_msg)
-                raise Exception(error_msg)
-        else:
-            utils.debug_log("No session details data to append") 
\ No newline at end of file
+    for player in players:
+        total_sessions, total_buyins, total_cashouts = player_totals[player["id"]]
+        yield "Players", [
+            player["id"],
+            player["name"],
+            total_sessions,
+            to_pounds(total_buyins),
+            to_pounds(total_cashouts - total_buyins)
+        ]
\ No newline at end of file
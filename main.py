@@ -1,17 +1,63 @@
 import os
 import json
+import calendar
+from concurrent.futures import ThreadPoolExecutor
 import customtkinter as ctk
 from PIL import Image
 import tkinter as tk
 from session_manager import SessionManager
 from player_manager import PlayerManager
-from google_sheets import GoogleSheetsManager
+from bankroll_chart import BankrollChart
+from sync_worker import SheetsSyncWorker
+from core.storage import DataStore
+from core.entries import json_default
+from core import integrity, money, simulation
+from table_server import TableServer, DEFAULT_HOST, DEFAULT_PORT, generate_token, is_loopback
 import utils
 
 # Set appearance mode and default color theme
 ctk.set_appearance_mode("Dark")  # Modes: "System" (standard), "Dark", "Light"
 ctk.set_default_color_theme("blue")  # Themes: "blue" (standard), "green", "dark-blue"
 
+# How often live tables append their new events to their journals
+JOURNAL_INTERVAL_MS = 2000
+
+# Windows offered on the Statistics view besides all time, months and seasons
+STATS_WINDOWS = {
+    "Last 10 sessions": ("sessions", 10),
+    "Last 25 sessions": ("sessions", 25),
+    "Last 30 days": ("days", 30),
+    "Last 90 days": ("days", 90),
+    "Last 365 days": ("days", 365)
+}
+
+# Statistics view columns as (header, leaderboard key, how to show the value)
+STATS_COLUMNS = [
+    ("Player", "name", "text"),
+    ("Sessions", "sessions", "count"),
+    ("Total Buy-ins", "buyins", "money"),
+    ("Total Cash-outs", "cashouts", "money"),
+    ("Profit/Loss", "profit", "signed"),
+    ("Avg. Profit Per Session", "avg_profit", "signed"),
+    ("Std. Dev.", "std_dev", "money"),
+    ("Max Drawdown", "max_drawdown", "money"),
+    ("Losing Streak", "longest_losing_streak", "count"),
+    ("Consistency", "consistency", "ratio"),
+    ("Rating", "rating", "count")
+]
+
+# Players shown on the Statistics view before Show More
+STATS_PAGE_ROWS = 25
+
+def format_stat(value, kind):
+    if value is None:
+        return "-"
+    if kind in ("money", "signed"):
+        return utils.format_currency(value)
+    if kind == "ratio":
+        return f"{value:.2f}"
+    return str(value)
+
 class PokerApp(ctk.CTk):
     def __init__(self):
         super().__init__()
@@ -25,26 +71,72 @@ class PokerApp(ctk.CTk):
         self.geometry("1100x700")
         self.minsize(900, 600)
         
+        # Players and sessions live in the store, the managers are views over it
+        self.data_file = self.config["data_file"]
+        self.store = DataStore(self.data_file)
+        
         # Initialize managers
         self.player_manager = PlayerManager(self)
         self.session_manager = SessionManager(self, self.player_manager)
+        self.bankroll_chart = BankrollChart(self)
         
-        try:
-            self.sheets_manager = GoogleSheetsManager(
+        # Google Sheets either runs in a separate worker process or in this one
+        self.sheets_manager = None
+        self.sync_worker = None
+        if self.config.get("sheets_sync_worker", False):
+            self.sync_worker = SheetsSyncWorker(
                 self.config["google_credentials_file"],
-                self.config["google_sheet_name"]
+                self.config["google_sheet_name"],
+                self.config.get("sheets_conflict_policy", "local")
             )
-        except Exception as e:
-            print(f"Google Sheets integration failed: {e}")
-            self.sheets_manager = None
+        else:
+            try:
+                from google_sheets import GoogleSheetsManager
+                self.sheets_manager = GoogleSheetsManager(
+                    self.config["google_credentials_file"],
+                    self.config["google_sheet_name"]
+                )
+            except Exception as e:
+                print(f"Google Sheets integration failed: {e}")
+        
+        # Google Sheets sync watermark, shared with the sheets manager and saved with the data
+        self.sheets_sync_state = self.store.sheets_sync
+        if self.sheets_manager:
+            self.sheets_manager.sync_state = self.sheets_sync_state
         
         # Create layout first
         self.create_ui()
         
         # Then load saved data after UI exists
-        self.data_file = self.config["data_file"]
         self.load_data()
         
+        # Optional local API so results can be entered from phones at the table
+        self.table_server = None
+        if self.config.get("table_server_enabled", False):
+            host = self.config.get("table_server_host", DEFAULT_HOST)
+            if not is_loopback(host) and not self.config.get("table_server_token"):
+                # Phones on the network need a token, so make one the first time and keep it
+                self.config["table_server_token"] = generate_token()
+                try:
+                    with open('config.json', 'w') as f:
+                        json.dump(self.config, f, indent=4)
+                except OSError as e:
+                    utils.debug_log(f"Failed to save the table server token: {e}")
+            self.table_server = TableServer(
+                self.store,
+                host,
+                self.config.get("table_server_port", DEFAULT_PORT),
+                self.config.get("table_server_token", ""),
+                end_session=self.session_manager.finish_current_session,
+                on_change=self.on_table_change
+            )
+            self.table_server.start()
+            self.show_table_server_address()
+            self.after(50, self.poll_table_server)
+        
+        # Journal each live table's new events every few seconds, so a crash loses almost nothing
+        self.after(JOURNAL_INTERVAL_MS, self.autosave_tables)
+        
         # Auto-save on close
         self.protocol("WM_DELETE_WINDOW", self.on_close)
     
@@ -113,6 +205,8 @@ class PokerApp(ctk.CTk):
     
     def show_players_view(self):
         self.hide_all_frames()
+        # Ratings move whenever a session ends
+        self.player_manager.refresh_players_view()
         self.players_view.grid(row=0, column=0, sticky="nsew")
         self.players_button.configure(fg_color=self.config["accent_color"])
     
@@ -142,11 +236,31 @@ class PokerApp(ctk.CTk):
         header = ctk.CTkLabel(frame, text="Statistics", font=ctk.CTkFont(size=24, weight="bold"))
         header.grid(row=0, column=0, padx=20, pady=(20, 10), sticky="w")
         
-        # Stats content will be populated by the session manager
-        # We'll add a refresh button and some stats display
-        refresh_button = ctk.CTkButton(frame, text="Refresh Stats", 
+        controls_frame = ctk.CTkFrame(frame, fg_color="transparent")
+        controls_frame.grid(row=1, column=0, padx=20, pady=10, sticky="w")
+        
+        refresh_button = ctk.CTkButton(controls_frame, text="Refresh Stats", 
                                       command=self.update_stats)
-        refresh_button.grid(row=1, column=0, padx=20, pady=10, sticky="w")
+        refresh_button.grid(row=0, column=0, padx=(0, 20))
+        
+        # Which part of the history the stats cover, filled in with the months and seasons played
+        self.stats_window_var = tk.StringVar(value="All time")
+        self.stats_window_menu = ctk.CTkComboBox(controls_frame, values=["All time"] + list(STATS_WINDOWS), width=180,
+                                                 variable=self.stats_window_var, state="readonly",
+                                                 command=lambda _: self.update_stats())
+        self.stats_window_menu.grid(row=0, column=1)
+        
+        # Column the stats are ranked by, and whether highest first
+        self.stats_sort = ("profit", True)
+        self.leaderboard = None
+        
+        head_to_head_button = ctk.CTkButton(controls_frame, text="Head to Head", 
+                                           command=self.show_head_to_head)
+        head_to_head_button.grid(row=0, column=2, padx=(20, 0))
+        
+        simulation_button = ctk.CTkButton(controls_frame, text="Luck Simulation", 
+                                         command=self.show_simulation)
+        simulation_button.grid(row=0, column=3, padx=(20, 0))
         
         # Container for stats - make it fill available space
         stats_container = ctk.CTkFrame(frame)
@@ -156,6 +270,9 @@ class PokerApp(ctk.CTk):
         
         self.stats_container = stats_container
         
+        chart_frame = self.bankroll_chart.create_view(frame)
+        chart_frame.grid(row=3, column=0, padx=20, pady=(0, 20), sticky="ew")
+        
         return frame
     
     def create_settings_view(self):
@@ -191,6 +308,9 @@ class PokerApp(ctk.CTk):
                                    command=self.sync_to_sheets)
         sync_button.grid(row=0, column=1, padx=20, pady=10)
         
+        self.sync_status_label = ctk.CTkLabel(gsheets_frame, text="")
+        self.sync_status_label.grid(row=0, column=2, padx=20, pady=10, sticky="w")
+        
         # Data management
         data_frame = ctk.CTkFrame(frame)
         data_frame.grid(row=3, column=0, padx=20, pady=10, sticky="ew")
@@ -207,6 +327,10 @@ class PokerApp(ctk.CTk):
                                      command=self.import_data)
         import_button.grid(row=0, column=2, padx=20, pady=10)
         
+        check_button = ctk.CTkButton(data_frame, text="Check Data", 
+                                    command=self.check_data)
+        check_button.grid(row=0, column=3, padx=20, pady=10)
+        
         # Payment settings
         payment_frame = ctk.CTkFrame(frame)
         payment_frame.grid(row=4, column=0, padx=20, pady=10, sticky="ew")
@@ -285,13 +409,46 @@ class PokerApp(ctk.CTk):
                                        command=save_payment_settings)
         save_payment_btn.grid(row=6, column=0, padx=20, pady=20, columnspan=2)
         
+        # Where phones at the table reach the local API
+        table_server_frame = ctk.CTkFrame(frame)
+        table_server_frame.grid(row=5, column=0, padx=20, pady=10, sticky="ew")
+        
+        table_server_label = ctk.CTkLabel(table_server_frame, text="Table Server:",
+                                          font=ctk.CTkFont(weight="bold"))
+        table_server_label.grid(row=0, column=0, padx=20, pady=10, sticky="nw")
+        
+        self.table_server_address_label = ctk.CTkLabel(table_server_frame, text="Not enabled", justify="left")
+        self.table_server_address_label.grid(row=0, column=1, padx=20, pady=10, sticky="w")
+        
+        self.copy_table_server_button = ctk.CTkButton(table_server_frame, text="Copy Link", state="disabled",
+                                                      command=self.copy_table_server_link)
+        self.copy_table_server_button.grid(row=0, column=2, padx=20, pady=10)
+        
         return frame
     
+    def show_table_server_address(self):
+        """Show the table server's address and token on the Settings view"""
+        if not self.table_server.running:
+            self.table_server_address_label.configure(text=f"Failed to start on port {self.table_server.port}")
+            return
+        text = f"Listening on {self.table_server.url()}"
+        if self.table_server.token:
+            text += f"\nToken: {self.table_server.token}"
+        self.table_server_address_label.configure(text=text)
+        self.copy_table_server_button.configure(state="normal")
+    
+    def copy_table_server_link(self):
+        """Copy the table server's address, with its token, for sending to the players' phones"""
+        self.clipboard_clear()
+        self.clipboard_append(self.table_server.url(with_token=True))
+    
     def change_appearance_mode(self, mode):
         ctk.set_appearance_mode(mode)
     
     def sync_to_sheets(self):
-        if self.sheets_manager:
+        if self.sync_worker:
+            self.start_background_sync()
+        elif self.sheets_manager:
             try:
                 utils.debug_log("Starting Google Sheets sync...")
                 player_data = self.player_manager.get_all_players()
@@ -302,7 +459,17 @@ class PokerApp(ctk.CTk):
                 # Print out the sheet name we're connecting to
                 utils.debug_log(f"Connecting to sheet: {self.config['google_sheet_name']}")
                 
-                self.sheets_manager.update_sheets(player_data, session_data)
+                # Pull edits made directly in the sheet before pushing our data over them
+                changes = self.sheets_manager.pull_session_details(
+                    session_data,
+                    conflict_policy=self.config.get("sheets_conflict_policy", "local")
+                )
+                if changes:
+                    self.session_manager.apply_sheet_changes(changes)
+                    utils.debug_log(f"Pulled {len(changes)} changed rows from Google Sheets")
+                
+                # Save the watermark after each chunk so an interrupted sync can resume
+                self.sheets_manager.update_sheets(player_data, session_data, save_state=self.save_data)
                 utils.show_message("Success", "Data synchronized with Google Sheets successfully!")
                 
                 # Show the user where to find the sheet
@@ -318,16 +485,83 @@ class PokerApp(ctk.CTk):
         else:
             utils.show_error("Not Available", "Google Sheets integration is not available.")
     
+    def start_background_sync(self):
+        """Hand a sync to the worker process and watch for its progress"""
+        if self.sync_worker.is_busy():
+            utils.show_message("Sync Running", "A Google Sheets sync is already in progress.")
+            return
+        
+        # The worker keeps its own copy of the sessions and is only sent the changed ones
+        player_data = self.player_manager.get_all_players()
+        session_data = self.session_manager.get_all_sessions()
+        self.sync_worker.submit(player_data, session_data, self.sheets_sync_state)
+        self.sync_status_label.configure(text="Sync started...")
+        self.after(200, self.poll_sync_worker)
+    
+    def poll_sync_worker(self):
+        """Handle events from the sync worker, rescheduling while a job is running"""
+        for kind, job_id, payload in self.sync_worker.poll():
+            if kind == "progress":
+                self.sync_status_label.configure(text=payload)
+            elif kind == "changes":
+                self.session_manager.apply_sheet_changes(payload)
+                utils.debug_log(f"Pulled {len(payload)} changed rows from Google Sheets")
+            elif kind in ("state", "done"):
+                self.sheets_sync_state.clear()
+                self.sheets_sync_state.update(payload)
+                self.save_data()
+                if kind == "done":
+                    self.sync_status_label.configure(text="Sync complete")
+            elif kind == "error":
+                self.sync_status_label.configure(text="Sync failed")
+                error_message = f"Failed to sync with Google Sheets: {payload}"
+                utils.debug_log(error_message)
+                utils.show_error("Sync Error", error_message)
+        
+        if self.sync_worker.is_busy():
+            self.after(200, self.poll_sync_worker)
+    
+    def autosave_tables(self):
+        try:
+            self.store.flush_journals()
+        except OSError as e:
+            utils.debug_log(f"Failed to journal live tables: {e}")
+        self.after(JOURNAL_INTERVAL_MS, self.autosave_tables)
+    
+    def poll_table_server(self):
+        """Apply requests from the table server on the Tk thread"""
+        self.table_server.process_commands()
+        self.after(50, self.poll_table_server)
+    
+    def on_table_change(self):
+        self.session_manager.refresh_current_session()
+        self.save_data()
+    
     def update_stats(self):
+        self.bankroll_chart.refresh()
+        
+        # Rank from the aggregates once, so sorting by a column only reorders these rows.
+        # Spread, drawdown and rating always cover every completed session.
+        self.leaderboard = self.store.leaderboard(self.window_stats(self.stats_window_var.get()))
+        self.stats_rows_shown = STATS_PAGE_ROWS
+        self.render_stats()
+    
+    def sort_stats(self, key):
+        key_now, descending = self.stats_sort
+        # A second click flips the order; names start A to Z and numbers highest first
+        self.stats_sort = (key, not descending) if key == key_now else (key, key != "name")
+        self.render_stats()
+    
+    def show_more_stats(self):
+        self.stats_rows_shown += STATS_PAGE_ROWS
+        self.render_stats()
+    
+    def render_stats(self):
         # Clear existing stats
         for widget in self.stats_container.winfo_children():
             widget.destroy()
         
-        # Get stats data
-        players = self.player_manager.get_all_players()
-        sessions = self.session_manager.get_all_sessions()
-        
-        if not players:
+        if not self.leaderboard.rows:
             no_data = ctk.CTkLabel(self.stats_container, text="No player data available")
             no_data.grid(row=0, column=0, padx=20, pady=20)
             return
@@ -335,61 +569,208 @@ class PokerApp(ctk.CTk):
         # Create a scrollable frame for player stats - make it fill available space
         player_stats_frame = ctk.CTkScrollableFrame(self.stats_container, label_text="Player Stats")
         player_stats_frame.grid(row=0, column=0, padx=20, pady=10, sticky="nsew")
-        
-        # Configure columns with appropriate weights
-        for i in range(6):  # For the 6 columns you have
-            player_stats_frame.grid_columnconfigure(i, weight=1 if i in [0, 4, 5] else 0)
-            # Columns with text that should expand have weight=1, numeric columns have weight=0
-        
-        # Headers
-        headers = ["Player", "Sessions", "Total Buy-ins", "Total Cash-outs", "Profit/Loss", "Avg. Profit Per Session"]
-        for i, header in enumerate(headers):
-            lbl = ctk.CTkLabel(player_stats_frame, text=header, font=ctk.CTkFont(weight="bold"))
-            lbl.grid(row=0, column=i, padx=10, pady=5, sticky="w")
-        
-        # Player stats
-        for i, player in enumerate(players):
-            name_lbl = ctk.CTkLabel(player_stats_frame, text=player["name"])
-            name_lbl.grid(row=i+1, column=0, padx=10, pady=5, sticky="w")
-            
-            # Calculate player stats
-            player_sessions = 0
-            total_buyins = 0
-            total_cashouts = 0
-            
-            for session in sessions:
-                for p in session["players"]:
-                    if p["id"] == player["id"]:
-                        player_sessions += 1
-                        total_buyins += p["buyin"]
-                        total_cashouts += p["cashout"]
-            
-            profit = total_cashouts - total_buyins
-            avg_profit = profit / player_sessions if player_sessions > 0 else 0
-            
-            sessions_lbl = ctk.CTkLabel(player_stats_frame, text=str(player_sessions))
-            sessions_lbl.grid(row=i+1, column=1, padx=10, pady=5, sticky="w")
-            
-            buyins_lbl = ctk.CTkLabel(player_stats_frame, text=f"£{total_buyins:.2f}")
-            buyins_lbl.grid(row=i+1, column=2, padx=10, pady=5, sticky="w")
-            
-            cashouts_lbl = ctk.CTkLabel(player_stats_frame, text=f"£{total_cashouts:.2f}")
-            cashouts_lbl.grid(row=i+1, column=3, padx=10, pady=5, sticky="w")
+        player_stats_frame.grid_columnconfigure(0, weight=1)
+        
+        # Headers sort by their column when clicked
+        sort_key, descending = self.stats_sort
+        for column, (header, key, _) in enumerate(STATS_COLUMNS):
+            text = header + (" ▼" if descending else " ▲") * (key == sort_key)
+            header_btn = ctk.CTkButton(player_stats_frame, text=text, font=ctk.CTkFont(weight="bold"),
+                                       fg_color="transparent", text_color=("gray10", "gray90"), anchor="w",
+                                       width=40, command=lambda key=key: self.sort_stats(key))
+            header_btn.grid(row=0, column=column, padx=4, pady=5, sticky="w")
+        
+        # Only the rows in view are built, the rest wait for Show More
+        rows = self.leaderboard.top(sort_key, self.stats_rows_shown, lowest=not descending)
+        for i, row in enumerate(rows):
+            for column, (_, key, kind) in enumerate(STATS_COLUMNS):
+                value = row.get(key)
+                color = None
+                if kind == "signed" and value is not None:
+                    color = "green" if value >= 0 else "red"
+                lbl = ctk.CTkLabel(player_stats_frame, text=format_stat(value, kind), text_color=color)
+                lbl.grid(row=i+1, column=column, padx=10, pady=5, sticky="w")
+        
+        if len(self.leaderboard.rows) > len(rows):
+            more_text = f"Show More ({len(rows)} of {len(self.leaderboard.rows)})"
+            more_button = ctk.CTkButton(player_stats_frame, text=more_text, command=self.show_more_stats)
+            more_button.grid(row=len(rows) + 1, column=0, padx=10, pady=10, sticky="w")
+    
+    def window_stats(self, window):
+        """Stats for the window chosen on the Statistics view, keyed by player id"""
+        windows = self.store.windowed_stats()
+        months = {f"{calendar.month_name[month]} {year}": (year, month) for year, month in windows.months()}
+        seasons = {f"{name} {year}": (year, name) for year, name in windows.seasons()}
+        self.stats_window_menu.configure(values=["All time"] + list(STATS_WINDOWS) + list(months) + list(seasons))
+        
+        if window in STATS_WINDOWS:
+            kind, size = STATS_WINDOWS[window]
+            return windows.last_days(size) if kind == "days" else windows.last_sessions(size)
+        if window in months:
+            return windows.month(*months[window])
+        if window in seasons:
+            return windows.season(*seasons[window])
+        # All time is projected from the session events, so live tables count too
+        return self.store.player_stats()
+    
+    def show_head_to_head(self):
+        """How a player does with each of the others at the table"""
+        matrix = self.store.head_to_head()
+        names = {player["id"]: player["name"] for player in self.store.players if player["id"] in matrix.rows}
+        if not names:
+            utils.show_error("Head to Head", "No completed sessions yet.")
+            return
+        ids = {name: player_id for player_id, name in sorted(names.items(), key=lambda item: item[1])}
+        rankings = {"Most sessions together": ("sessions", False), "Best results with": ("avg_profit", False),
+                    "Worst results with": ("avg_profit", True)}
+        
+        dialog = ctk.CTkToplevel(self)
+        dialog.title("Head to Head")
+        dialog.geometry("640x480")
+        dialog.grab_set()  # Make dialog modal
+        dialog.grid_columnconfigure(1, weight=1)
+        dialog.grid_rowconfigure(3, weight=1)
+        
+        # Center the dialog
+        utils.center_window(dialog, self)
+        
+        player_label = ctk.CTkLabel(dialog, text="Player:")
+        player_label.grid(row=0, column=0, padx=20, pady=(20, 0), sticky="w")
+        player_var = ctk.StringVar(value=next(iter(ids)))
+        player_menu = ctk.CTkOptionMenu(dialog, values=list(ids), variable=player_var,
+                                        command=lambda _: show_partners())
+        player_menu.grid(row=0, column=1, padx=20, pady=(20, 0), sticky="w")
+        
+        against_label = ctk.CTkLabel(dialog, text="Against:")
+        against_label.grid(row=1, column=0, padx=20, pady=(10, 0), sticky="w")
+        against_var = ctk.StringVar(value="Top partners")
+        against_menu = ctk.CTkOptionMenu(dialog, values=["Top partners"] + list(ids), variable=against_var,
+                                         command=lambda _: show_partners())
+        against_menu.grid(row=1, column=1, padx=20, pady=(10, 0), sticky="w")
+        
+        rank_label = ctk.CTkLabel(dialog, text="Rank by:")
+        rank_label.grid(row=2, column=0, padx=20, pady=(10, 0), sticky="w")
+        rank_var = ctk.StringVar(value=next(iter(rankings)))
+        rank_menu = ctk.CTkOptionMenu(dialog, values=list(rankings), variable=rank_var,
+                                      command=lambda _: show_partners())
+        rank_menu.grid(row=2, column=1, padx=20, pady=(10, 0), sticky="w")
+        
+        results_frame = ctk.CTkScrollableFrame(dialog)
+        results_frame.grid(row=3, column=0, columnspan=2, padx=20, pady=20, sticky="nsew")
+        
+        def show_partners():
+            for widget in results_frame.winfo_children():
+                widget.destroy()
+            player_id = ids[player_var.get()]
+            if against_var.get() in ids:
+                pair = matrix.pair(player_id, ids[against_var.get()])
+                partners = [(ids[against_var.get()], pair)] if pair else []
+            else:
+                key, lowest = rankings[rank_var.get()]
+                partners = matrix.top_partners(player_id, 10, key, lowest)
             
-            profit_lbl = ctk.CTkLabel(player_stats_frame, 
-                                     text=f"£{profit:.2f}", 
-                                     text_color="green" if profit >= 0 else "red")
-            profit_lbl.grid(row=i+1, column=4, padx=10, pady=5, sticky="w")
+            headers = ["With", "Sessions", "Profit", "Avg. With", "Avg. Overall", "Their Profit"]
+            for column, header in enumerate(headers):
+                lbl = ctk.CTkLabel(results_frame, text=header, font=ctk.CTkFont(weight="bold"))
+                lbl.grid(row=0, column=column, padx=10, pady=5, sticky="w")
+            if not partners:
+                lbl = ctk.CTkLabel(results_frame, text="They haven't played together")
+                lbl.grid(row=1, column=0, columnspan=len(headers), padx=10, pady=5, sticky="w")
+            for row, (partner_id, pair) in enumerate(partners, start=1):
+                values = [names.get(partner_id, "Unknown Player"), str(pair["sessions"]),
+                          utils.format_currency(pair["profit"]), utils.format_currency(pair["avg_profit"]),
+                          utils.format_currency(pair["overall_avg_profit"]),
+                          utils.format_currency(pair["partner_profit"])]
+                for column, value in enumerate(values):
+                    lbl = ctk.CTkLabel(results_frame, text=value)
+                    lbl.grid(row=row, column=column, padx=10, pady=5, sticky="w")
+        
+        show_partners()
+    
+    def show_simulation(self):
+        """Simulate a player's luck from their completed sessions"""
+        names = {player["name"]: player["id"] for player in self.store.players}
+        played = [name for name, player_id in sorted(names.items())
+                  if len(simulation.player_results(self.store.sessions, player_id)) >= 2]
+        if not played:
+            utils.show_error("Luck Simulation", "Players need at least two completed sessions to simulate.")
+            return
+        
+        dialog = ctk.CTkToplevel(self)
+        dialog.title("Luck Simulation")
+        dialog.geometry("520x420")
+        dialog.grab_set()  # Make dialog modal
+        dialog.grid_columnconfigure(1, weight=1)
+        
+        # Center the dialog
+        utils.center_window(dialog, self)
+        
+        player_var = ctk.StringVar(value=played[0])
+        sessions_var = ctk.StringVar(value="100")
+        bankroll_var = ctk.StringVar(value="100.00")
+        trials_var = ctk.StringVar(value="10000")
+        method_var = ctk.StringVar(value=simulation.METHODS[0])
+        fields = [("Player:", ctk.CTkOptionMenu(dialog, values=played, variable=player_var)),
+                  ("Sessions Ahead:", ctk.CTkEntry(dialog, textvariable=sessions_var)),
+                  ("Bankroll (£):", ctk.CTkEntry(dialog, textvariable=bankroll_var)),
+                  ("Trials:", ctk.CTkEntry(dialog, textvariable=trials_var)),
+                  ("Method:", ctk.CTkOptionMenu(dialog, values=list(simulation.METHODS), variable=method_var))]
+        for row, (text, widget) in enumerate(fields):
+            label = ctk.CTkLabel(dialog, text=text)
+            label.grid(row=row, column=0, padx=20, pady=(10, 0), sticky="w")
+            widget.grid(row=row, column=1, padx=20, pady=(10, 0), sticky="ew")
+        
+        result_label = ctk.CTkLabel(dialog, text="", justify="left")
+        result_label.grid(row=len(fields) + 1, column=0, columnspan=2, padx=20, pady=10, sticky="w")
+        
+        def show_report(future):
+            if not dialog.winfo_exists():
+                return
+            if not future.done():
+                dialog.after(100, show_report, future)
+                return
+            run_button.configure(state="normal")
+            try:
+                report = future.result()
+            except (ImportError, ValueError) as e:
+                result_label.configure(text=str(e))
+                return
+            win_rate, final = report["win_rate"], report["final"]
+            ruin_low, ruin_high = report["risk_of_ruin_interval"]
+            result_label.configure(text=(
+                f"Averaging {utils.format_currency(report['observed_win_rate'])} a session so far.\n"
+                f"Over {report['sessions']} sessions, 95% of {report['trials']} trials ended between\n"
+                f"{utils.format_currency(final['low'])} and {utils.format_currency(final['high'])}, "
+                f"a win rate of {utils.format_currency(win_rate['low'])} to "
+                f"{utils.format_currency(win_rate['high'])} a session.\n"
+                f"Risk of ruin: {report['risk_of_ruin']:.1%} ({ruin_low:.1%} to {ruin_high:.1%})"))
+        
+        def run():
+            try:
+                horizon = int(sessions_var.get())
+                trials = int(trials_var.get())
+                bankroll = money.to_pence(bankroll_var.get())
+            except ValueError:
+                utils.show_error("Error", "Sessions, trials and bankroll must be numbers.", parent=dialog)
+                return
+            results = simulation.player_results(self.store.sessions, names[player_var.get()])
             
-            avg_lbl = ctk.CTkLabel(player_stats_frame, 
-                                  text=f"£{avg_profit:.2f}", 
-                                  text_color="green" if avg_profit >= 0 else "red")
-            avg_lbl.grid(row=i+1, column=5, padx=10, pady=5, sticky="w")
+            # The trials run in worker processes, so keep the window responsive while they do
+            run_button.configure(state="disabled")
+            result_label.configure(text="Simulating...")
+            executor = ThreadPoolExecutor(max_workers=1)
+            future = executor.submit(simulation.simulate, results, horizon, bankroll, trials, method_var.get())
+            executor.shutdown(wait=False)
+            show_report(future)
+        
+        run_button = ctk.CTkButton(dialog, text="Run", command=run)
+        run_button.grid(row=len(fields), column=1, padx=20, pady=(20, 0), sticky="e")
     
     def export_data(self):
         data = {
             "players": self.player_manager.get_all_players(),
-            "sessions": self.session_manager.get_all_sessions()
+            "sessions": self.session_manager.get_all_sessions(),
+            "money": money.MONEY_FORMAT
         }
         
         filepath = tk.filedialog.asksaveasfilename(
@@ -401,7 +782,7 @@ class PokerApp(ctk.CTk):
         if filepath:
             try:
                 with open(filepath, 'w') as f:
-                    json.dump(data, f, indent=4)
+                    json.dump(data, f, indent=4, default=json_default)
                 utils.show_message("Success", "Data exported successfully!")
             except Exception as e:
                 utils.show_error("Export Error", f"Failed to export data: {str(e)}")
@@ -418,6 +799,8 @@ class PokerApp(ctk.CTk):
                     data = json.load(f)
                 
                 if "players" in data and "sessions" in data:
+                    # Exports from before amounts were kept in pence hold float pounds
+                    money.migrate_data(data)
                     self.player_manager.load_players(data["players"])
                     self.session_manager.load_sessions(data["sessions"])
                     utils.show_message("Success", "Data imported successfully!")
@@ -427,36 +810,52 @@ class PokerApp(ctk.CTk):
             except Exception as e:
                 utils.show_error("Import Error", f"Failed to import data: {str(e)}")
     
+    def check_data(self):
+        issues = self.store.check_integrity()
+        if not issues:
+            utils.show_message("Check Data", "No problems found.")
+            return
+        
+        counts = {}
+        for found in issues:
+            counts[found["kind"]] = counts.get(found["kind"], 0) + 1
+        summary = "\n".join(f"{kind.replace('_', ' ').title()}: {count}" for kind, count in counts.items())
+        fixable = sum(count for kind, count in counts.items() if kind in integrity.FIXABLE_KINDS)
+        if not fixable:
+            utils.show_warning("Check Data", f"Found {len(issues)} problems:\n\n{summary}\n\n"
+                                             "Unbalanced sessions need their amounts corrected by hand.")
+            return
+        
+        from tkinter import messagebox
+        if messagebox.askyesno("Check Data", f"Found {len(issues)} problems:\n\n{summary}\n\n"
+                                             f"Fix the {fixable} that can be repaired automatically?"):
+            fixed = integrity.fix_issues(self.store, issues)
+            self.save_data()
+            utils.show_message("Check Data", f"Fixed {fixed} problems.")
+            self.show_sessions_view()
+    
     def load_data(self):
-        if os.path.exists(self.data_file):
-            try:
-                with open(self.data_file, 'r') as f:
-                    data = json.load(f)
-                
-                if "players" in data:
-                    self.player_manager.load_players(data["players"])
-                if "sessions" in data:
-                    self.session_manager.load_sessions(data["sessions"])
-                if "current_session" in data:
-                    self.session_manager.set_current_session(data["current_session"])
-            except Exception as e:
-                print(f"Error loading data: {e}")
+        try:
+            if self.store.load():
+                # Refresh the views now the store holds the saved data
+                self.player_manager.load_players(self.store.players)
+                self.session_manager.set_current_session(self.store.current_session)
+                self.session_manager.load_sessions(self.store.sessions)
+        except Exception as e:
+            print(f"Error loading data: {e}")
     
     def save_data(self):
-        data = {
-            "players": self.player_manager.get_all_players(),
-            "sessions": self.session_manager.get_all_sessions(),
-            "current_session": self.session_manager.get_current_session()
-        }
-        
         try:
-            with open(self.data_file, 'w') as f:
-                json.dump(data, f, indent=4)
+            self.store.save()
         except Exception as e:
             print(f"Error saving data: {e}")
     
     def on_close(self):
         self.save_data()
+        if self.sync_worker:
+            self.sync_worker.stop()
+        if self.table_server:
+            self.table_server.stop()
         self.destroy()
 
 if __name__ == "__main__":
@@ -1,13 +1,21 @@
 import customtkinter as ctk
-import uuid
 import utils
 import tkinter as tk
-import datetime
 
 class PlayerManager:
+    """Tk view over the players held in the app's data store"""
     def __init__(self, app):
         self.app = app
-        self.players = []
+        self.store = app.store
+    
+    @property
+    def players(self):
+        return self.store.players
+    
+    @property
+    def registry(self):
+        """Player ids interned to the small integers session entries store"""
+        return self.store.registry
     
     def create_view(self, parent):
         frame = ctk.CTkFrame(parent)
@@ -47,25 +55,16 @@ class PlayerManager:
             return
             
         # Add headers
-        headers = ["Name", "Email", "Phone", "Actions"]
+        headers = ["Name", "Email", "Phone", "Rating", "Actions"]
         for i, header in enumerate(headers):
             lbl = ctk.CTkLabel(self.players_frame, text=header, font=ctk.CTkFont(weight="bold"))
             lbl.grid(row=0, column=i, padx=10, pady=(0, 10), sticky="w")
         
+        # Ratings only replay the sessions ended since the last refresh
+        ratings = self.store.player_ratings()
+        
         # Add player rows
         for i, player in enumerate(self.players):
-            # Calculate player stats from sessions
-            total_sessions = 0
-            total_profit = 0
-            
-            if hasattr(self.app, 'session_manager'):
-                sessions = self.app.session_manager.get_all_sessions()
-                for session in sessions:
-                    for p in session["players"]:
-                        if p["id"] == player["id"]:
-                            total_sessions += 1
-                            total_profit += (p["cashout"] - p["buyin"])
-            
             # Player name
             name_lbl = ctk.CTkLabel(self.players_frame, text=player["name"])
             name_lbl.grid(row=i+1, column=0, padx=10, pady=5, sticky="w")
@@ -78,9 +77,17 @@ class PlayerManager:
             phone_lbl = ctk.CTkLabel(self.players_frame, text=player.get("phone", ""))
             phone_lbl.grid(row=i+1, column=2, padx=10, pady=5, sticky="w")
             
+            # Rating, with how it moved over their last few sessions
+            rating = ratings.rating(player["id"])
+            trend = ratings.trend(player["id"])
+            rating_text = "-" if rating is None else f"{rating} ({trend:+d})"
+            rating_lbl = ctk.CTkLabel(self.players_frame, text=rating_text,
+                                    text_color="green" if trend > 0 else "red" if trend < 0 else None)
+            rating_lbl.grid(row=i+1, column=3, padx=10, pady=5, sticky="w")
+            
             # Actions buttons
             actions_frame = ctk.CTkFrame(self.players_frame, fg_color="transparent")
-            actions_frame.grid(row=i+1, column=3, padx=10, pady=5)
+            actions_frame.grid(row=i+1, column=4, padx=10, pady=5)
             
             edit_btn = ctk.CTkButton(actions_frame, text="Edit", width=60,
                                    command=lambda p=player: self.show_edit_player_dialog(p))
@@ -146,23 +153,12 @@ class PlayerManager:
             phone = phone_var.get().strip()
             note = note_text.get("1.0", tk.END).strip()
             
-            if not name:
-                utils.show_error("Input Error", "Player name is required", parent=dialog)
+            try:
+                self.store.add_player(name, email, phone, note)
+            except ValueError as e:
+                utils.show_error("Input Error", str(e), parent=dialog)
                 return
             
-            # Create player
-            new_player = {
-                "id": str(uuid.uuid4()),
-                "name": name,
-                "email": email,  # Add email
-                "phone": phone,
-                "note": note,
-                "created_at": datetime.datetime.now().isoformat()
-            }
-            
-            # Add to player list
-            self.players.append(new_player)
-            
             # Refresh view
             self.refresh_players_view()
             
@@ -198,17 +194,12 @@ class PlayerManager:
         
         # Update player function
         def update_player():
-            name = name_entry.get().strip()
-            if not name:
-                utils.show_error("Error", "Player name cannot be empty", parent=dialog)
+            try:
+                self.store.rename_player(player["id"], name_entry.get())
+            except ValueError as e:
+                utils.show_error("Error", str(e), parent=dialog)
                 return
             
-            # Update player data
-            for p in self.players:
-                if p["id"] == player["id"]:
-                    p["name"] = name
-                    break
-            
             self.refresh_players_view()
             dialog.destroy()
         
@@ -253,20 +244,21 @@ class PlayerManager:
         delete_btn.grid(row=0, column=1, padx=10)
     
     def delete_player(self, player, dialog):
-        self.players = [p for p in self.players if p["id"] != player["id"]]
+        self.store.delete_player(player["id"])
         self.refresh_players_view()
         dialog.destroy()
     
     def get_all_players(self):
-        return self.players
+        return self.store.get_all_players()
     
     def get_player_by_id(self, player_id):
-        for player in self.players:
-            if player["id"] == player_id:
-                return player
-        return None
+        return self.store.get_player_by_id(player_id)
     
     def load_players(self, players):
-        self.players = players
+        if players is not self.store.players:
+            # Imported players replace ours wholesale, so all of them need versioning
+            self.store.players = players
+            for player in players:
+                self.store.mark_dirty(player)
         if hasattr(self, 'players_frame'):
             self.refresh_players_view() 
\ No newline at end of file
@@ -1,19 +1,29 @@
 import customtkinter as ctk
 from tkinter import messagebox
 import datetime
-import uuid
 import utils
 import tkinter as tk
 from paypal_integration import PayPalPaymentManager
 from PIL import Image
 import io
+from concurrent.futures import ThreadPoolExecutor
+from core import ledger, money, settlement, tables
 
 class SessionManager:
+    """Tk view over the sessions held in the app's data store"""
     def __init__(self, app, player_manager):
         self.app = app
+        self.store = app.store
         self.player_manager = player_manager
-        self.sessions = []
-        self.current_session = None
+        
+        # Rendered QR codes keyed by payload, so reopening a dialog doesn't regenerate them
+        self.qr_cache = {}
+        
+        # Session id -> future building that session's payment links and QR codes
+        self.settlement_jobs = {}
+        
+        # Session id of the live table shown in the current session panel
+        self.selected_table_id = None
         
         # Initialize PayPal payment manager - pass app as parameter
         paypal_client_id = self.app.config.get("paypal_client_id")
@@ -30,6 +40,20 @@ class SessionManager:
         else:
             self.payment_manager = None
     
+    @property
+    def sessions(self):
+        return self.store.sessions
+    
+    @property
+    def current_session(self):
+        """The session of the selected live table, or the first one if none is selected"""
+        table = self.store.get_table(self.selected_table_id)
+        return table.session if table else self.store.current_session
+    
+    @current_session.setter
+    def current_session(self, session):
+        self.selected_table_id = session["id"] if session else None
+    
     def create_view(self, parent):
         frame = ctk.CTkFrame(parent)
         frame.grid_columnconfigure(0, weight=1)
@@ -85,9 +109,21 @@ class SessionManager:
         # Configure grid for current session
         self.current_session_frame.grid_columnconfigure(0, weight=1)
         
+        # Switch between tables when more than one session is running
+        live_sessions = self.store.live_sessions
+        if len(live_sessions) > 1:
+            names = {f"{s['name']} ({len(s['players'])})": s for s in live_sessions}
+            selected = next((name for name, s in names.items() if s is self.current_session), None)
+            table_selector = ctk.CTkSegmentedButton(
+                self.current_session_frame, values=list(names),
+                command=lambda name: self.set_current_session(names[name]))
+            if selected:
+                table_selector.set(selected)
+            table_selector.grid(row=0, column=0, sticky="w", padx=10, pady=(10, 0))
+        
         # Session header
         header_frame = ctk.CTkFrame(self.current_session_frame, fg_color="transparent")
-        header_frame.grid(row=0, column=0, sticky="ew", padx=10, pady=10)
+        header_frame.grid(row=1, column=0, sticky="ew", padx=10, pady=10)
         header_frame.grid_columnconfigure(1, weight=1)
         
         date_formatted = datetime.datetime.fromisoformat(self.current_session["date"]).strftime("%B %d, %Y")
@@ -105,13 +141,18 @@ class SessionManager:
                                      command=self.show_add_player_to_session)
         add_player_btn.grid(row=0, column=0, padx=5)
         
+        move_player_btn = ctk.CTkButton(actions_frame, text="Move Player", width=100,
+                                      command=self.show_move_player,
+                                      state="normal" if len(live_sessions) > 1 else "disabled")
+        move_player_btn.grid(row=0, column=1, padx=5)
+        
         end_session_btn = ctk.CTkButton(actions_frame, text="End Session", width=100,
                                       command=self.end_current_session)
-        end_session_btn.grid(row=0, column=1, padx=5)
+        end_session_btn.grid(row=0, column=2, padx=5)
         
         # Player list
         players_frame = ctk.CTkFrame(self.current_session_frame)
-        players_frame.grid(row=1, column=0, sticky="ew", padx=10, pady=10)
+        players_frame.grid(row=2, column=0, sticky="ew", padx=10, pady=10)
         
         # Column headers
         headers = ["Player", "Buy-in", "Rebuys", "Total In", "Cash Out", "Profit/Loss", "Actions"]
@@ -120,9 +161,6 @@ class SessionManager:
             lbl.grid(row=0, column=i, padx=10, pady=5, sticky="w")
         
         # Player rows
-        session_total_buyin = 0
-        session_total_cashout = 0
-        
         for i, player in enumerate(self.current_session["players"]):
             player_obj = self.player_manager.get_player_by_id(player["id"])
             if not player_obj:
@@ -131,24 +169,24 @@ class SessionManager:
             name_lbl = ctk.CTkLabel(players_frame, text=player_obj["name"])
             name_lbl.grid(row=i+1, column=0, padx=10, pady=5, sticky="w")
             
-            buyin_lbl = ctk.CTkLabel(players_frame, text=f"£{player['buyin']:.2f}")
+            buyin_lbl = ctk.CTkLabel(players_frame, text=utils.format_currency(player['buyin']))
             buyin_lbl.grid(row=i+1, column=1, padx=10, pady=5, sticky="w")
             
             rebuys = player.get('rebuys', 0)
-            rebuys_lbl = ctk.CTkLabel(players_frame, text=f"£{rebuys:.2f}")
+            rebuys_lbl = ctk.CTkLabel(players_frame, text=utils.format_currency(rebuys))
             rebuys_lbl.grid(row=i+1, column=2, padx=10, pady=5, sticky="w")
             
-            total_in = player['buyin'] + rebuys
-            total_in_lbl = ctk.CTkLabel(players_frame, text=f"£{total_in:.2f}")
+            total_in = ledger.entry_total_in(player)
+            total_in_lbl = ctk.CTkLabel(players_frame, text=utils.format_currency(total_in))
             total_in_lbl.grid(row=i+1, column=3, padx=10, pady=5, sticky="w")
             
             cashout = player.get('cashout', 0)
-            cashout_lbl = ctk.CTkLabel(players_frame, text=f"£{cashout:.2f}")
+            cashout_lbl = ctk.CTkLabel(players_frame, text=utils.format_currency(cashout))
             cashout_lbl.grid(row=i+1, column=4, padx=10, pady=5, sticky="w")
             
-            profit = cashout - total_in
+            profit = ledger.entry_profit(player)
             profit_color = "green" if profit >= 0 else "red"
-            profit_lbl = ctk.CTkLabel(players_frame, text=f"£{profit:.2f}", text_color=profit_color)
+            profit_lbl = ctk.CTkLabel(players_frame, text=utils.format_currency(profit), text_color=profit_color)
             profit_lbl.grid(row=i+1, column=5, padx=10, pady=5, sticky="w")
             
             # Action buttons for player
@@ -162,29 +200,29 @@ class SessionManager:
             remove_btn = ctk.CTkButton(player_actions, text="Remove", width=60, fg_color="#E74C3C",
                                      command=lambda p=player, idx=i: self.remove_player_from_session(idx))
             remove_btn.grid(row=0, column=1, padx=5)
-            
-            # Update session totals
-            session_total_buyin += total_in
-            session_total_cashout += cashout
+        
+        # Session totals are kept up to date as events are recorded
+        total_buyin, total_rebuys, session_total_cashout = ledger.session_totals(self.current_session)
+        session_total_buyin = total_buyin + total_rebuys
         
         # Session summary
         summary_frame = ctk.CTkFrame(self.current_session_frame)
-        summary_frame.grid(row=2, column=0, sticky="ew", padx=10, pady=10)
+        summary_frame.grid(row=3, column=0, sticky="ew", padx=10, pady=10)
         
         summary_lbl = ctk.CTkLabel(summary_frame, text="Session Summary:", 
                                   font=ctk.CTkFont(weight="bold"))
         summary_lbl.grid(row=0, column=0, padx=10, pady=5, sticky="w")
         
-        total_buyin_lbl = ctk.CTkLabel(summary_frame, text=f"Total Buy-ins: £{session_total_buyin:.2f}")
+        total_buyin_lbl = ctk.CTkLabel(summary_frame, text=f"Total Buy-ins: {utils.format_currency(session_total_buyin)}")
         total_buyin_lbl.grid(row=0, column=1, padx=10, pady=5, sticky="w")
         
-        total_cashout_lbl = ctk.CTkLabel(summary_frame, text=f"Total Cash-outs: £{session_total_cashout:.2f}")
+        total_cashout_lbl = ctk.CTkLabel(summary_frame, text=f"Total Cash-outs: {utils.format_currency(session_total_cashout)}")
         total_cashout_lbl.grid(row=0, column=2, padx=10, pady=5, sticky="w")
         
         balance = session_total_cashout - session_total_buyin
         balance_color = "green" if balance >= 0 else "red"
         balance_text = "Balance (should be zero): "
-        balance_lbl = ctk.CTkLabel(summary_frame, text=f"{balance_text}£{balance:.2f}", 
+        balance_lbl = ctk.CTkLabel(summary_frame, text=f"{balance_text}{utils.format_currency(balance)}", 
                                  text_color=balance_color)
         balance_lbl.grid(row=0, column=3, padx=10, pady=5, sticky="w")
     
@@ -216,11 +254,10 @@ class SessionManager:
             
             # Calculate session details
             player_count = len(session["players"])
-            total_buyin = sum(p["buyin"] + p.get("rebuys", 0) for p in session["players"])
-            total_cashout = sum(p.get("cashout", 0) for p in session["players"])
+            total_buyin = sum(ledger.entry_total_in(p) for p in session["players"])
             
             details_lbl = ctk.CTkLabel(session_frame, 
-                                     text=f"Players: {player_count} | Total: £{total_buyin:.2f}")
+                                     text=f"Players: {player_count} | Total: {utils.format_currency(total_buyin)}")
             details_lbl.grid(row=0, column=1, padx=10, pady=5, sticky="w")
             
             # Action buttons
@@ -236,10 +273,6 @@ class SessionManager:
             delete_btn.grid(row=0, column=1, padx=5)
     
     def create_new_session(self):
-        if self.current_session:
-            utils.show_error("Active Session", "You already have an active session. End the current session before starting a new one.")
-            return
-        
         dialog = ctk.CTkToplevel(self.app)
         dialog.title("New Poker Session")
         dialog.geometry("400x200")
@@ -260,20 +293,13 @@ class SessionManager:
         
         # Create session function
         def create_session():
-            name = name_entry.get().strip()
-            if not name:
-                utils.show_error("Error", "Session name cannot be empty", parent=dialog)
+            try:
+                session = self.store.start_session(name_entry.get())
+            except ValueError as e:
+                utils.show_error("Error", str(e), parent=dialog)
                 return
             
-            session = {
-                "id": str(uuid.uuid4()),
-                "name": name,
-                "date": datetime.datetime.now().isoformat(),
-                "players": []
-            }
-            
-            self.current_session = session
-            self.refresh_current_session()
+            self.set_current_session(session)
             dialog.destroy()
             
             # Prompt to add players
@@ -351,15 +377,6 @@ class SessionManager:
         def add_player():
             player_name = player_var.get()
             
-            try:
-                buy_in = float(buyin_var.get())
-                if buy_in <= 0:
-                    utils.show_error("Invalid Buy-in", "Buy-in amount must be greater than 0.", parent=dialog)
-                    return
-            except ValueError:
-                utils.show_error("Invalid Buy-in", "Please enter a valid buy-in amount.", parent=dialog)
-                return
-            
             # Find selected player
             selected_player = None
             for p in available_players:
@@ -372,12 +389,11 @@ class SessionManager:
                 return
             
             # Add player to session
-            self.current_session["players"].append({
-                "id": selected_player["id"],
-                "buyin": buy_in,
-                "rebuys": 0,
-                "cashout": 0
-            })
+            try:
+                ledger.add_entry(self.current_session, selected_player["id"], money.to_pence(buyin_var.get()))
+            except ValueError as e:
+                utils.show_error("Invalid Buy-in", str(e), parent=dialog)
+                return
             
             # Refresh view
             self.refresh_current_session()
@@ -411,7 +427,7 @@ class SessionManager:
         
         buyin_entry = ctk.CTkEntry(dialog, width=200)
         buyin_entry.grid(row=0, column=1, padx=20, pady=(20, 0), sticky="ew")
-        buyin_entry.insert(0, f"{player['buyin']:.2f}")
+        buyin_entry.insert(0, utils.format_currency(player['buyin'], symbol=""))
         
         # Rebuys amount
         rebuys_label = ctk.CTkLabel(dialog, text="Rebuys Amount (£):")
@@ -419,7 +435,7 @@ class SessionManager:
         
         rebuys_entry = ctk.CTkEntry(dialog, width=200)
         rebuys_entry.grid(row=1, column=1, padx=20, pady=(20, 0), sticky="ew")
-        rebuys_entry.insert(0, f"{player.get('rebuys', 0):.2f}")
+        rebuys_entry.insert(0, utils.format_currency(player.get('rebuys', 0), symbol=""))
         
         # Cash-out amount
         cashout_label = ctk.CTkLabel(dialog, text="Cash-out Amount (£):")
@@ -427,29 +443,17 @@ class SessionManager:
         
         cashout_entry = ctk.CTkEntry(dialog, width=200)
         cashout_entry.grid(row=2, column=1, padx=20, pady=(20, 0), sticky="ew")
-        cashout_entry.insert(0, f"{player.get('cashout', 0):.2f}")
+        cashout_entry.insert(0, utils.format_currency(player.get('cashout', 0), symbol=""))
         
         # Update player function
         def update_player_in_session():
             try:
-                buyin = float(buyin_entry.get())
-                rebuys = float(rebuys_entry.get())
-                cashout = float(cashout_entry.get())
-                
-                if buyin < 0 or rebuys < 0 or cashout < 0:
-                    raise ValueError("Values cannot be negative")
-                
+                ledger.update_entry(self.current_session, player_index, money.to_pence(buyin_entry.get()),
+                                    money.to_pence(rebuys_entry.get()), money.to_pence(cashout_entry.get()))
             except ValueError as e:
                 utils.show_error("Error", f"Invalid amount: {str(e)}", parent=dialog)
                 return
             
-            # Update player in session
-            self.current_session["players"][player_index].update({
-                "buyin": buyin,
-                "rebuys": rebuys,
-                "cashout": cashout
-            })
-            
             self.refresh_current_session()
             dialog.destroy()
         
@@ -481,35 +485,96 @@ class SessionManager:
                                      f"Are you sure you want to remove {player_name} from the session?")
         
         if confirm:
-            self.current_session["players"].pop(player_index)
+            ledger.remove_entry(self.current_session, player_index)
             self.refresh_current_session()
     
+    def show_move_player(self):
+        """Move a player and their chips from the selected table to another one"""
+        source = self.store.get_table(self.current_session["id"]) if self.current_session else None
+        targets = [table for table in self.store.tables.values() if table is not source]
+        if not source or not targets:
+            utils.show_error("Error", "Start another session to move players between tables.")
+            return
+        
+        seated = {}
+        for entry in self.current_session["players"]:
+            player_obj = self.player_manager.get_player_by_id(entry["id"])
+            if player_obj and not entry.get("cashout", 0):
+                seated[player_obj["name"]] = entry
+        if not seated:
+            utils.show_error("Error", "There are no players left at this table to move.")
+            return
+        target_names = {table.session["name"]: table for table in targets}
+        
+        dialog = ctk.CTkToplevel(self.app)
+        dialog.title("Move Player")
+        dialog.geometry("400x250")
+        dialog.resizable(False, False)
+        dialog.grab_set()  # Make dialog modal
+        
+        # Center the dialog
+        utils.center_window(dialog, self.app)
+        
+        player_label = ctk.CTkLabel(dialog, text="Player:")
+        player_label.grid(row=0, column=0, padx=20, pady=(20, 0), sticky="w")
+        
+        player_var = ctk.StringVar(value=next(iter(seated)))
+        player_menu = ctk.CTkOptionMenu(dialog, values=list(seated), variable=player_var)
+        player_menu.grid(row=0, column=1, padx=20, pady=(20, 0), sticky="ew")
+        
+        target_label = ctk.CTkLabel(dialog, text="To Table:")
+        target_label.grid(row=1, column=0, padx=20, pady=(10, 0), sticky="w")
+        
+        target_var = ctk.StringVar(value=next(iter(target_names)))
+        target_menu = ctk.CTkOptionMenu(dialog, values=list(target_names), variable=target_var)
+        target_menu.grid(row=1, column=1, padx=20, pady=(10, 0), sticky="ew")
+        
+        chips_label = ctk.CTkLabel(dialog, text="Chips (£):")
+        chips_label.grid(row=2, column=0, padx=20, pady=(10, 0), sticky="w")
+        
+        chips_var = ctk.StringVar(value=utils.format_currency(ledger.entry_total_in(seated[player_var.get()]), symbol=""))
+        chips_entry = ctk.CTkEntry(dialog, textvariable=chips_var)
+        chips_entry.grid(row=2, column=1, padx=20, pady=(10, 0), sticky="ew")
+        
+        def move_player():
+            try:
+                tables.move_player(source, target_names[target_var.get()],
+                                   seated[player_var.get()]["id"], money.to_pence(chips_var.get()))
+            except ValueError as e:
+                utils.show_error("Error", str(e), parent=dialog)
+                return
+            
+            self.refresh_current_session()
+            dialog.destroy()
+        
+        # Buttons
+        button_frame = ctk.CTkFrame(dialog, fg_color="transparent")
+        button_frame.grid(row=3, column=0, columnspan=2, pady=20)
+        
+        cancel_btn = ctk.CTkButton(button_frame, text="Cancel", width=100, 
+                                 command=dialog.destroy)
+        cancel_btn.grid(row=0, column=0, padx=10)
+        
+        move_btn = ctk.CTkButton(button_frame, text="Move", width=100, 
+                               command=move_player)
+        move_btn.grid(row=0, column=1, padx=10)
+    
     def end_current_session(self):
         if not self.current_session:
             utils.show_error("No Active Session", "There is no active session to end.")
             return
         
         # Calculate balance
-        total_buyin = sum(p["buyin"] + p.get("rebuys", 0) for p in self.current_session["players"])
-        total_cashout = sum(p.get("cashout", 0) for p in self.current_session["players"])
-        balance = total_cashout - total_buyin
+        balance = ledger.session_balance(self.current_session)
         
-        if abs(balance) > 0.01:  # Allow a small rounding error
+        if not ledger.is_balanced(self.current_session):
             confirm = messagebox.askyesno("Unbalanced Session", 
-                                        f"The session is unbalanced by £{balance:.2f}. "
+                                        f"The session is unbalanced by {utils.format_currency(balance)}. "
                                         f"Are you sure you want to end it?")
             if not confirm:
                 return
         
-        # Add to completed sessions and clear current
-        self.current_session["status"] = "completed"
-        current_session = self.current_session
-        self.sessions.append(current_session)
-        self.current_session = None
-        
-        # Refresh views
-        self.refresh_current_session()
-        self.refresh_sessions_list()
+        current_session = self.finish_current_session()
         
         # Ask if user wants to show payment/distribution QR codes
         if self.payment_enabled:
@@ -526,6 +591,88 @@ class SessionManager:
             elif action is False:  # No - Distribute winnings
                 self.show_distribution_qr_codes(current_session)
     
+    def finish_current_session(self, session=None):
+        """Move a live session (the selected one by default) to the history and settle it, without any prompts"""
+        # Add to completed sessions and close its table
+        current_session = self.store.end_session((session or self.current_session)["id"])
+        if current_session["id"] == self.selected_table_id:
+            self.selected_table_id = None
+        
+        # Work out who pays whom now; the links and QR codes call out to the payment
+        # provider, so they're built in a worker and attached when they're ready
+        if self.payment_enabled and self.payment_manager:
+            session_settlement = settlement.new_settlement(current_session, self.player_manager.get_all_players())
+            current_session["settlement"] = session_settlement
+            self.store.mark_dirty(current_session)
+            self.start_settlement(current_session, session_settlement)
+        
+        # Refresh views
+        self.refresh_current_session()
+        self.refresh_sessions_list()
+        return current_session
+    
+    def start_settlement(self, session, session_settlement):
+        """Build the settlement's missing links and QR codes in a worker"""
+        executor = ThreadPoolExecutor(max_workers=1)
+        future = executor.submit(self.build_settlement_links, session, session_settlement)
+        executor.shutdown(wait=False)
+        self.settlement_jobs[session["id"]] = future
+        self.poll_settlement(session, session_settlement, future)
+    
+    def refresh_settlement(self, session):
+        """Rebuild a stale settlement, or retry links that failed, in the worker
+        
+        Returns whether links are being built, in which case the dialogs wait for them."""
+        if session["id"] in self.settlement_jobs:
+            return True
+        session_settlement = settlement.get_valid_settlement(session)
+        if session_settlement is None:
+            utils.debug_log(f"Settlement for {session['name']} missing or stale, rebuilding")
+            session_settlement = settlement.new_settlement(session, self.player_manager.get_all_players())
+            session["settlement"] = session_settlement
+            self.store.mark_dirty(session)
+        elif not settlement.missing_links(session_settlement):
+            return False
+        self.start_settlement(session, session_settlement)
+        return True
+    
+    def build_settlement_links(self, session, session_settlement):
+        """Create a settlement's links and decode their QR codes, off the Tk thread"""
+        links = settlement.create_links(session, session_settlement, self.payment_manager)
+        qr_images = {}
+        for urls in links.values():
+            for url in urls.values():
+                qr_data = self.payment_manager.generate_qr_code(url) if url else None
+                if qr_data:
+                    qr_images[url] = Image.open(io.BytesIO(qr_data))
+                    qr_images[url].load()
+        return links, qr_images
+    
+    def poll_settlement(self, session, session_settlement, future):
+        """Attach a session's links and QR codes once the worker has built them"""
+        if not future.done():
+            self.app.after(100, self.poll_settlement, session, session_settlement, future)
+            return
+        if self.settlement_jobs.get(session["id"]) is future:
+            del self.settlement_jobs[session["id"]]
+        try:
+            links, qr_images = future.result()
+        except Exception as e:
+            utils.debug_log(f"Failed to create payment links: {str(e)}")
+            return
+        settlement.attach_links(session_settlement, links)
+        self.store.mark_dirty(session)
+        for url, img in qr_images.items():
+            self.qr_cache.setdefault(url, ctk.CTkImage(light_image=img, dark_image=img, size=(150, 150)))
+        self.app.save_data()
+    
+    def when_settled(self, session, callback):
+        """Run callback on the Tk thread once the session's links are no longer being built"""
+        if session["id"] in self.settlement_jobs:
+            self.app.after(100, self.when_settled, session, callback)
+        else:
+            callback()
+    
     def view_session_details(self, session):
         dialog = ctk.CTkToplevel(self.app)
         dialog.title(f"Session Details: {session['name']}")
@@ -558,10 +705,6 @@ class SessionManager:
             lbl.grid(row=0, column=i, padx=10, pady=5, sticky="w")
         
         # Player rows
-        total_buyin = 0
-        total_rebuys = 0
-        total_cashout = 0
-        
         for i, player in enumerate(session["players"]):
             player_obj = self.player_manager.get_player_by_id(player["id"])
             if not player_obj:
@@ -572,46 +715,42 @@ class SessionManager:
             name_lbl = ctk.CTkLabel(players_frame, text=player_name)
             name_lbl.grid(row=i+1, column=0, padx=10, pady=5, sticky="w")
             
-            buyin_lbl = ctk.CTkLabel(players_frame, text=f"£{player['buyin']:.2f}")
+            buyin_lbl = ctk.CTkLabel(players_frame, text=utils.format_currency(player['buyin']))
             buyin_lbl.grid(row=i+1, column=1, padx=10, pady=5, sticky="w")
             
             rebuys = player.get('rebuys', 0)
-            rebuys_lbl = ctk.CTkLabel(players_frame, text=f"£{rebuys:.2f}")
+            rebuys_lbl = ctk.CTkLabel(players_frame, text=utils.format_currency(rebuys))
             rebuys_lbl.grid(row=i+1, column=2, padx=10, pady=5, sticky="w")
             
-            total_in = player['buyin'] + rebuys
-            total_in_lbl = ctk.CTkLabel(players_frame, text=f"£{total_in:.2f}")
+            total_in = ledger.entry_total_in(player)
+            total_in_lbl = ctk.CTkLabel(players_frame, text=utils.format_currency(total_in))
             total_in_lbl.grid(row=i+1, column=3, padx=10, pady=5, sticky="w")
             
             cashout = player.get('cashout', 0)
-            cashout_lbl = ctk.CTkLabel(players_frame, text=f"£{cashout:.2f}")
+            cashout_lbl = ctk.CTkLabel(players_frame, text=utils.format_currency(cashout))
             cashout_lbl.grid(row=i+1, column=4, padx=10, pady=5, sticky="w")
             
-            profit = cashout - total_in
+            profit = ledger.entry_profit(player)
             profit_color = "green" if profit >= 0 else "red"
-            profit_lbl = ctk.CTkLabel(players_frame, text=f"£{profit:.2f}", text_color=profit_color)
+            profit_lbl = ctk.CTkLabel(players_frame, text=utils.format_currency(profit), text_color=profit_color)
             profit_lbl.grid(row=i+1, column=5, padx=10, pady=5, sticky="w")
-            
-            # Update totals
-            total_buyin += player['buyin']
-            total_rebuys += rebuys
-            total_cashout += cashout
         
         # Summary frame
         summary_frame = ctk.CTkFrame(dialog)
         summary_frame.grid(row=2, column=0, padx=20, pady=10, sticky="ew")
         
         total_players = len(session["players"])
+        total_buyin, total_rebuys, total_cashout = ledger.session_totals(session)
         total_in = total_buyin + total_rebuys
         balance = total_cashout - total_in
         
         summary_info = (
             f"Total Players: {total_players}  |  "
-            f"Total Buy-ins: £{total_buyin:.2f}  |  "
-            f"Total Rebuys: £{total_rebuys:.2f}  |  "
-            f"Total In: £{total_in:.2f}  |  "
-            f"Total Cash-out: £{total_cashout:.2f}  |  "
-            f"Balance: £{balance:.2f}"
+            f"Total Buy-ins: {utils.format_currency(total_buyin)}  |  "
+            f"Total Rebuys: {utils.format_currency(total_rebuys)}  |  "
+            f"Total In: {utils.format_currency(total_in)}  |  "
+            f"Total Cash-out: {utils.format_currency(total_cashout)}  |  "
+            f"Balance: {utils.format_currency(balance)}"
         )
         
         summary_lbl = ctk.CTkLabel(summary_frame, text=summary_info)
@@ -639,14 +778,26 @@ class SessionManager:
                                      "Are you sure you want to delete this session?\nThis action cannot be undone.")
         
         if confirm:
-            self.sessions.pop(session_index)
+            self.store.delete_session(session_index)
             self.refresh_sessions_list()
     
     def get_all_sessions(self):
-        all_sessions = self.sessions.copy()
-        if self.current_session:
-            all_sessions.append(self.current_session)
-        return all_sessions
+        return self.store.get_all_sessions()
+    
+    def apply_sheet_changes(self, changes):
+        """Apply entry edits pulled from Google Sheets to the local sessions"""
+        if not changes:
+            return 0
+        
+        applied = ledger.apply_entry_changes(self.get_all_sessions(), changes)
+        utils.debug_log(f"Applied {applied} entry changes from Google Sheets")
+        
+        # Refresh once for the whole batch
+        if hasattr(self, 'current_session_frame'):
+            self.refresh_current_session()
+        if hasattr(self, 'sessions_frame'):
+            self.refresh_sessions_list()
+        return applied
     
     def get_current_session(self):
         return self.current_session
@@ -658,13 +809,7 @@ class SessionManager:
             self.refresh_current_session()
     
     def load_sessions(self, sessions):
-        # Filter out any possible current session
-        self.sessions = [s for s in sessions if s.get("status") != "current"]
-        
-        # Check for a current session
-        current_sessions = [s for s in sessions if s.get("status") == "current"]
-        if current_sessions:
-            self.current_session = current_sessions[0]
+        self.store.load_sessions(sessions)
         
         # Refresh views if they exist
         if hasattr(self, 'current_session_frame'):
@@ -672,39 +817,38 @@ class SessionManager:
         if hasattr(self, 'sessions_frame'):
             self.refresh_sessions_list()
     
-    def show_payment_qr_codes(self, session):
+    def get_qr_image(self, payload):
+        """Return a CTkImage for a QR payload, generating it only once"""
+        if payload not in self.qr_cache:
+            qr_data = self.payment_manager.generate_qr_code(payload)
+            if not qr_data:
+                return None
+            img = Image.open(io.BytesIO(qr_data))
+            self.qr_cache[payload] = ctk.CTkImage(light_image=img, dark_image=img, size=(150, 150))
+        return self.qr_cache[payload]
+    
+    def show_payment_qr_codes(self, session, refresh=True):
         """Show payment QR codes for players who owe money"""
         if not self.payment_enabled or not self.payment_manager:
             utils.show_error("Payments Disabled", 
                            "Payment functionality is not enabled. Please add your PayPal credentials in settings.")
             return
         
-        # Find players with negative balance
-        debtors = []
-        bank_account_name = self.app.config.get("bank_account_name", "Bank Account")
+        # A stale settlement or failed links are rebuilt in the worker; open the dialog once they're in
+        if (refresh or settlement.get_valid_settlement(session) is None) and self.refresh_settlement(session):
+            self.when_settled(session, lambda: self.show_payment_qr_codes(session, refresh=False))
+            return
         
-        for player in session["players"]:
-            player_obj = self.player_manager.get_player_by_id(player["id"])
-            if not player_obj:
-                continue
-            
-            total_in = player["buyin"] + player.get("rebuys", 0)
-            cashout = player.get("cashout", 0)
-            profit = cashout - total_in
-            
-            if profit < 0:  # Player owes money
-                debtors.append({
-                    "name": player_obj["name"],
-                    "amount": abs(profit),
-                    "id": player["id"]
-                })
+        # Players with negative balance come from the precomputed settlement
+        debtors = session["settlement"]["payments"]
+        bank_account_name = self.app.config.get("bank_account_name", "Bank Account")
         
         if not debtors:
             utils.show_message("No Payments Needed", 
                              "There are no players who need to make a payment.")
             return
         
-        # Create payment links and QR codes
+        # Show payment links and QR codes
         dialog = ctk.CTkToplevel(self.app)
         dialog.title("Payment QR Codes")
         dialog.geometry("800x600")
@@ -734,7 +878,7 @@ class SessionManager:
         row = 0
         col = 0
         
-        # Generate QR codes for each debtor
+        # Show QR codes for each debtor
         for debtor in debtors:
             player_frame = ctk.CTkFrame(qr_frame)
             player_frame.grid(row=row, column=col, padx=10, pady=10, sticky="nsew")
@@ -744,28 +888,15 @@ class SessionManager:
                                     font=ctk.CTkFont(weight="bold"))
             name_label.pack(pady=(10, 0))
             
-            amount_label = ctk.CTkLabel(player_frame, text=f"Owes: £{debtor['amount']:.2f}")
+            amount_label = ctk.CTkLabel(player_frame, text=f"Owes: {utils.format_currency(debtor['amount'])}")
             amount_label.pack(pady=(0, 10))
             
-            # Create payment link and QR code
-            session_name = session.get("name", "Poker Session")
-            date = session.get("date", "").split("T")[0]
-            description = f"Payment for {session_name} on {date}"
-            
-            payment_url = self.payment_manager.create_payment_link(
-                debtor["amount"], 
-                description, 
-                debtor["name"]
-            )
+            payment_url = debtor["url"]
             
             if payment_url:
-                qr_data = self.payment_manager.generate_qr_code(payment_url)
+                ctk_img = self.get_qr_image(payment_url)
                 
-                if qr_data:
-                    # Convert QR code to CTkImage
-                    img = Image.open(io.BytesIO(qr_data))
-                    ctk_img = ctk.CTkImage(light_image=img, dark_image=img, size=(150, 150))
-                    
+                if ctk_img:
                     # Display QR code
                     qr_label = ctk.CTkLabel(player_frame, image=ctk_img, text="")
                     qr_label.pack(pady=10)
@@ -800,33 +931,20 @@ class SessionManager:
                                 command=dialog.destroy)
         close_btn.grid(row=2, column=0, pady=20)
     
-    def show_distribution_qr_codes(self, session):
+    def show_distribution_qr_codes(self, session, refresh=True):
         """Show QR codes for distributing winnings to profitable players"""
         if not self.payment_enabled or not self.payment_manager:
             utils.show_error("Payments Disabled", 
                            "Payment functionality is not enabled. Please add your PayPal credentials in settings.")
             return
         
-        # Find players with positive balance (winners)
-        winners = []
-        bank_account_name = self.app.config.get("bank_account_name", "Bank Account")
+        # A stale settlement or failed links are rebuilt in the worker; open the dialog once they're in
+        if (refresh or settlement.get_valid_settlement(session) is None) and self.refresh_settlement(session):
+            self.when_settled(session, lambda: self.show_distribution_qr_codes(session, refresh=False))
+            return
         
-        for player in session["players"]:
-            player_obj = self.player_manager.get_player_by_id(player["id"])
-            if not player_obj:
-                continue
-            
-            total_in = player["buyin"] + player.get("rebuys", 0)
-            cashout = player.get("cashout", 0)
-            profit = cashout - total_in
-            
-            if profit > 0:  # Player won money
-                winners.append({
-                    "name": player_obj["name"],
-                    "amount": profit,
-                    "id": player["id"],
-                    "email": player_obj.get("email", "")  # Get email if available
-                })
+        # Players with positive balance (winners) come from the precomputed settlement
+        winners = session["settlement"]["distributions"]
         
         if not winners:
             utils.show_message("No Distributions Needed", 
@@ -863,7 +981,64 @@ class SessionManager:
         row = 0
         col = 0
         
-        # Generate QR codes for each winner
+        # Render the QR code for a winner's stored link
+        def render_qr(winner_data, container, email):
+            # Clear existing content in QR container
+            for widget in container.winfo_children():
+                widget.destroy()
+            
+            payment_url = winner_data["url"]
+            
+            if payment_url:
+                ctk_img = self.get_qr_image(payment_url)
+                
+                if ctk_img:
+                    # Display QR code
+                    qr_label = ctk.CTkLabel(container, image=ctk_img, text="")
+                    qr_label.pack(pady=10)
+                    
+                    # Keep a reference to avoid garbage collection
+                    container.image = ctk_img
+                    
+                    # Add payment link
+                    link_text = ctk.CTkTextbox(container, height=20, width=200, wrap="word")
+                    link_text.insert("1.0", payment_url)
+                    link_text.configure(state="disabled")
+                    link_text.pack(pady=(0, 10), padx=10)
+                    
+                    # Payment instruction
+                    pay_label = ctk.CTkLabel(container, 
+                                          text=f"Send {utils.format_currency(winner_data['amount'])} to {email}")
+                    pay_label.pack(pady=(0, 10))
+                    
+                    # Status message
+                    status_label = ctk.CTkLabel(container, text="QR Code Generated!", 
+                                              text_color="green")
+                    status_label.pack(pady=(0, 5))
+                else:
+                    error_label = ctk.CTkLabel(container, text="Failed to generate QR code")
+                    error_label.pack(pady=10)
+            else:
+                error_label = ctk.CTkLabel(container, text="Failed to create payment link")
+                error_label.pack(pady=10)
+        
+        # Function to generate payment link and QR code
+        def generate_qr(winner_data, email_var, container):
+            email = email_var.get().strip()
+            if not email:
+                utils.show_error("Email Required", f"Please enter an email for {winner_data['name']}")
+                return
+            
+            # Only create a new link if the email differs from the stored one
+            if email != winner_data["email"] or not winner_data["url"]:
+                winner_data["email"] = email
+                winner_data["url"] = settlement.create_distribution_link(
+                    session, self.payment_manager, winner_data["amount"], email)
+                self.store.mark_dirty(session)
+            
+            render_qr(winner_data, container, email)
+        
+        # Show QR codes for each winner
         for winner in winners:
             player_frame = ctk.CTkFrame(qr_frame)
             player_frame.grid(row=row, column=col, padx=10, pady=10, sticky="nsew")
@@ -873,7 +1048,7 @@ class SessionManager:
                                     font=ctk.CTkFont(weight="bold"))
             name_label.pack(pady=(10, 0))
             
-            amount_label = ctk.CTkLabel(player_frame, text=f"Wins: £{winner['amount']:.2f}")
+            amount_label = ctk.CTkLabel(player_frame, text=f"Wins: {utils.format_currency(winner['amount'])}")
             amount_label.pack(pady=(0, 10))
             
             # Create email input field
@@ -887,75 +1062,17 @@ class SessionManager:
             email_entry = ctk.CTkEntry(email_frame, width=140, textvariable=email_var)
             email_entry.pack(side="left", fill="x", expand=True)
             
-            # Store the email variable for later use
-            winner["email_var"] = email_var
-            
             # Create a container for the QR code and related content
             qr_container = ctk.CTkFrame(player_frame, fg_color="transparent")
             qr_container.pack(fill="both", expand=True, padx=10, pady=5)
             
-            # Function to generate payment link and QR code
-            def generate_qr(winner_data, container):
-                email = winner_data["email_var"].get().strip()
-                if not email:
-                    utils.show_error("Email Required", f"Please enter an email for {winner_data['name']}")
-                    return
-                
-                # Clear existing content in QR container
-                for widget in container.winfo_children():
-                    widget.destroy()
-                
-                session_name = session.get("name", "Poker Session")
-                date = session.get("date", "").split("T")[0]
-                description = f"Winnings from {session_name} on {date}"
-                
-                # Create payment link to email
-                payment_url = self.payment_manager.create_email_payment_link(
-                    winner_data["amount"], 
-                    email,
-                    description
-                )
-                
-                if payment_url:
-                    qr_data = self.payment_manager.generate_qr_code(payment_url)
-                    
-                    if qr_data:
-                        # Convert QR code to CTkImage
-                        img = Image.open(io.BytesIO(qr_data))
-                        ctk_img = ctk.CTkImage(light_image=img, dark_image=img, size=(150, 150))
-                        
-                        # Display QR code
-                        qr_label = ctk.CTkLabel(container, image=ctk_img, text="")
-                        qr_label.pack(pady=10)
-                        
-                        # Keep a reference to avoid garbage collection
-                        container.image = ctk_img
-                        
-                        # Add payment link
-                        link_text = ctk.CTkTextbox(container, height=20, width=200, wrap="word")
-                        link_text.insert("1.0", payment_url)
-                        link_text.configure(state="disabled")
-                        link_text.pack(pady=(0, 10), padx=10)
-                        
-                        # Payment instruction
-                        pay_label = ctk.CTkLabel(container, 
-                                              text=f"Send £{winner_data['amount']:.2f} to {email}")
-                        pay_label.pack(pady=(0, 10))
-                        
-                        # Status message
-                        status_label = ctk.CTkLabel(container, text="QR Code Generated!", 
-                                                  text_color="green")
-                        status_label.pack(pady=(0, 5))
-                    else:
-                        error_label = ctk.CTkLabel(container, text="Failed to generate QR code")
-                        error_label.pack(pady=10)
-                else:
-                    error_label = ctk.CTkLabel(container, text="Failed to create payment link")
-                    error_label.pack(pady=10)
+            # Links precomputed at the end of the session are shown straight away
+            if winner["url"]:
+                render_qr(winner, qr_container, winner["email"])
             
             # Generate QR button
             generate_btn = ctk.CTkButton(player_frame, text="Generate QR", 
-                                       command=lambda w=winner, c=qr_container: generate_qr(w, c))
+                                       command=lambda w=winner, v=email_var, c=qr_container: generate_qr(w, v, c))
             generate_btn.pack(pady=10)
             
             # Move to next column or row
@@ -0,0 +1,114 @@
+import heapq
+import itertools
+import random
+import threading
+import time
+import utils
+
+# Google Sheets API quota: 60 read and 60 write requests per minute per user
+READ_REQUESTS_PER_MINUTE = 60
+WRITE_REQUESTS_PER_MINUTE = 60
+
+# Priority lanes, lower runs first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 1
+
+# Status codes worth retrying: throttling and transient server errors
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+class SheetsRateLimitError(Exception):
+    """Raised when a request is still throttled after every retry"""
+
+def get_status_code(error):
+    """Extract the HTTP status code from a gspread (or fake) API error, if any"""
+    code = getattr(error, "code", None)
+    if isinstance(code, int):
+        return code
+    response = getattr(error, "response", None)
+    return getattr(response, "status_code", None)
+
+class TokenBucket:
+    def __init__(self, rate_per_minute, capacity=None, clock=time.monotonic):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity or rate_per_minute
+        self.tokens = float(self.capacity)
+        self.clock = clock
+        self.last_refill = clock()
+    
+    def try_acquire(self):
+        """Take a token if one is available
+        
+        Returns 0 on success, otherwise the number of seconds until a token is due."""
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.last_refill) * self.rate)
+        self.last_refill = now
+        
+        # Allow for float rounding so waiting exactly the returned delay always succeeds
+        if self.tokens >= 1 - 1e-9:
+            self.tokens = max(0.0, self.tokens - 1)
+            return 0
+        return (1 - self.tokens) / self.rate
+
+class RequestScheduler:
+    def __init__(self, read_per_minute=READ_REQUESTS_PER_MINUTE, write_per_minute=WRITE_REQUESTS_PER_MINUTE,
+                 max_retries=5, base_delay=1.0, max_delay=32.0, clock=time.monotonic, sleep=time.sleep):
+        self.buckets = {
+            "read": TokenBucket(read_per_minute, clock=clock),
+            "write": TokenBucket(write_per_minute, clock=clock),
+        }
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.sleep = sleep
+        
+        # Waiting callers ordered by (priority, arrival)
+        self.condition = threading.Condition()
+        self.waiting = []
+        self.counter = itertools.count()
+    
+    def acquire(self, kind, priority):
+        """Block until this caller is first in line and a token is available"""
+        ticket = (priority, next(self.counter))
+        bucket = self.buckets[kind]
+        
+        with self.condition:
+            heapq.heappush(self.waiting, ticket)
+            try:
+                while True:
+                    while self.waiting[0] != ticket:
+                        self.condition.wait()
+                    
+                    wait = bucket.try_acquire()
+                    if wait <= 0:
+                        return
+                    
+                    # Sleep without holding the lock so higher priority callers can queue up
+                    self.condition.release()
+                    try:
+                        self.sleep(wait)
+                    finally:
+                        self.condition.acquire()
+            finally:
+                self.waiting.remove(ticket)
+                heapq.heapify(self.waiting)
+                self.condition.notify_all()
+    
+    def call(self, func, *args, kind="write", priority=PRIORITY_INTERACTIVE, **kwargs):
+        """Run an API call once the quota allows, retrying throttling and server errors"""
+        for attempt in range(self.max_retries + 1):
+            self.acquire(kind, priority)
+            try:
+                return func(*args, **kwargs)
+            except Exception as e:
+                status = get_status_code(e)
+                if status not in RETRYABLE_STATUS_CODES:
+                    raise
+                if attempt == self.max_retries:
+                    if status == 429:
+                        raise SheetsRateLimitError(f"Google Sheets quota exceeded after {attempt + 1} attempts") from e
+                    raise
+                
+                # Truncated exponential backoff with jitter
+                delay = min(self.max_delay, self.base_delay * (2 ** attempt)) + random.uniform(0, 1)
+                utils.debug_log(f"Sheets request failed with status {status}, retrying in {delay:.1f}s")
+                self.sleep(delay)
@@ -2,13 +2,34 @@ import stripe
 import qrcode
 from io import BytesIO
 import utils
+from core.money import to_pounds
 import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from PIL import Image
 
+# Shared product that every debt price hangs off, created once with a fixed id
+DEBT_PRODUCT_ID = "poker_debt"
+
+# Concurrency and backoff settings for creating a session's links
+MAX_LINK_WORKERS = 4
+MAX_RATE_LIMIT_RETRIES = 5
+BASE_BACKOFF_SECONDS = 0.5
+
 class StripePaymentManager:
     def __init__(self, api_key=None):
         # Use provided API key or try to get from environment
         self.api_key = api_key or os.environ.get('STRIPE_API_KEY')
+        
+        # Reusable price objects keyed by amount in pence
+        self.price_cache = {}
+        self.product_id = None
+        self.cache_lock = threading.Lock()
+        # One lock per amount, so each price is created once without holding up the others
+        self.price_locks = {}
+        
         if self.api_key:
             stripe.api_key = self.api_key
             self.initialized = True
@@ -16,7 +37,57 @@ class StripePaymentManager:
             self.initialized = False
             utils.debug_log("Stripe API key not found. Payment features will be disabled.")
     
-    def create_payment_link(self, amount, description, player_name):
+    def get_debt_product(self):
+        """Return the id of the shared debt product, creating it on first use"""
+        if self.product_id:
+            return self.product_id
+        
+        try:
+            product = stripe.Product.retrieve(DEBT_PRODUCT_ID)
+        except stripe.error.InvalidRequestError:
+            utils.debug_log("Creating shared Stripe debt product")
+            product = stripe.Product.create(
+                id=DEBT_PRODUCT_ID,
+                name="Poker Debt",
+                idempotency_key=f"product-{DEBT_PRODUCT_ID}"
+            )
+        
+        self.product_id = product.id
+        return self.product_id
+    
+    def get_price(self, amount_in_pence):
+        """Return a reusable price id for an amount, creating it only once"""
+        with self.cache_lock:
+            if amount_in_pence in self.price_cache:
+                return self.price_cache[amount_in_pence]
+            price_lock = self.price_locks.setdefault(amount_in_pence, threading.Lock())
+        
+        # The network calls only hold this amount's lock, other amounts go ahead in parallel
+        with price_lock:
+            with self.cache_lock:
+                if amount_in_pence in self.price_cache:
+                    return self.price_cache[amount_in_pence]
+            
+            # Look up a price left behind by a previous run before creating one
+            lookup_key = f"{DEBT_PRODUCT_ID}_gbp_{amount_in_pence}"
+            existing = stripe.Price.list(lookup_keys=[lookup_key], limit=1)
+            if existing.data:
+                price_id = existing.data[0].id
+            else:
+                price = stripe.Price.create(
+                    product=self.get_debt_product(),
+                    currency='gbp',
+                    unit_amount=amount_in_pence,
+                    lookup_key=lookup_key,
+                    idempotency_key=f"price-{lookup_key}"
+                )
+                price_id = price.id
+            
+            with self.cache_lock:
+                self.price_cache[amount_in_pence] = price_id
+            return price_id
+    
+    def create_payment_link(self, amount, description, player_name, session_id=None, player_id=None):
         """Create a Stripe payment link"""
         if not self.initialized:
             utils.debug_log("Stripe not initialized. Cannot create payment link.")
@@ -24,23 +95,31 @@ class StripePaymentManager:
             
         try:
             # Convert amount to pence/cents (Stripe requires integer amounts)
-            amount_in_pence = int(amount * 100)
+            amount_in_pence = int(round(amount * 100))
+            
+            # Retries for the same debt in the same session map to the same link.
+            # The amount is part of the key so an edited result gets a new link
+            # instead of an idempotency mismatch error.
+            idempotency_key = None
+            if session_id and player_id:
+                idempotency_key = f"link-{session_id}-{player_id}-{amount_in_pence}"
             
             # Create a payment link
-            payment_link = stripe.PaymentLink.create(
+            payment_link = self.call_with_backoff(
+                stripe.PaymentLink.create,
                 line_items=[{
-                    'price_data': {
-                        'currency': 'gbp',
-                        'product_data': {
-                            'name': f"Poker Debt: {player_name}",
-                            'description': description,
-                        },
-                        'unit_amount': amount_in_pence,
-                    },
+                    'price': self.call_with_backoff(self.get_price, amount_in_pence),
                     'quantity': 1,
                 }],
+                metadata={
+                    'player_name': player_name,
+                    'description': description,
+                    'session_id': session_id or "",
+                    'player_id': player_id or "",
+                },
                 payment_method_types=['card', 'apple_pay'],
                 after_completion={'type': 'redirect', 'redirect': {'url': 'https://example.com/thank-you'}},
+                idempotency_key=idempotency_key,
             )
             
             utils.debug_log(f"Created payment link for {player_name}: {payment_link.url}")
@@ -50,6 +129,40 @@ class StripePaymentManager:
             utils.debug_log(f"Error creating Stripe payment link: {str(e)}")
             return None
     
+    def create_payment_links(self, session_id, debtors, description):
+        """Create payment links for all of a session's debtors concurrently
+        
+        Debtor amounts are in pence. Returns a dict mapping player id to payment URL
+        (None on failure)."""
+        if not debtors:
+            return {}
+        
+        def create(debtor):
+            return self.create_payment_link(
+                to_pounds(debtor["amount"]),
+                description,
+                debtor["name"],
+                session_id=session_id,
+                player_id=debtor["id"]
+            )
+        
+        with ThreadPoolExecutor(max_workers=min(MAX_LINK_WORKERS, len(debtors))) as executor:
+            urls = list(executor.map(create, debtors))
+        
+        return {debtor["id"]: url for debtor, url in zip(debtors, urls)}
+    
+    def call_with_backoff(self, func, *args, **kwargs):
+        """Call a Stripe API function, retrying with exponential backoff when rate limited"""
+        for attempt in range(MAX_RATE_LIMIT_RETRIES + 1):
+            try:
+                return func(*args, **kwargs)
+            except stripe.error.RateLimitError:
+                if attempt == MAX_RATE_LIMIT_RETRIES:
+                    raise
+                delay = BASE_BACKOFF_SECONDS * (2 ** attempt) + random.uniform(0, BASE_BACKOFF_SECONDS)
+                utils.debug_log(f"Stripe rate limit hit, retrying in {delay:.2f}s")
+                time.sleep(delay)
+    
     def generate_qr_code(self, url):
         """Generate QR code for a payment URL"""
         if not url:
@@ -76,4 +189,4 @@ class StripePaymentManager:
             
         except Exception as e:
             utils.debug_log(f"Error generating QR code: {str(e)}")
-            return None 
\ No newline at end of file
+            return None 
@@ -0,0 +1,180 @@
+import copy
+import multiprocessing
+import queue
+import time
+import utils
+from core.events import change_token
+from core.ledger import apply_entry_changes
+
+# A job with no word from the worker for this long is treated as hung
+WORKER_TIMEOUT_SECONDS = 300
+
+def sync_token(session):
+    """Changes whenever anything the sheets show for the session could have changed"""
+    return change_token(session), session.get("name")
+
+def run_sync_worker(requests, events, credentials_file, sheet_name, conflict_policy):
+    """Entry point of the sync process: owns the Sheets connection and runs sync jobs"""
+    try:
+        # Imported here so gspread and oauth2client only ever load in the worker process
+        from google_sheets import GoogleSheetsManager
+        from sheets_scheduler import PRIORITY_BACKGROUND
+        manager = GoogleSheetsManager(credentials_file, sheet_name)
+    except Exception as e:
+        events.put(("error", None, str(e)))
+        return
+    events.put(("ready", None, None))
+    
+    # The worker's own copy of the sessions, so each job only carries the ones that changed
+    copies = {}
+    
+    while True:
+        message = requests.get()
+        if message is None:
+            break
+        
+        job_id, players, changed, session_ids, sync_state = message
+        manager.sync_state = sync_state
+        copies.update((session["id"], session) for session in changed)
+        for session_id in set(copies) - set(session_ids):
+            del copies[session_id]
+        
+        def save_state():
+            # Send a copy, the queue pickles it later from a feeder thread
+            events.put(("state", job_id, copy.deepcopy(manager.sync_state)))
+        
+        try:
+            sessions = [copies[session_id] for session_id in session_ids]
+            events.put(("progress", job_id, "Pulling changes from Google Sheets"))
+            changes = manager.pull_session_details(sessions, conflict_policy, priority=PRIORITY_BACKGROUND)
+            if changes:
+                # Apply them to our copy too so the push doesn't undo them
+                apply_entry_changes(sessions, changes)
+                events.put(("changes", job_id, changes))
+            
+            events.put(("progress", job_id, "Uploading to Google Sheets"))
+            manager.update_sheets(players, sessions, priority=PRIORITY_BACKGROUND, save_state=save_state)
+            events.put(("done", job_id, copy.deepcopy(manager.sync_state)))
+        except Exception as e:
+            events.put(("error", job_id, str(e)))
+
+class SheetsSyncWorker:
+    """Runs Google Sheets syncs in a separate process so the Tk loop never blocks on the network
+    
+    Jobs go over one queue and events (progress, pulled changes, watermark updates,
+    completion and errors) come back over another as (kind, job id, payload) tuples."""
+    def __init__(self, credentials_file, sheet_name, conflict_policy="local"):
+        self.credentials_file = credentials_file
+        self.sheet_name = sheet_name
+        self.conflict_policy = conflict_policy
+        
+        # Spawn rather than fork so the worker doesn't inherit the Tk process state
+        self.context = multiprocessing.get_context("spawn")
+        self.process = None
+        self.requests = None
+        self.events = None
+        
+        self.next_job_id = 0
+        self.active_job = None
+        self.last_heard = 0
+        
+        # Session id -> sync token of what the worker has, as of its last finished job,
+        # and of what the active job is sending
+        self.acked = {}
+        self.pending = {}
+    
+    def start(self):
+        """Start a fresh worker process"""
+        utils.debug_log("Starting Google Sheets sync worker")
+        # A new process starts with no copy of the sessions
+        self.acked = {}
+        self.requests = self.context.Queue()
+        self.events = self.context.Queue()
+        self.process = self.context.Process(
+            target=run_sync_worker,
+            args=(self.requests, self.events, self.credentials_file, self.sheet_name, self.conflict_policy),
+            daemon=True
+        )
+        self.process.start()
+    
+    def is_alive(self):
+        return self.process is not None and self.process.is_alive()
+    
+    def restart(self):
+        """Kill the worker and start a new one, without touching the app's data"""
+        utils.debug_log("Restarting Google Sheets sync worker")
+        self.stop(timeout=0)
+        self.start()
+    
+    def submit(self, players, sessions, sync_state):
+        """Queue a sync of the given data, returning its job id
+        
+        Only sessions that changed since the worker last finished a job are sent; it
+        keeps its own copy of the rest."""
+        if not self.is_alive():
+            self.start()
+        
+        self.pending = {session["id"]: sync_token(session) for session in sessions}
+        # Copied now, the queue pickles them later from a feeder thread
+        changed = copy.deepcopy([session for session in sessions
+                                 if self.acked.get(session["id"]) != self.pending[session["id"]]])
+        utils.debug_log(f"Sending {len(players)} players and {len(changed)} of {len(sessions)} sessions "
+                        f"to the sync worker")
+        
+        self.next_job_id += 1
+        self.active_job = self.next_job_id
+        self.last_heard = time.monotonic()
+        self.requests.put((self.active_job, players, changed, [session["id"] for session in sessions], sync_state))
+        return self.active_job
+    
+    def poll(self):
+        """Return the events received since the last poll, without blocking"""
+        events = []
+        if self.events is None:
+            return events
+        
+        while True:
+            try:
+                event = self.events.get_nowait()
+            except queue.Empty:
+                break
+            # A worker that couldn't connect fails whatever job it was given
+            if event[0] == "error" and event[1] is None and self.active_job is not None:
+                event = ("error", self.active_job, event[2])
+            events.append(event)
+            self.last_heard = time.monotonic()
+            if event[0] in ("done", "error") and event[1] == self.active_job:
+                # A failed job may have left the worker's copy anywhere, so send everything next time
+                self.acked = self.pending if event[0] == "done" else {}
+                self.active_job = None
+        
+        if self.active_job is not None:
+            # A dead worker is started again by the next submit, a silent one is replaced now
+            if not self.is_alive():
+                events.append(("error", self.active_job, "Sync worker stopped unexpectedly"))
+                self.active_job = None
+            elif time.monotonic() - self.last_heard > WORKER_TIMEOUT_SECONDS:
+                events.append(("error", self.active_job, "Sync worker stopped responding"))
+                self.active_job = None
+                self.restart()
+        
+        return events
+    
+    def is_busy(self):
+        return self.active_job is not None
+    
+    def stop(self, timeout=2):
+        """Ask the worker to exit, killing it if it doesn't"""
+        if self.process is None:
+            return
+        if self.process.is_alive():
+            try:
+                self.requests.put(None)
+            except Exception:
+                pass
+            self.process.join(timeout)
+            if self.process.is_alive():
+                self.process.terminate()
+                self.process.join(1)
+        self.process = None
+        self.active_job = None
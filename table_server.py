@@ -0,0 +1,506 @@
+# Local HTTP/JSON API so players can enter rebuys and cash-outs from their phones.
+#
+# The server runs an asyncio loop in a background thread and only parses requests.
+# Every read and write of the session goes through one queue that the owning thread
+# (the Tk loop, or the CLI's writer loop) drains, so the data is only ever touched
+# from one thread and the GUI sees each change as soon as it is applied.
+#
+#   GET  /api/tables                                 every live table with totals
+#   GET  /api/tables/<sid>                           one table's session with totals
+#   GET  /api/players                                all players, marking where they sit
+#   POST /api/tables/<sid>/players/<id>/rebuy        {"amount": 10}
+#   POST /api/tables/<sid>/players/<id>/cashout      {"amount": 25.5}
+#   POST /api/tables/<sid>/move                      {"player_id": "...", "to": "<sid>", "amount": 40}
+#   POST /api/tables/<sid>/end                       {"force": false}
+#   GET  /api/session/events                         Server-Sent Events stream of table deltas
+#
+# /api/session and /api/session/... work as before on the first live table. Amounts
+# sent and returned are in pounds.
+#
+# The stream starts with a "tables" snapshot (or replays from Last-Event-ID), then
+# sends session_started, session_ended, player_added, entry_changed, player_removed
+# and balance events, each naming its table, whether changed through the API or GUI.
+#
+# The server only listens on this machine unless given another host, and then only
+# with a token, which clients send as an X-Table-Token header or a token query parameter.
+# Every response allows any origin, and CORS preflights are answered without the token,
+# so a page served from elsewhere can call the API.
+import asyncio
+import collections
+import hmac
+import ipaddress
+import json
+import queue
+import secrets
+import socket
+import threading
+from urllib.parse import urlsplit, parse_qs
+from core import ledger, money, tables
+import utils
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+MAX_BODY_BYTES = 64 * 1024
+IDLE_TIMEOUT_SECONDS = 30
+
+# Event stream tuning: frames kept for clients resuming with Last-Event-ID, frames a
+# client may fall behind before it is dropped, and the keep-alive comment interval
+EVENT_BUFFER_SIZE = 256
+CLIENT_QUEUE_SIZE = 100
+HEARTBEAT_SECONDS = 15
+
+HTTP_REASONS = {200: "OK", 204: "No Content", 400: "Bad Request", 401: "Unauthorized", 404: "Not Found",
+                405: "Method Not Allowed", 409: "Conflict", 413: "Payload Too Large",
+                500: "Internal Server Error"}
+
+CORS_HEADERS = ("Access-Control-Allow-Origin: *\r\n"
+                "Access-Control-Allow-Methods: GET, POST, OPTIONS\r\n"
+                "Access-Control-Allow-Headers: Content-Type, X-Table-Token, Last-Event-ID\r\n")
+
+class NoActiveSession(Exception):
+    pass
+
+Subscriber = collections.namedtuple("Subscriber", "queue writer")
+
+class SessionBroadcaster:
+    """Fans session events out to event stream clients, on the server's event loop
+    
+    Each event is encoded to an SSE frame once and the same bytes are queued for
+    every client, so the cost per client is a queue put, not a serialisation."""
+    def __init__(self):
+        self.subscribers = set()
+        self.recent = collections.deque(maxlen=EVENT_BUFFER_SIZE)
+        self.snapshot_frame = None
+        self.last_id = 0
+    
+    def publish(self, frames, snapshot_frame):
+        """Send (event id, frame) pairs to every client and remember the matching snapshot"""
+        self.snapshot_frame = snapshot_frame
+        for event_id, frame in frames:
+            self.last_id = event_id
+            self.recent.append((event_id, frame))
+            for subscriber in list(self.subscribers):
+                try:
+                    subscriber.queue.put_nowait(frame)
+                except asyncio.QueueFull:
+                    # Too slow to keep up, it can reconnect and resume
+                    self.subscribers.discard(subscriber)
+                    subscriber.writer.close()
+    
+    def subscribe(self, writer, last_event_id=None):
+        """Register a client, returning it with its catch-up frames already queued"""
+        subscriber = Subscriber(asyncio.Queue(maxsize=CLIENT_QUEUE_SIZE + EVENT_BUFFER_SIZE), writer)
+        
+        # Replay what a reconnecting client missed, or start it from a full snapshot. An id
+        # past the last one comes from before a server restart, when ids began again.
+        if (last_event_id is not None and self.recent and
+                self.recent[0][0] <= last_event_id + 1 <= self.last_id + 1):
+            backlog = [frame for event_id, frame in self.recent if event_id > last_event_id]
+        else:
+            backlog = [self.snapshot_frame] if self.snapshot_frame else []
+        for frame in backlog:
+            subscriber.queue.put_nowait(frame)
+        
+        self.subscribers.add(subscriber)
+        return subscriber
+    
+    def unsubscribe(self, subscriber):
+        self.subscribers.discard(subscriber)
+
+def is_loopback(host):
+    """Whether a listening host is only reachable from this machine"""
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+def generate_token():
+    return secrets.token_urlsafe(16)
+
+class TableServer:
+    def __init__(self, store, host=DEFAULT_HOST, port=DEFAULT_PORT, token="", end_session=None, on_change=None):
+        if not token and not is_loopback(host):
+            raise ValueError(f"The table server needs a token to listen on {host}, set table_server_token")
+        self.store = store
+        self.host = host
+        self.port = port
+        self.token = token
+        
+        # end_session moves a live session to the history, on_change runs after every write
+        self.end_session = end_session or (lambda session: store.end_session(session["id"]))
+        self.on_change = on_change
+        
+        self.commands = queue.Queue()
+        self.broadcaster = SessionBroadcaster()
+        
+        # What event stream clients were last told about each table, maintained by the writer thread
+        self.has_published = False
+        self.published_tables = {}
+        self.next_event_id = 1
+        
+        self.loop = None
+        self.server = None
+        self.thread = None
+        self.started = threading.Event()
+    
+    def start(self):
+        """Start serving in a background thread"""
+        self.thread = threading.Thread(target=self.run_loop, daemon=True)
+        self.thread.start()
+        self.started.wait(5)
+        utils.debug_log(f"Table server listening on {self.host}:{self.port}")
+    
+    def run_loop(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.server = self.loop.run_until_complete(
+                asyncio.start_server(self.handle_connection, self.host, self.port))
+            self.port = self.server.sockets[0].getsockname()[1]
+        except OSError as e:
+            utils.debug_log(f"Table server failed to start: {e}")
+            self.started.set()
+            return
+        self.started.set()
+        self.loop.run_forever()
+        
+        # Drop open connections before closing the loop
+        self.server.close()
+        tasks = asyncio.all_tasks(self.loop)
+        for task in tasks:
+            task.cancel()
+        self.loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+        self.loop.close()
+    
+    @property
+    def running(self):
+        return self.server is not None
+    
+    def url(self, with_token=False):
+        """Address of the API for clients on the network, optionally with the token"""
+        host = socket.gethostname() if self.host in ("", "0.0.0.0", "::") else self.host
+        url = f"http://{host}:{self.port}/api/tables"
+        return f"{url}?token={self.token}" if with_token and self.token else url
+    
+    def stop(self):
+        if self.loop and self.loop.is_running():
+            self.loop.call_soon_threadsafe(self.loop.stop)
+        if self.thread:
+            self.thread.join(2)
+    
+    # Writer side, called from the thread that owns the data
+    
+    def process_commands(self):
+        """Run every queued command, returning how many ran
+        
+        Also publishes any session changes, including edits made in the GUI."""
+        processed = 0
+        while True:
+            try:
+                command = self.commands.get_nowait()
+            except queue.Empty:
+                break
+            self.run_command(*command)
+            processed += 1
+        self.publish_changes()
+        return processed
+    
+    def run_writer(self, stop_event):
+        """Block running commands until stop_event is set, for use without a GUI"""
+        while not stop_event.is_set():
+            try:
+                command = self.commands.get(timeout=0.5)
+            except queue.Empty:
+                command = None
+            if command:
+                self.run_command(*command)
+            self.publish_changes()
+    
+    def run_command(self, func, args, writes, future):
+        try:
+            result = func(*args)
+            if writes and self.on_change:
+                self.on_change()
+        except Exception as e:
+            self.loop.call_soon_threadsafe(self.resolve, future, None, e)
+        else:
+            self.loop.call_soon_threadsafe(self.resolve, future, result, None)
+    
+    @staticmethod
+    def resolve(future, result, error):
+        if future.done():
+            return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+    
+    def table(self, session_id=None):
+        """The live table with the given session id, or the first one"""
+        table = self.store.get_table(session_id) if session_id else next(iter(self.store.tables.values()), None)
+        if not table:
+            raise NoActiveSession("There is no active session." if not session_id else f"No live table {session_id}")
+        return table
+    
+    def entry_view(self, entry):
+        player = self.store.get_player_by_id(entry["id"])
+        return {
+            "id": entry["id"],
+            "name": player["name"] if player else "Unknown Player",
+            "buyin": money.to_pounds(entry["buyin"]),
+            "rebuys": money.to_pounds(entry.get("rebuys", 0)),
+            "cashout": money.to_pounds(entry.get("cashout", 0)),
+            "total_in": money.to_pounds(ledger.entry_total_in(entry)),
+            "profit": money.to_pounds(ledger.entry_profit(entry))
+        }
+    
+    def totals_view(self, session):
+        total_buyin, total_rebuys, total_cashout = ledger.session_totals(session)
+        return {
+            "buyin": money.to_pounds(total_buyin),
+            "rebuys": money.to_pounds(total_rebuys),
+            "cashout": money.to_pounds(total_cashout),
+            "balance": money.to_pounds(ledger.session_balance(session)),
+            "balanced": ledger.is_balanced(session)
+        }
+    
+    def session_snapshot(self, session_id=None):
+        """Copy of a table's session with names and totals, safe to hand to another thread"""
+        session = self.table(session_id).session
+        return {
+            "id": session["id"],
+            "name": session["name"],
+            "date": session["date"],
+            "players": [self.entry_view(entry) for entry in session["players"]],
+            "totals": self.totals_view(session)
+        }
+    
+    def tables_snapshot(self):
+        return [self.session_snapshot(session_id) for session_id in list(self.store.tables)]
+    
+    def publish_changes(self):
+        """Diff each table against what clients last saw and broadcast the deltas"""
+        if self.loop is None:
+            return
+        
+        current = {}
+        for session_id, table in list(self.store.tables.items()):
+            current[session_id] = {entry["id"]: (entry["buyin"], entry.get("rebuys", 0), entry.get("cashout", 0))
+                                   for entry in table.session["players"]}
+        if self.has_published and current == self.published_tables:
+            return
+        
+        events = []
+        for session_id in self.published_tables:
+            if session_id not in current:
+                events.append(("session_ended", {"id": session_id, "table": session_id}))
+        for session_id, entries in current.items():
+            session = self.store.get_table(session_id).session
+            previous = self.published_tables.get(session_id)
+            if previous is None:
+                events.append(("session_started", {"id": session_id, "table": session_id,
+                                                   "name": session["name"], "date": session["date"]}))
+                previous = {}
+            elif previous == entries:
+                continue
+            
+            for entry in session["players"]:
+                if entry["id"] not in previous:
+                    events.append(("player_added", dict(self.entry_view(entry), table=session_id)))
+                elif previous[entry["id"]] != entries[entry["id"]]:
+                    events.append(("entry_changed", dict(self.entry_view(entry), table=session_id)))
+            for player_id in previous:
+                if player_id not in entries:
+                    events.append(("player_removed", {"id": player_id, "table": session_id}))
+            events.append(("balance", dict(self.totals_view(session), table=session_id)))
+        
+        frames = []
+        for kind, data in events:
+            frames.append((self.next_event_id, self.encode_event(self.next_event_id, kind, data)))
+            self.next_event_id += 1
+        snapshot_frame = self.encode_event(self.next_event_id - 1, "tables", self.tables_snapshot())
+        
+        self.has_published = True
+        self.published_tables = current
+        self.loop.call_soon_threadsafe(self.broadcaster.publish, frames, snapshot_frame)
+    
+    @staticmethod
+    def encode_event(event_id, kind, data):
+        return f"id: {event_id}\nevent: {kind}\ndata: {json.dumps(data)}\n\n".encode()
+    
+    def players_snapshot(self):
+        seated = {}
+        for session_id, table in self.store.tables.items():
+            for entry in table.session["players"]:
+                seated.setdefault(entry["id"], session_id)
+        return [{"id": p["id"], "name": p["name"], "seated": p["id"] in seated, "table": seated.get(p["id"])}
+                for p in self.store.get_all_players()]
+    
+    def rebuy(self, session_id, player_id, amount):
+        table = self.table(session_id)
+        with table.lock:
+            ledger.record_rebuy(table.session, player_id, money.to_pence(amount))
+        return self.session_snapshot(table.id)
+    
+    def cashout(self, session_id, player_id, amount):
+        table = self.table(session_id)
+        with table.lock:
+            ledger.set_cashout(table.session, player_id, money.to_pence(amount))
+        return self.session_snapshot(table.id)
+    
+    def move(self, session_id, player_id, to, amount):
+        source = self.table(session_id)
+        target = self.table(to) if to else None
+        if not target:
+            raise ValueError("Say which table to move the player to")
+        tables.move_player(source, target, player_id, money.to_pence(amount))
+        return {"from": self.session_snapshot(source.id), "to": self.session_snapshot(target.id)}
+    
+    def end(self, session_id, force):
+        session = self.table(session_id).session
+        if not force and not ledger.is_balanced(session):
+            raise ValueError(f"The session is unbalanced by {money.format_pence(ledger.session_balance(session))}. "
+                             f"Send force to end it anyway.")
+        self.end_session(session)
+        return {"ended": session["id"]}
+    
+    # HTTP side, runs on the server's event loop
+    
+    async def submit(self, func, *args, writes=False):
+        """Queue a command for the writer thread and wait for its result"""
+        future = self.loop.create_future()
+        self.commands.put((func, args, writes, future))
+        return await future
+    
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await asyncio.wait_for(reader.readline(), IDLE_TIMEOUT_SECONDS)
+                if not request_line:
+                    break
+                method, target, version = request_line.decode("latin-1").split()
+                
+                headers = {}
+                while True:
+                    line = await asyncio.wait_for(reader.readline(), IDLE_TIMEOUT_SECONDS)
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                
+                length = int(headers.get("content-length", 0))
+                if length > MAX_BODY_BYTES:
+                    self.write_response(writer, 413, {"error": "Request body too large"}, False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+                
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                if method == "OPTIONS":
+                    # CORS preflight, which browsers send without the token
+                    self.write_response(writer, 204, None, keep_alive)
+                    await writer.drain()
+                    if not keep_alive:
+                        break
+                    continue
+                
+                if method == "GET" and urlsplit(target).path.rstrip("/") == "/api/session/events":
+                    await self.stream_events(writer, target, headers)
+                    break
+                
+                status, payload = await self.handle_request(method, target, headers, body)
+                self.write_response(writer, status, payload, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        except asyncio.CancelledError:
+            # Server shutting down, end quietly rather than leaving the task cancelled
+            pass
+        finally:
+            writer.close()
+    
+    async def stream_events(self, writer, target, headers):
+        """Serve the Server-Sent Events stream until the client goes away"""
+        if not self.authorized(headers, parse_qs(urlsplit(target).query)):
+            self.write_response(writer, 401, {"error": "Missing or wrong table token"}, False)
+            return
+        
+        writer.write(b"HTTP/1.1 200 OK\r\n"
+                     b"Content-Type: text/event-stream\r\n"
+                     b"Cache-Control: no-cache\r\n" +
+                     CORS_HEADERS.encode() +
+                     b"Connection: keep-alive\r\n\r\n")
+        
+        last_event_id = headers.get("last-event-id")
+        subscriber = self.broadcaster.subscribe(
+            writer, int(last_event_id) if last_event_id and last_event_id.isdigit() else None)
+        try:
+            while True:
+                try:
+                    frame = await asyncio.wait_for(subscriber.queue.get(), HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    frame = b": ping\n\n"
+                writer.write(frame)
+                await writer.drain()
+        finally:
+            self.broadcaster.unsubscribe(subscriber)
+    
+    def authorized(self, headers, query):
+        if not self.token:
+            return True
+        supplied = headers.get("x-table-token") or query.get("token", [""])[0]
+        return hmac.compare_digest(supplied.encode(), self.token.encode())
+    
+    async def handle_request(self, method, target, headers, body):
+        url = urlsplit(target)
+        if not self.authorized(headers, parse_qs(url.query)):
+            return 401, {"error": "Missing or wrong table token"}
+        
+        parts = [part for part in url.path.split("/") if part]
+        try:
+            data = json.loads(body) if body else {}
+            if parts == ["api", "players"] and method == "GET":
+                return 200, await self.submit(self.players_snapshot)
+            if parts == ["api", "tables"] and method == "GET":
+                return 200, await self.submit(self.tables_snapshot)
+            
+            # /api/session/... is the first table, /api/tables/<sid>/... a specific one
+            if parts[:2] == ["api", "session"]:
+                session_id, rest = None, parts[2:]
+            elif parts[:2] == ["api", "tables"] and len(parts) > 2:
+                session_id, rest = parts[2], parts[3:]
+            else:
+                return 404, {"error": f"No route for {method} {url.path}"}
+            
+            if rest == [] and method == "GET":
+                return 200, await self.submit(self.session_snapshot, session_id)
+            if rest == ["end"] and method == "POST":
+                return 200, await self.submit(self.end, session_id, bool(data.get("force")), writes=True)
+            if rest == ["move"] and method == "POST":
+                return 200, await self.submit(self.move, session_id, data.get("player_id"), data.get("to"),
+                                              data.get("amount"), writes=True)
+            if len(rest) == 3 and rest[0] == "players" and method == "POST":
+                if rest[2] == "rebuy":
+                    return 200, await self.submit(self.rebuy, session_id, rest[1], data.get("amount"), writes=True)
+                if rest[2] == "cashout":
+                    return 200, await self.submit(self.cashout, session_id, rest[1], data.get("amount"), writes=True)
+            return 404, {"error": f"No route for {method} {url.path}"}
+        except NoActiveSession as e:
+            return 409, {"error": str(e)}
+        except (ValueError, AttributeError) as e:
+            return 400, {"error": str(e)}
+        except Exception as e:
+            utils.debug_log(f"Table server error handling {method} {url.path}: {e}")
+            return 500, {"error": "Internal error"}
+    
+    def write_response(self, writer, status, payload, keep_alive):
+        body = json.dumps(payload).encode() if payload is not None else b""
+        head = (f"HTTP/1.1 {status} {HTTP_REASONS.get(status, '')}\r\n"
+                f"Content-Type: application/json\r\n"
+                f"Content-Length: {len(body)}\r\n" +
+                CORS_HEADERS +
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode() + body)
@@ -0,0 +1,26 @@
+import os
+import sys
+import threading
+import pytest
+
+# Let the tests import the app modules from the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+class VirtualClock:
+    """Time that only moves when something sleeps, recording each sleep"""
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+        self.lock = threading.Lock()
+    
+    def time(self):
+        return self.now
+    
+    def sleep(self, seconds):
+        with self.lock:
+            self.sleeps.append(seconds)
+            self.now += max(0.0, seconds)
+
+@pytest.fixture
+def clock():
+    return VirtualClock()
@@ -0,0 +1,44 @@
+import copy
+import json
+import pickle
+import pytest
+from core.entries import Entry, PlayerRegistry, compact_session, json_default, registry
+
+def test_registry_interns_ids_in_first_seen_order():
+    ids = PlayerRegistry()
+    assert [ids.intern(player_id) for player_id in ("b", "a", "b", "c")] == [0, 1, 0, 2]
+    assert len(ids) == 3
+    assert ids.canonical("".join(["a"])) is ids.ids[1]
+
+def test_entry_reads_and_writes_like_a_dict():
+    entry = Entry("player-1", 2000)
+    assert entry["id"] == "player-1" and entry.get("rebuys", 5) == 0
+    assert entry.get("note", "none") == "none"
+    entry.update(rebuys=1000, cashout=3500)
+    assert dict(entry) == {"id": "player-1", "buyin": 2000, "rebuys": 1000, "cashout": 3500}
+    assert entry == {"id": "player-1", "buyin": 2000, "rebuys": 1000, "cashout": 3500}
+    with pytest.raises(KeyError):
+        entry["note"] = "late"
+    with pytest.raises(KeyError):
+        del entry["buyin"]
+    with pytest.raises(AttributeError):
+        entry.note = "late"
+
+def test_entry_copies_are_independent():
+    entry = Entry("player-1", 2000)
+    for duplicate in (copy.copy(entry), copy.deepcopy(entry), pickle.loads(pickle.dumps(entry))):
+        duplicate["cashout"] = 100
+        assert duplicate["id"] == "player-1" and entry["cashout"] == 0
+
+def test_compacted_session_round_trips_through_json():
+    session = {"id": "s1", "players": [{"id": "player-1", "buyin": 2000, "rebuys": 0, "cashout": 1500}],
+               "events": [{"type": "seat", "player_id": "".join(["player-", "1"]), "amount": 2000}]}
+    saved = json.dumps(session)
+    compact_session(session)
+    assert isinstance(session["players"][0], Entry)
+    assert session["events"][0]["player_id"] is registry.canonical("player-1")
+    assert json.loads(json.dumps(session, default=json_default)) == json.loads(saved)
+
+def test_unknown_entry_fields_are_refused():
+    with pytest.raises(ValueError):
+        Entry.from_dict({"id": "player-1", "buyin": 0, "tip": 5})
@@ -0,0 +1,55 @@
+import datetime
+import pytest
+from fake_gspread import FakeAPIError, FakeClient, FakeService
+from sheets_scheduler import RequestScheduler
+
+def make_history(num_players=4, num_sessions=30):
+    players = [{"id": f"p{i}", "name": f"Player {i}"} for i in range(num_players)]
+    start = datetime.datetime(2024, 1, 1)
+    sessions = []
+    for i in range(num_sessions):
+        entries = [{"id": player["id"], "buyin": 1000, "rebuys": 500 * (i % 2), "cashout": 1000 + 250 * (j - 1)}
+                   for j, player in enumerate(players)]
+        sessions.append({"id": f"s{i}", "name": f"Session {i}", "date": (start + datetime.timedelta(days=i)).isoformat(),
+                         "players": entries})
+    return players, sessions
+
+def test_injected_failures_are_raised_in_order_and_counted():
+    service = FakeService()
+    client = FakeClient(service)
+    service.fail_next(429)
+    service.fail_next(503)
+    for status in (429, 503):
+        with pytest.raises(FakeAPIError) as error:
+            client.create("Poker Tracker")
+        assert error.value.code == status
+        assert error.value.response.status_code == status
+    client.create("Poker Tracker")
+    assert service.request_counts["create"] == 3
+
+def test_scheduler_rides_out_the_service_quota(clock):
+    service = FakeService(write_per_minute=2, clock=clock.time)
+    client = FakeClient(service)
+    with pytest.raises(FakeAPIError):
+        for _ in range(3):
+            client.create("Poker Tracker")
+    
+    # The scheduler allows more than the service does, so it has to back off on the 429s
+    scheduler = RequestScheduler(clock=clock.time, sleep=clock.sleep)
+    for _ in range(4):
+        scheduler.call(client.create, "Poker Tracker")
+    assert clock.sleeps
+
+def test_sync_survives_random_server_errors(clock):
+    pytest.importorskip("gspread")
+    from google_sheets import GoogleSheetsManager, iter_sheet_rows
+    
+    client = FakeClient(FakeService(failure_rate=0.1, seed=3))
+    scheduler = RequestScheduler(clock=clock.time, sleep=clock.sleep, max_retries=8)
+    manager = GoogleSheetsManager(sheet_name="Poker Tracker", scheduler=scheduler, client=client)
+    players, sessions = make_history()
+    manager.update_sheets(players, sessions)
+    
+    expected = [row for title, row in iter_sheet_rows(players, sessions) if title == "Sessions"]
+    rows = manager.spreadsheet.worksheet("Sessions").get_all_values()
+    assert rows[1:] == expected
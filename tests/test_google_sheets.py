@@ -0,0 +1,58 @@
+import datetime
+import pytest
+from fake_gspread import FakeClient, FakeService
+from sheets_scheduler import RequestScheduler, SheetsRateLimitError
+
+google_sheets = pytest.importorskip("google_sheets", exc_type=ImportError)
+
+def make_history(num_players=4, num_sessions=60):
+    players = [{"id": f"p{i}", "name": f"Player {i}"} for i in range(num_players)]
+    start = datetime.datetime(2024, 1, 1)
+    sessions = []
+    for i in range(num_sessions):
+        entries = [{"id": player["id"], "buyin": 1000, "rebuys": 0, "cashout": 1000 + 250 * (j - 1)}
+                   for j, player in enumerate(players)]
+        sessions.append({"id": f"s{i}", "name": f"Session {i}", "date": (start + datetime.timedelta(days=i)).isoformat(),
+                         "players": entries})
+    return players, sessions
+
+def make_manager(clock, service):
+    scheduler = RequestScheduler(clock=clock.time, sleep=clock.sleep, max_retries=1)
+    return google_sheets.GoogleSheetsManager(sheet_name="Poker Tracker", scheduler=scheduler,
+                                             client=FakeClient(service))
+
+def test_throttled_backfill_resumes_from_the_watermark(clock, monkeypatch):
+    monkeypatch.setattr(google_sheets, "SYNC_CHUNK_ROWS", 50)
+    service = FakeService()
+    manager = make_manager(clock, service)
+    players, sessions = make_history()
+    
+    # Throttle every request once two chunks are in
+    chunks = []
+    def save_state():
+        chunks.append(len(manager.sync_state["sessions"]))
+        if len(chunks) == 2:
+            service.fail_next(429, count=10)
+    
+    with pytest.raises(SheetsRateLimitError):
+        manager.update_sheets(players, sessions, save_state=save_state)
+    assert len(manager.sync_state["sessions"]) == chunks[-1] == 20
+    
+    service.queued_failures.clear()
+    writes = service.request_counts.get("values_batch_update", 0)
+    manager.update_sheets(players, sessions)
+    # Only the last 40 sessions are written again, plus the Players rows
+    assert service.request_counts["values_batch_update"] - writes == 4 + 1
+    rows = manager.spreadsheet.worksheet("Sessions").get_all_values()
+    assert [row[0] for row in rows[1:]] == [session["id"] for session in sessions]
+
+def test_recreated_worksheet_resets_the_watermark(clock):
+    manager = make_manager(clock, FakeService())
+    players, sessions = make_history(num_sessions=5)
+    manager.update_sheets(players, sessions)
+    
+    spreadsheet = manager.spreadsheet
+    spreadsheet.del_worksheet(spreadsheet.worksheet("Sessions"))
+    manager.invalidate_cache()
+    manager.update_sheets(players, sessions)
+    assert len(spreadsheet.worksheet("Sessions").get_all_values()) == len(sessions) + 1
@@ -0,0 +1,39 @@
+import random
+import pytest
+from core.leaderboard import Leaderboard, RANK_KEYS, rank_value
+
+def random_rows(count, seed=3):
+    rng = random.Random(seed)
+    rows = []
+    for number in range(count):
+        row = {key: rng.randint(-5, 5) for key in RANK_KEYS}
+        row.update(id=f"p{number}", name=rng.choice(["alice", "Bob", "cara", "Dan"]) + str(rng.randint(0, 3)),
+                   rating=rng.choice([None, 1450, 1500, 1550]))
+        rows.append(row)
+    return rows
+
+def ids(rows):
+    return [row["id"] for row in rows]
+
+@pytest.mark.parametrize("key", RANK_KEYS)
+def test_top_matches_a_full_sort(key):
+    rows = random_rows(60)
+    leaderboard = Leaderboard(rows)
+    for count in (1, 5, 60, 80):
+        highest = sorted(rows, key=lambda row: rank_value(row, key), reverse=True)
+        lowest = sorted(rows, key=lambda row: rank_value(row, key, True))
+        assert ids(leaderboard.top(key, count)) == ids(highest[:count])
+        assert ids(leaderboard.top(key, count, lowest=True)) == ids(lowest[:count])
+        # Once the full order is cached, top slices it instead
+        assert ids(leaderboard.sorted(key)) == ids(highest)
+        assert ids(leaderboard.top(key, count)) == ids(highest[:count])
+
+def test_missing_values_rank_last_both_ways():
+    rows = [{"id": "a", "rating": None}, {"id": "b", "rating": 1400}, {"id": "c", "rating": 1600}]
+    leaderboard = Leaderboard(rows)
+    assert ids(leaderboard.sorted("rating")) == ["c", "b", "a"]
+    assert ids(leaderboard.sorted("rating", descending=False)) == ["b", "c", "a"]
+
+def test_unknown_column_is_refused():
+    with pytest.raises(ValueError):
+        Leaderboard([]).top("email", 3)
@@ -0,0 +1,40 @@
+from core import events, ledger
+
+def legacy_session():
+    # Saved before duplicates were prevented: Alice entered twice
+    return {"id": "s1", "name": "Old Night", "date": "2023-05-01T20:00:00", "players": [
+        {"id": "alice", "buyin": 1000, "rebuys": 0, "cashout": 500},
+        {"id": "bob", "buyin": 1000, "rebuys": 0, "cashout": 1500},
+        {"id": "alice", "buyin": 2000, "rebuys": 0, "cashout": 2000},
+    ]}
+
+def amounts(session):
+    return [(entry["id"], entry["buyin"], entry.get("rebuys", 0), entry.get("cashout", 0))
+            for entry in session["players"]]
+
+def test_sheet_change_applies_to_the_entry_its_row_came_from():
+    session = legacy_session()
+    events.ensure_events(session)
+    change = {"session_id": "s1", "player_id": "alice", "entry_index": 2, "buyin": 2000, "rebuys": 500,
+              "cashout": 2500, "conflict": False}
+    assert ledger.apply_entry_changes([session], [change]) == 1
+    assert amounts(session) == [("alice", 1000, 0, 500), ("bob", 1000, 0, 1500), ("alice", 2000, 500, 2500)]
+    
+    # Replaying the events lands on the same entries
+    replayed = events.replay(session)
+    assert amounts(replayed) == amounts(session)
+
+def test_change_for_a_row_that_no_longer_matches_is_skipped():
+    session = legacy_session()
+    events.ensure_events(session)
+    change = {"session_id": "s1", "player_id": "alice", "entry_index": 1, "buyin": 1, "rebuys": 0,
+              "cashout": 0, "conflict": False}
+    assert ledger.apply_entry_changes([session], [change]) == 0
+    assert amounts(session) == amounts(legacy_session())
+
+def test_update_entry_edits_the_entry_at_its_position():
+    session = legacy_session()
+    events.ensure_events(session)
+    ledger.update_entry(session, 2, 2000, 0, 3000)
+    assert session["players"][0]["cashout"] == 500
+    assert session["players"][2]["cashout"] == 3000
@@ -0,0 +1,90 @@
+from core import events, merge
+from core.storage import DataStore
+
+def base_of(*records):
+    return {record["id"]: (record.get("version", 0), merge.fingerprint(record)) for record in records}
+
+def test_changes_to_different_fields_are_both_kept():
+    base = {"id": "p1", "version": 1, "name": "Alice", "email": ""}
+    local = dict(base, name="Alice B")
+    theirs = dict(base, email="alice@example.com", version=2)
+    merged, conflicts = merge.merge_records(base_of(base), [local], [theirs])
+    assert merged == [local]
+    assert local["name"] == "Alice B" and local["email"] == "alice@example.com"
+    assert local["version"] == 2
+    assert conflicts == []
+
+def test_clashing_field_keeps_our_value():
+    base = {"id": "p1", "version": 1, "name": "Alice"}
+    local = dict(base, name="Ali")
+    theirs = dict(base, name="Alicia", version=2)
+    merged, conflicts = merge.merge_records(base_of(base), [local], [theirs])
+    assert merged[0]["name"] == "Ali"
+    assert conflicts == ["p1"]
+
+def test_deletions_win_only_over_unedited_records():
+    kept = {"id": "p1", "version": 1, "name": "Alice"}
+    edited = {"id": "p2", "version": 1, "name": "Bob"}
+    base = base_of(kept, edited)
+    
+    # They deleted both; we edited one of them since
+    merged, _ = merge.merge_records(base, [dict(kept), dict(edited, name="Robert")], [])
+    assert [record["id"] for record in merged] == ["p2"]
+    
+    # We deleted both; they edited one of them since
+    merged, _ = merge.merge_records(base, [], [dict(kept), dict(edited, name="Robert", version=2)])
+    assert [record["id"] for record in merged] == ["p2"]
+
+def test_records_new_on_either_side_are_added():
+    local = {"id": "p1", "name": "Alice"}
+    theirs = {"id": "p2", "name": "Bob", "version": 1}
+    merged, conflicts = merge.merge_records({}, [local], [theirs])
+    assert [record["id"] for record in merged] == ["p1", "p2"]
+    assert conflicts == []
+
+def test_event_fields_merge_as_one_unit():
+    base = {"id": "s1", "version": 1, "name": "Friday", "players": [], "totals": {"buyin": 0}, "events": []}
+    local = dict(base, name="Friday Night")
+    theirs = dict(base, version=2, players=[{"id": "p1"}], totals={"buyin": 2000}, events=[{"type": "seat"}])
+    merged, conflicts = merge.merge_records(base_of(base), [local], [theirs], groups=[merge.SESSION_EVENT_FIELDS])
+    assert merged[0]["name"] == "Friday Night"
+    assert merged[0]["totals"] == {"buyin": 2000} and merged[0]["events"] == [{"type": "seat"}]
+    assert conflicts == []
+
+def test_two_programs_saving_the_same_file_keep_both_edits(tmp_path):
+    data_file = str(tmp_path / "poker_data.json")
+    first = DataStore(data_file)
+    alice = first.add_player("Alice")
+    bob = first.add_player("Bob")
+    first.save()
+    
+    second = DataStore(data_file)
+    second.load()
+    second.rename_player(bob["id"], "Robert")
+    session = second.start_session("Friday Night")
+    events.record_event(session, "seat", bob["id"], 2000)
+    second.save()
+    
+    first.rename_player(alice["id"], "Alicia")
+    first.save()
+    
+    reloaded = DataStore(data_file)
+    reloaded.load()
+    assert [player["name"] for player in reloaded.players] == ["Alicia", "Robert"]
+    assert reloaded.tables[session["id"]].session["totals"]["buyin"] == 2000
+
+def test_save_versions_only_changed_records(tmp_path):
+    store = DataStore(str(tmp_path / "poker_data.json"))
+    alice = store.add_player("Alice")
+    bob = store.add_player("Bob")
+    session = store.start_session("Friday Night")
+    store.save()
+    assert alice["version"] == bob["version"] == session["version"] == 1
+    
+    store.rename_player(alice["id"], "Alicia")
+    events.record_event(session, "seat", bob["id"], 2000)
+    store.save()
+    assert (alice["version"], bob["version"], session["version"]) == (2, 1, 2)
+    
+    store.save()
+    assert (alice["version"], bob["version"], session["version"]) == (2, 1, 2)
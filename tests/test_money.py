@@ -0,0 +1,49 @@
+import json
+import pytest
+from core import ledger, money
+from core.storage import DataStore
+
+def legacy_file(path):
+    """A data file from before amounts were kept in pence, with the float drift it had"""
+    data = {
+        "players": [{"id": "alice", "name": "Alice"}, {"id": "bob", "name": "Bob"}],
+        "sessions": [{
+            "id": "s1", "name": "Friday", "date": "2024-03-01T20:00:00", "status": "completed",
+            "players": [{"id": "alice", "buyin": 20.0, "rebuys": 0.1 + 0.2, "cashout": 35.3},
+                        {"id": "bob", "buyin": 15.5, "rebuys": 0, "cashout": 0.5}],
+            "settlement": {"payments": [{"player_id": "bob", "amount": 15.0}],
+                           "distributions": [{"player_id": "alice", "amount": 15.0}]}
+        }]
+    }
+    with open(path, "w") as f:
+        json.dump(data, f)
+
+def test_legacy_file_migrates_to_pence_once(tmp_path):
+    data_file = str(tmp_path / "poker_data.json")
+    legacy_file(data_file)
+    store = DataStore(data_file)
+    store.load()
+    session = store.get_session_by_id("s1")
+    assert [dict(entry) for entry in session["players"]] == [
+        {"id": "alice", "buyin": 2000, "rebuys": 30, "cashout": 3530},
+        {"id": "bob", "buyin": 1550, "rebuys": 0, "cashout": 50}]
+    assert ledger.session_balance(session) == 0
+    assert session["settlement"]["payments"][0]["amount"] == 1500
+    
+    # Saved in pence and marked so, a reload leaves the amounts alone
+    store.save()
+    with open(data_file) as f:
+        assert json.load(f)["money"] == money.MONEY_FORMAT
+    reloaded = DataStore(data_file)
+    reloaded.load()
+    assert [dict(entry) for entry in reloaded.get_session_by_id("s1")["players"]] == \
+        [dict(entry) for entry in session["players"]]
+    assert reloaded.get_session_by_id("s1")["totals"] == {"buyin": 3550, "rebuys": 30, "cashout": 3580}
+
+@pytest.mark.parametrize("pounds, pence", [(0.1 + 0.2, 30), ("£12.50", 1250), (" 7 ", 700), (3, 300), (-2.005, -201)])
+def test_to_pence(pounds, pence):
+    assert money.to_pence(pounds) == pence
+
+def test_format_pence_round_trips():
+    for pence in (0, 5, -5, 1250, -123456):
+        assert money.to_pence(money.format_pence(pence, symbol="")) == pence
@@ -0,0 +1,66 @@
+import random
+from core import events
+from core.models import new_session
+from core.pairs import CoOccurrence
+
+PLAYERS = ["alice", "bob", "cara", "dan", "eve", "finn"]
+
+def random_history(seed, count):
+    rng = random.Random(seed)
+    sessions = []
+    for _ in range(count):
+        session = new_session("Night")
+        for player_id in rng.sample(PLAYERS, rng.randint(2, 5)):
+            events.record_event(session, "seat", player_id, 1000)
+            events.record_event(session, "cashout", player_id, rng.randint(0, 30) * 100)
+        sessions.append(session)
+    return sessions
+
+def brute_force(sessions):
+    """Every ordered pair's sessions together and the first player's net result in them"""
+    pairs = {}
+    for session in sessions:
+        results = {entry["id"]: entry["cashout"] - entry["buyin"] - entry["rebuys"] for entry in session["players"]}
+        for player_id in results:
+            for partner_id in results:
+                if partner_id != player_id:
+                    cell = pairs.setdefault((player_id, partner_id), [0, 0])
+                    cell[0] += 1
+                    cell[1] += results[player_id]
+    return pairs
+
+def cells(matrix):
+    return {(player_id, partner_id): cell for player_id, row in matrix.rows.items() for partner_id, cell in row.items()}
+
+def test_matrix_matches_a_brute_force_count():
+    sessions = random_history(11, 40)
+    matrix = CoOccurrence().update(sessions)
+    assert cells(matrix) == brute_force(sessions)
+    
+    pair = matrix.pair("alice", "bob")
+    expected = brute_force(sessions)[("alice", "bob")]
+    assert (pair["sessions"], pair["profit"]) == tuple(expected)
+    assert pair["partner_profit"] == brute_force(sessions)[("bob", "alice")][1]
+
+def test_sessions_added_one_at_a_time_match_a_rebuild():
+    sessions = random_history(12, 30)
+    matrix = CoOccurrence()
+    for end in range(1, len(sessions) + 1):
+        matrix.update(sessions[:end])
+    assert cells(matrix) == brute_force(sessions)
+
+def test_editing_an_older_session_rebuilds():
+    sessions = random_history(13, 20)
+    matrix = CoOccurrence().update(sessions)
+    player_id = sessions[3]["players"][0]["id"]
+    events.record_event(sessions[3], "rebuy", player_id, 500)
+    matrix.update(sessions)
+    assert cells(matrix) == brute_force(sessions)
+
+def test_top_partners_by_sessions():
+    sessions = random_history(14, 50)
+    matrix = CoOccurrence().update(sessions)
+    counts = sorted(((cell[0], partner_id) for (player_id, partner_id), cell in brute_force(sessions).items()
+                     if player_id == "alice"), reverse=True)
+    top = matrix.top_partners("alice", count=3)
+    assert [stats["sessions"] for _, stats in top] == [count for count, _ in counts[:3]]
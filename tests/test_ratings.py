@@ -0,0 +1,37 @@
+import random
+from core import events
+from core.models import new_session
+from core.ratings import RatingEngine, INITIAL_RATING
+
+def night(day, cashouts):
+    session = new_session(f"Night {day}")
+    session["date"] = f"{day}T20:00:00"
+    for player_id, cashout in cashouts.items():
+        events.record_event(session, "seat", player_id, 1000)
+        events.record_event(session, "cashout", player_id, cashout)
+    session["status"] = "completed"
+    return session
+
+def history():
+    return [night(f"2024-0{month}-{day:02d}", {"alice": 1000 + 300 * ((month + day) % 4),
+                                               "bob": 1000 + 200 * ((month * day) % 5),
+                                               "cara": 1000 - 100 * (day % 3)})
+            for month in range(1, 7) for day in (3, 17)]
+
+def test_ratings_do_not_depend_on_the_order_sessions_are_listed_in():
+    sessions = history()
+    expected = RatingEngine().update(sessions).ratings
+    shuffled = list(sessions)
+    random.Random(7).shuffle(shuffled)
+    assert RatingEngine().update(shuffled).ratings == expected
+
+def test_older_session_turning_up_replays_the_history():
+    sessions = history()
+    engine = RatingEngine().update(sessions[:4] + sessions[6:])
+    # A session from before the last one applied arrives late, as after a merge
+    engine.update(sessions[:4] + sessions[6:] + sessions[4:6])
+    assert engine.ratings == RatingEngine().update(sessions).ratings
+
+def test_ratings_are_zero_sum_around_the_start():
+    ratings = RatingEngine().update(history()).ratings
+    assert abs(sum(ratings.values()) - 3 * INITIAL_RATING) < 1e-6
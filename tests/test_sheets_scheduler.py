@@ -0,0 +1,109 @@
+import threading
+import time
+import pytest
+from fake_gspread import FakeAPIError, FakeClient, FakeService
+from sheets_scheduler import (RequestScheduler, TokenBucket, SheetsRateLimitError, PRIORITY_INTERACTIVE,
+                              PRIORITY_BACKGROUND)
+
+def make_scheduler(clock, **kwargs):
+    return RequestScheduler(clock=clock.time, sleep=clock.sleep, **kwargs)
+
+@pytest.mark.parametrize("rate", [1, 7, 13, 60, 97, 120])
+def test_waiting_the_returned_delay_always_gets_a_token(rate, clock):
+    bucket = TokenBucket(rate, clock=clock.time)
+    for _ in range(rate):
+        assert bucket.try_acquire() == 0
+    for _ in range(50):
+        wait = bucket.try_acquire()
+        assert wait > 0
+        clock.sleep(wait)
+        assert bucket.try_acquire() == 0
+
+def test_bucket_refills_no_further_than_its_capacity(clock):
+    bucket = TokenBucket(60, capacity=2, clock=clock.time)
+    clock.sleep(3600)
+    assert bucket.try_acquire() == 0
+    assert bucket.try_acquire() == 0
+    assert bucket.try_acquire() == pytest.approx(1.0)
+
+def test_acquire_sleeps_until_a_token_is_due(clock):
+    scheduler = make_scheduler(clock, write_per_minute=2)
+    for _ in range(3):
+        scheduler.acquire("write", PRIORITY_INTERACTIVE)
+    assert clock.sleeps == [pytest.approx(30.0)]
+    assert scheduler.waiting == []
+
+def test_interactive_callers_go_ahead_of_queued_background_ones(clock):
+    gate = threading.Event()
+    
+    def sleep(seconds):
+        gate.wait()
+        clock.sleep(seconds)
+    
+    scheduler = RequestScheduler(write_per_minute=1, clock=clock.time, sleep=sleep)
+    scheduler.acquire("write", PRIORITY_BACKGROUND)
+    order = []
+    
+    def caller(name, priority):
+        scheduler.acquire("write", priority)
+        order.append(name)
+    
+    threads = []
+    for name, priority in (("background 1", PRIORITY_BACKGROUND), ("background 2", PRIORITY_BACKGROUND),
+                           ("interactive", PRIORITY_INTERACTIVE)):
+        thread = threading.Thread(target=caller, args=(name, priority))
+        thread.start()
+        threads.append(thread)
+        # Let each caller queue up before the next one arrives
+        deadline = time.monotonic() + 5
+        while len(scheduler.waiting) < len(threads) and time.monotonic() < deadline:
+            time.sleep(0.001)
+    
+    gate.set()
+    for thread in threads:
+        thread.join(5)
+    assert order == ["interactive", "background 1", "background 2"]
+
+def failing_client(*statuses):
+    """A fake client whose next requests fail with the given statuses"""
+    service = FakeService()
+    for status in statuses:
+        service.fail_next(status)
+    return FakeClient(service)
+
+def test_throttling_and_server_errors_are_retried_with_backoff(clock):
+    scheduler = make_scheduler(clock, base_delay=1.0)
+    client = failing_client(429, 503, 500)
+    assert scheduler.call(client.create, "Poker Tracker").title == "Poker Tracker"
+    assert client.service.request_counts["create"] == 4
+    # Exponential backoff plus up to a second of jitter
+    assert len(clock.sleeps) == 3
+    for attempt, delay in enumerate(clock.sleeps):
+        assert 2 ** attempt <= delay <= 2 ** attempt + 1
+
+def test_backoff_is_capped_at_max_delay(clock):
+    scheduler = make_scheduler(clock, max_retries=8, base_delay=1.0, max_delay=4.0)
+    scheduler.call(failing_client(*[503] * 8).create, "Poker Tracker")
+    assert max(clock.sleeps) <= 5.0
+
+def test_rate_limit_error_once_retries_run_out(clock):
+    scheduler = make_scheduler(clock, max_retries=2)
+    client = failing_client(429, 429, 429, 429)
+    with pytest.raises(SheetsRateLimitError):
+        scheduler.call(client.create, "Poker Tracker")
+    assert client.service.request_counts["create"] == 3
+    assert scheduler.waiting == []
+
+def test_server_error_is_reraised_once_retries_run_out(clock):
+    scheduler = make_scheduler(clock, max_retries=1)
+    with pytest.raises(FakeAPIError) as error:
+        scheduler.call(failing_client(503, 502).create, "Poker Tracker")
+    assert error.value.code == 502
+
+def test_other_errors_are_not_retried(clock):
+    scheduler = make_scheduler(clock)
+    client = failing_client(400)
+    with pytest.raises(FakeAPIError):
+        scheduler.call(client.create, "Poker Tracker")
+    assert client.service.request_counts["create"] == 1
+    assert clock.sleeps == []
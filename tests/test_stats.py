@@ -0,0 +1,44 @@
+import itertools
+import math
+import random
+import statistics
+import pytest
+from core.stats import RunningMetrics
+
+def results(seed, count):
+    rng = random.Random(seed)
+    return [rng.randint(-5000, 5000) for _ in range(count)]
+
+def pushed(profits):
+    metrics = RunningMetrics()
+    for profit in profits:
+        metrics.push(profit)
+    return metrics
+
+@pytest.mark.parametrize("seed, count", [(1, 2), (2, 10), (3, 500)])
+def test_welford_matches_statistics(seed, count):
+    profits = results(seed, count)
+    metrics = pushed(profits)
+    assert metrics.mean == pytest.approx(statistics.fmean(profits))
+    assert metrics.m2 / metrics.count == pytest.approx(statistics.pvariance(profits))
+    assert metrics.std_dev == pytest.approx(statistics.stdev(profits))
+
+def test_large_offset_keeps_its_precision():
+    # Naive sum-of-squares loses everything here; Welford keeps the spread
+    profits = [10 ** 9 + profit for profit in results(4, 200)]
+    assert pushed(profits).m2 / len(profits) == pytest.approx(statistics.pvariance(profits), rel=1e-9)
+
+def test_drawdown_and_losing_streak_match_a_full_scan():
+    profits = results(5, 300)
+    cumulative = list(itertools.accumulate(profits))
+    peaks = itertools.accumulate([0] + cumulative, max)
+    drawdown = max(peak - total for peak, total in zip(itertools.islice(peaks, 1, None), cumulative))
+    streak = max((len(list(run)) for losing, run in itertools.groupby(profits, lambda p: p < 0) if losing), default=0)
+    metrics = pushed(profits)
+    assert metrics.max_drawdown == max(drawdown, 0)
+    assert metrics.longest_losing_streak == streak
+
+def test_single_session_has_no_spread():
+    metrics = pushed([1200])
+    assert metrics.std_dev == 0.0 and metrics.consistency is None
+    assert not math.isnan(metrics.as_dict()["std_dev"])
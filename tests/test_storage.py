@@ -0,0 +1,77 @@
+import os
+from core import events
+from core.storage import DataStore
+
+def start_night(store):
+    player = store.add_player("Alice")
+    session = store.start_session("Friday Night")
+    events.record_event(session, "seat", player["id"], 2000)
+    events.record_event(session, "rebuy", player["id"], 1000)
+    store.flush_journals()
+    return session
+
+def test_table_started_after_the_last_save_survives_a_crash(tmp_path):
+    data_file = str(tmp_path / "poker_data.json")
+    store = DataStore(data_file)
+    store.save()
+    session = start_night(store)
+    
+    # Crash: nothing saved since the table started, only its journal is on disk
+    recovered = DataStore(data_file)
+    recovered.load()
+    assert list(recovered.tables) == [session["id"]]
+    table_session = recovered.tables[session["id"]].session
+    assert table_session["name"] == "Friday Night"
+    assert table_session["totals"] == session["totals"]
+    
+    # Saving keeps the table, now in the data file, rather than discarding its journal
+    recovered.save()
+    reloaded = DataStore(data_file)
+    reloaded.load()
+    assert reloaded.tables[session["id"]].session["totals"]["rebuys"] == 1000
+
+def test_table_recovered_without_any_data_file(tmp_path):
+    data_file = str(tmp_path / "poker_data.json")
+    session = start_night(DataStore(data_file))
+    assert not os.path.exists(data_file)
+    
+    recovered = DataStore(data_file)
+    assert recovered.load()
+    assert recovered.tables[session["id"]].session["totals"]["buyin"] == 2000
+
+def test_save_keeps_journals_for_sessions_it_does_not_know(tmp_path):
+    data_file = str(tmp_path / "poker_data.json")
+    store = DataStore(data_file)
+    store.save()
+    
+    # Another instance starts a table and crashes before saving
+    session = start_night(DataStore(data_file))
+    store.save()
+    assert os.path.exists(os.path.join(store.journal_dir, f"{session['id']}.jsonl"))
+
+def test_ended_table_journal_is_discarded_on_save(tmp_path):
+    data_file = str(tmp_path / "poker_data.json")
+    store = DataStore(data_file)
+    session = start_night(store)
+    store.end_session(session["id"])
+    store.save()
+    assert not os.listdir(store.journal_dir)
+
+def test_save_keeps_the_data_file_permissions(tmp_path):
+    data_file = str(tmp_path / "poker_data.json")
+    store = DataStore(data_file)
+    store.save()
+    assert os.stat(data_file).st_mode & 0o777 == 0o644
+    
+    os.chmod(data_file, 0o640)
+    store.add_player("Alice")
+    store.save()
+    assert os.stat(data_file).st_mode & 0o777 == 0o640
+
+def test_deleted_session_revision_is_forgotten(tmp_path):
+    store = DataStore(str(tmp_path / "poker_data.json"))
+    session = start_night(store)
+    store.end_session(session["id"])
+    assert session["id"] in events.revisions
+    store.delete_session(0)
+    assert session["id"] not in events.revisions
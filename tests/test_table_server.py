@@ -0,0 +1,55 @@
+import http.client
+import threading
+import pytest
+from core.storage import DataStore
+from table_server import SessionBroadcaster, TableServer
+
+@pytest.fixture
+def broadcaster():
+    broadcaster = SessionBroadcaster()
+    broadcaster.publish([(event_id, f"event {event_id}") for event_id in range(1, 6)], "snapshot")
+    return broadcaster
+
+def queued(subscriber):
+    frames = []
+    while not subscriber.queue.empty():
+        frames.append(subscriber.queue.get_nowait())
+    return frames
+
+def test_reconnecting_client_gets_what_it_missed(broadcaster):
+    assert queued(broadcaster.subscribe(None, 3)) == ["event 4", "event 5"]
+    assert queued(broadcaster.subscribe(None, 5)) == []
+
+def test_new_client_starts_from_the_snapshot(broadcaster):
+    assert queued(broadcaster.subscribe(None)) == ["snapshot"]
+
+def test_id_from_before_a_restart_gets_the_snapshot(broadcaster):
+    assert queued(broadcaster.subscribe(None, 40)) == ["snapshot"]
+
+@pytest.fixture
+def server(tmp_path):
+    server = TableServer(DataStore(str(tmp_path / "poker_data.json")), port=0, token="secret")
+    server.start()
+    stop = threading.Event()
+    writer = threading.Thread(target=server.run_writer, args=(stop,), daemon=True)
+    writer.start()
+    yield server
+    stop.set()
+    writer.join(2)
+    server.stop()
+
+def test_preflight_is_answered_without_the_token(server):
+    connection = http.client.HTTPConnection("127.0.0.1", server.port, timeout=5)
+    connection.request("OPTIONS", "/api/tables", headers={"Origin": "http://example.com"})
+    response = connection.getresponse()
+    response.read()
+    assert response.status == 204
+    assert response.getheader("Access-Control-Allow-Origin") == "*"
+    assert "X-Table-Token" in response.getheader("Access-Control-Allow-Headers")
+    
+    # The same connection then makes the real request
+    connection.request("GET", "/api/tables", headers={"X-Table-Token": "secret"})
+    response = connection.getresponse()
+    assert response.status == 200 and response.read() == b"[]"
+    assert response.getheader("Access-Control-Allow-Origin") == "*"
+    connection.close()
@@ -0,0 +1,28 @@
+import pytest
+from core import events
+from core.models import new_session
+from core.windows import DateOrderedIndex, StatsWindows
+
+def night(day, results):
+    """A completed session on day where each player id buys in 1000 and cashes out the given amount"""
+    session = new_session(f"Night {day}")
+    session["date"] = f"{day}T20:00:00"
+    for player_id, cashout in results.items():
+        events.record_event(session, "seat", player_id, 1000)
+        events.record_event(session, "cashout", player_id, cashout)
+    session["status"] = "completed"
+    return session
+
+def test_last_sessions_counts_each_players_own_sessions():
+    sessions = [night("2024-01-05", {"alice": 2000, "bob": 0}),
+                night("2024-01-12", {"alice": 500}),
+                night("2024-01-19", {"alice": 1500}),
+                night("2024-01-26", {"alice": 1000})]
+    stats = StatsWindows().update(sessions).last_sessions(2)
+    assert stats["alice"]["sessions"] == 2 and stats["alice"]["profit"] == 500
+    # Bob's only session is older than the group's last two, but still his last one
+    assert stats["bob"]["sessions"] == 1 and stats["bob"]["profit"] == -1000
+
+def test_date_ordered_index_needs_add():
+    with pytest.raises(TypeError):
+        DateOrderedIndex()
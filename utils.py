@@ -1,5 +1,5 @@
-import tkinter as tk
-from tkinter import messagebox
+# Tk is only imported by the dialog helpers so headless code can use this module
+from core.money import format_pence
 
 def center_window(window, parent=None):
     """Center a window on the screen or relative to parent"""
@@ -18,43 +18,22 @@ def center_window(window, parent=None):
 
 def show_message(title, message, parent=None):
     """Show an information message dialog"""
+    from tkinter import messagebox
     return messagebox.showinfo(title, message, parent=parent)
 
 def show_error(title, message, parent=None):
     """Show an error message dialog"""
+    from tkinter import messagebox
     return messagebox.showerror(title, message, parent=parent)
 
 def show_warning(title, message, parent=None):
     """Show a warning message dialog"""
+    from tkinter import messagebox
     return messagebox.showwarning(title, message, parent=parent)
 
-def format_currency(amount, symbol="£"):
-    """Format a number as currency"""
-    return f"{symbol}{amount:.2f}"
-
-def calculate_player_stats(player_id, sessions):
-    """Calculate stats for a player across all sessions"""
-    total_sessions = 0
-    total_buyins = 0
-    total_cashouts = 0
-    
-    for session in sessions:
-        for player in session["players"]:
-            if player["id"] == player_id:
-                total_sessions += 1
-                total_buyins += player["buyin"] + player.get("rebuys", 0)
-                total_cashouts += player.get("cashout", 0)
-    
-    profit = total_cashouts - total_buyins
-    avg_profit = profit / total_sessions if total_sessions > 0 else 0
-    
-    return {
-        "sessions": total_sessions,
-        "buyins": total_buyins,
-        "cashouts": total_cashouts,
-        "profit": profit,
-        "avg_profit": avg_profit
-    }
+def format_currency(pence, symbol="£"):
+    """Format an amount in pence as currency"""
+    return format_pence(pence, symbol)
 
 def validate_decimal_input(value):
     """Validate that input is a valid decimal number"""